@@ -0,0 +1,232 @@
+"""On-disk LRU cache of remote NetCDF assets.
+
+Published forecast files never change, so their bytes are kept on local disk
+and reused by the next request. Entries are keyed on the asset href plus the
+object's ETag and size: a replaced object gets a new key and the stale one
+ages out. An entry holds the whole object (`cat_file`) or the byte ranges read
+from it (`cat_ranges`). A range is served from the whole object or from any
+cached range containing it.
+
+The cache directory can be shared by the worker processes of a server:
+- Files are written to a temporary name and renamed into place.
+- Recency is the file mtime, bumped on every hit.
+- When the directory grows past `max_bytes`, the least recently used files
+  are deleted down to 90% of the budget, by one process at a time under a
+  `flock`.
+A file deleted while another process reads it stays readable until closed.
+
+Lookups and bytes are counted, by hit and miss, in the `eed_asset_cache_*`
+Prometheus counters.
+"""
+import fcntl
+import hashlib
+import os
+import tempfile
+import threading
+import time
+
+from prometheus_client import Counter
+
+CACHE_REQUESTS = Counter(
+    "eed_asset_cache_requests", "Asset cache lookups.", ("kind", "result")
+)
+CACHE_BYTES = Counter(
+    "eed_asset_cache_bytes", "Asset bytes served from the cache or fetched.", ("result",)
+)
+CACHE_EVICTIONS = Counter("eed_asset_cache_evictions", "Asset cache files evicted.")
+
+FULL = "full"
+# seconds between two scans of the directory, to see the other processes' writes
+SCAN_INTERVAL = 60.0
+
+
+class AssetCache:
+    """Cache of remote objects in `directory`, at most `max_bytes` of them.
+
+    `max_bytes` 0 disables it: reads go straight to the filesystem.
+    """
+
+    @classmethod
+    def from_environ(cls):
+        """The cache configured by CUBE_CACHE_DIR and CUBE_CACHE_SIZE (bytes, 0 disables it)."""
+        return cls(
+            os.environ.get("CUBE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "eed-asset-cache")),
+            int(os.environ.get("CUBE_CACHE_SIZE", 4 * 2**30)),
+        )
+
+    def __init__(self, directory, max_bytes, info_ttl=300.0):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.info_ttl = info_ttl
+        self._infos = {}
+        self._lock = threading.Lock()
+        self._size = 0
+        self._scanned = 0.0
+        if self.enabled:
+            os.makedirs(directory, exist_ok=True)
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def info(self, fs, href):
+        """Size and ETag of an object, asked at most every `info_ttl` seconds."""
+        now = time.monotonic()
+        cached = self._infos.get(href)
+        if cached is not None and cached[0] > now:
+            return cached[1]
+        info = fs.info(href)
+        self._infos[href] = (now + self.info_ttl, info)
+        return info
+
+    def cat_file(self, fs, href):
+        """Bytes of a whole object."""
+        if not self.enabled:
+            return fs.cat_file(href)
+        entry = self._entry(fs, href)
+        path = os.path.join(entry, FULL)
+        data = _read(path)
+        if data is not None:
+            self._hit("file", path, len(data))
+            return data
+        data = fs.cat_file(href)
+        CACHE_REQUESTS.labels("file", "miss").inc()
+        CACHE_BYTES.labels("miss").inc(len(data))
+        self._write(entry, FULL, data)
+        return data
+
+    def cat_ranges(self, fs, href, ranges):
+        """Bytes of `(start, end)` ranges of an object, the missing ones fetched in one batch."""
+        if not self.enabled:
+            return _cat_ranges(fs, href, ranges)
+        entry = self._entry(fs, href)
+        cached = _cached_ranges(entry, self.info(fs, href)["size"])
+        parts = [None] * len(ranges)
+        missing = []
+        for i, (start, end) in enumerate(ranges):
+            path = next(
+                (path for first, last, path in cached if first <= start and end <= last), None
+            )
+            data = None if path is None else _read(path, start - _start(path), end - start)
+            if data is None:
+                missing.append(i)
+            else:
+                self._hit("range", path, len(data))
+                parts[i] = data
+        if missing:
+            fetched = _cat_ranges(fs, href, [ranges[i] for i in missing])
+            for i, data in zip(missing, fetched):
+                start, end = ranges[i]
+                CACHE_REQUESTS.labels("range", "miss").inc()
+                CACHE_BYTES.labels("miss").inc(len(data))
+                self._write(entry, f"{start}-{end}", data)
+                parts[i] = data
+        return parts
+
+    def _entry(self, fs, href):
+        info = self.info(fs, href)
+        version = f"{href}\0{info.get('ETag', '')}\0{info['size']}"
+        return os.path.join(self.directory, hashlib.sha256(version.encode()).hexdigest())
+
+    def _hit(self, kind, path, size):
+        CACHE_REQUESTS.labels(kind, "hit").inc()
+        CACHE_BYTES.labels("hit").inc(size)
+        try:
+            os.utime(path)
+        except FileNotFoundError:  # evicted meanwhile, the data was read
+            pass
+
+    def _write(self, entry, name, data):
+        os.makedirs(entry, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=entry, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, os.path.join(entry, name))
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        with self._lock:
+            self._size += len(data)
+            due = self._size > self.max_bytes or time.monotonic() - self._scanned > SCAN_INTERVAL
+        if due:
+            self.evict()
+
+    def evict(self):
+        """Delete the least recently used files past the budget."""
+        with open(os.path.join(self.directory, ".lock"), "w") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:  # another process is at it
+                return
+            files = []
+            for entry in os.scandir(self.directory):
+                if not entry.is_dir():
+                    continue
+                for file in os.scandir(entry.path):
+                    try:
+                        stat = file.stat()
+                    except FileNotFoundError:
+                        continue
+                    if file.name.startswith(".tmp-") and time.time() - stat.st_mtime < 3600:
+                        continue  # being written
+                    files.append((stat.st_mtime, stat.st_size, file.path))
+            total = sum(size for _, size, _ in files)
+            if total > self.max_bytes:
+                for _, size, path in sorted(files):
+                    if total <= self.max_bytes * 0.9:
+                        break
+                    try:
+                        os.unlink(path)
+                    except FileNotFoundError:
+                        pass
+                    total -= size
+                    CACHE_EVICTIONS.inc()
+                for entry in os.scandir(self.directory):
+                    if entry.is_dir():
+                        try:
+                            os.rmdir(entry.path)
+                        except OSError:  # not empty
+                            pass
+        with self._lock:
+            self._size = total
+            self._scanned = time.monotonic()
+
+
+def _start(path):
+    name = os.path.basename(path)
+    return 0 if name == FULL else int(name.partition("-")[0])
+
+
+def _cached_ranges(entry, size):
+    """(start, end, path) of the ranges cached for an object."""
+    try:
+        names = os.listdir(entry)
+    except FileNotFoundError:
+        return []
+    ranges = []
+    for name in names:
+        if name == FULL:
+            ranges.append((0, size, os.path.join(entry, name)))
+        elif not name.startswith("."):
+            start, _, end = name.partition("-")
+            ranges.append((int(start), int(end), os.path.join(entry, name)))
+    # whole objects first, then the larger ranges
+    return sorted(ranges, key=lambda r: r[0] - r[1])
+
+
+def _read(path, offset=0, size=-1):
+    try:
+        with open(path, "rb") as f:
+            f.seek(offset)
+            return f.read(size)
+    except FileNotFoundError:
+        return None
+
+
+def _cat_ranges(fs, href, ranges):
+    if not ranges:
+        return []
+    starts = [start for start, _ in ranges]
+    ends = [end for _, end in ranges]
+    return fs.cat_ranges([href] * len(ranges), starts, ends, on_error="raise")
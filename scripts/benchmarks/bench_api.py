@@ -0,0 +1,321 @@
+"""Load test the STAC API endpoints and compare runs against saved baselines.
+
+Seeds a collection with synthetic seasonal-forecast items (models, issue dates
+and bboxes drawn from a fixed seed, so every run sees the same data), then
+drives the core, search and transaction endpoints at increasing concurrency and
+reports p50/p95/p99 latency and throughput per endpoint and concurrency.
+
+Against a running API (mongo scratch database, see bench_async_clients.py):
+
+    python scripts/benchmarks/bench_api.py --url http://127.0.0.1:8083 --seed 20000 \
+        --save-baseline baseline.json
+
+    python scripts/benchmarks/bench_api.py --compare baseline.json   # exit 1 on regression
+
+Without a server, `--in-process` serves the app through httpx's ASGI transport
+(set the MONGO_* variables as for the app), and `--in-memory` additionally
+replaces mongo with mongomock (pip install mongomock): good enough to compare
+encoding and routing changes, not mongo ones.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+MODELS = list(range(400, 470, 2))
+ISSUE_DATES = [f"{year}{month:02d}" for year in (2022, 2023, 2024) for month in range(1, 13)]
+# lon/lat boxes of the regions forecasts are produced for
+REGIONS = [
+    [6.0, 36.0, 19.0, 47.5],
+    [-10.0, 35.0, 5.0, 44.0],
+    [-5.0, 49.0, 10.0, 56.0],
+    [12.0, 45.0, 30.0, 55.0],
+    [20.0, 34.0, 30.0, 42.0],
+]
+
+Request = Tuple[str, str, Optional[Dict]]
+
+
+def make_item(i: int, collection: str, rng: random.Random, prefix: str = "bench") -> Dict:
+    """A synthetic seasonal-forecast item."""
+    issue_date = rng.choice(ISSUE_DATES)
+    west, south, east, north = rng.choice(REGIONS)
+    return {
+        "type": "Feature",
+        "stac_version": "1.0.0",
+        "stac_extensions": [],
+        "id": f"{prefix}_{i}",
+        "collection": collection,
+        "geometry": {
+            "type": "Polygon",
+            "coordinates": [[[west, south], [east, south], [east, north], [west, north], [west, south]]],
+        },
+        "bbox": [west, south, east, north],
+        "properties": {
+            "datetime": f"{issue_date[:4]}-{issue_date[4:]}-{rng.randint(1, 28):02d}T00:00:00Z",
+            "issue_date": issue_date,
+            "model": rng.choice(MODELS),
+            "lead_time": rng.randint(0, 6),
+        },
+        "links": [],
+        "assets": {
+            "data": {
+                "href": f"s3://saferplaces.co/climate/seasonal/{issue_date}/{i}.nc",
+                "type": "application/netcdf",
+                "roles": ["data"],
+            }
+        },
+    }
+
+
+def make_collection(collection: str) -> Dict:
+    return {
+        "type": "Collection",
+        "id": collection,
+        "stac_version": "1.0.0",
+        "description": "Synthetic seasonal forecasts for benchmarks",
+        "license": "proprietary",
+        "extent": {
+            "spatial": {"bbox": [[-10.0, 34.0, 30.0, 56.0]]},
+            "temporal": {"interval": [["2022-01-01T00:00:00Z", "2024-12-31T23:59:59Z"]]},
+        },
+        "links": [],
+    }
+
+
+async def seed(client: httpx.AsyncClient, collection: str, count: int, batch_size: int = 1000):
+    """Create the collection and `count` items through the bulk_items endpoint."""
+    response = await client.post("/collections", json=make_collection(collection))
+    if response.status_code >= 400 and response.status_code != 409:
+        response.raise_for_status()
+    rng = random.Random(0)
+    items = [make_item(i, collection, rng) for i in range(count)]
+    created = 0
+    for start in range(0, count, batch_size):
+        response = await client.post(
+            f"/collections/{collection}/bulk_items",
+            json={"type": "FeatureCollection", "features": items[start:start + batch_size]},
+        )
+        response.raise_for_status()
+        created += response.json()["created"]
+    return created
+
+
+def scenarios(collection: str, run: str) -> List[Tuple[str, Callable[[int], Request]]]:
+    """Named request factories, called with the request number.
+
+    The transaction scenarios run in order on the same ids: create, update,
+    then delete, so the collection is left as seeded.
+    """
+    rng = random.Random(1)
+    months = [rng.choice(ISSUE_DATES) for _ in range(64)]
+
+    def month_search(i):
+        month = months[i % len(months)]
+        return {
+            "collections": [collection],
+            "datetime": f"{month[:4]}-{month[4:]}-01T00:00:00Z/{month[:4]}-{month[4:]}-28T23:59:59Z",
+            "limit": 10,
+        }
+
+    def write_item(i):
+        return make_item(i, collection, random.Random(i), prefix=f"bench_{run}")
+
+    return [
+        ("GET /", lambda i: ("GET", "/", None)),
+        ("GET /collections", lambda i: ("GET", "/collections", None)),
+        ("GET items", lambda i: ("GET", f"/collections/{collection}/items?limit=10", None)),
+        ("GET items limit=500", lambda i: ("GET", f"/collections/{collection}/items?limit=500", None)),
+        (
+            "GET /search month",
+            lambda i: (
+                "GET",
+                f"/search?collections={collection}&datetime={month_search(i)['datetime']}&limit=10",
+                None,
+            ),
+        ),
+        ("POST /search month", lambda i: ("POST", "/search", month_search(i))),
+        (
+            "POST /search model",
+            lambda i: (
+                "POST",
+                "/search",
+                dict(month_search(i), query={"model": {"eq": MODELS[i % len(MODELS)]}}),
+            ),
+        ),
+        (
+            "POST /search bbox",
+            lambda i: (
+                "POST",
+                "/search",
+                {"collections": [collection], "bbox": REGIONS[i % len(REGIONS)], "limit": 10},
+            ),
+        ),
+        ("POST item", lambda i: ("POST", f"/collections/{collection}/items", write_item(i))),
+        # stac-fastapi 2.3 takes updates on the items path, the id is in the body
+        ("PUT item", lambda i: ("PUT", f"/collections/{collection}/items", write_item(i))),
+        (
+            "DELETE item",
+            lambda i: ("DELETE", f"/collections/{collection}/items/bench_{run}_{i}", None),
+        ),
+    ]
+
+
+def percentile(quantiles: List[float], p: int) -> float:
+    return quantiles[p - 1] if quantiles else 0.0
+
+
+async def run_load(
+    client: httpx.AsyncClient,
+    factory: Callable[[int], Request],
+    total: int,
+    concurrency: int,
+    offset: int = 0,
+) -> Dict:
+    """Fire `total` requests with at most `concurrency` in flight."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def one(i):
+        nonlocal errors
+        method, path, body = factory(offset + i)
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.request(method, path, json=body)
+            await response.aread()
+            latencies.append(time.perf_counter() - start)
+        if response.status_code >= 400:
+            errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    elapsed = time.perf_counter() - start
+
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    return {
+        "requests": total,
+        "errors": errors,
+        "rps": total / elapsed,
+        "p50_ms": percentile(quantiles, 50) * 1000,
+        "p95_ms": percentile(quantiles, 95) * 1000,
+        "p99_ms": percentile(quantiles, 99) * 1000,
+    }
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Scenarios whose p95 grew, or throughput dropped, by more than `tolerance`."""
+    regressions = []
+    for key, result in results.items():
+        base = baseline.get("results", {}).get(key)
+        if base is None:
+            continue
+        if result["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{key}: p95 {base['p95_ms']:.1f} -> {result['p95_ms']:.1f} ms")
+        if result["rps"] < base["rps"] * (1 - tolerance):
+            regressions.append(f"{key}: {base['rps']:.0f} -> {result['rps']:.0f} req/s")
+        if result["errors"] > base["errors"]:
+            regressions.append(f"{key}: {base['errors']} -> {result['errors']} errors")
+    return regressions
+
+
+def in_memory_mongo():
+    """Point the app's pool at mongomock, before the app is imported."""
+    import mongomock
+
+    os.environ["MONGO_ASYNC"] = "false"
+
+    from stac_fastapi.demo.database import mongo
+
+    mongo.client = mongomock.MongoClient()
+    mongo.asynchronous = False
+
+
+async def main(args) -> int:
+    limits = httpx.Limits(max_connections=max(args.concurrency))
+    app = None
+    if args.in_process or args.in_memory:
+        if args.in_memory:
+            in_memory_mongo()
+        from stac_fastapi.demo.app import app
+
+        await app.router.startup()
+        transport = httpx.ASGITransport(app=app)
+        client = httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120)
+    else:
+        client = httpx.AsyncClient(base_url=args.url, limits=limits, timeout=120)
+
+    results = {}
+    try:
+        if args.seed:
+            start = time.perf_counter()
+            created = await seed(client, args.collection, args.seed)
+            print(f"seeded {created} items in {time.perf_counter() - start:.1f}s")
+
+        run = str(int(time.time()))
+        print(f"{'scenario':<24}{'concurrency':>12}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+        for concurrency in args.concurrency:
+            for name, factory in scenarios(args.collection, f"{run}_{concurrency}"):
+                if args.only and not any(only in name for only in args.only):
+                    continue
+                if args.in_memory and "bbox" in name:  # mongomock has no geo queries
+                    continue
+                if args.warmup and not name.startswith(("POST item", "PUT", "DELETE")):
+                    await run_load(client, factory, args.warmup, concurrency)
+                result = await run_load(client, factory, args.requests, concurrency)
+                results[f"{name} @{concurrency}"] = result
+                print(
+                    f"{name:<24}{concurrency:>12}{result['rps']:>10.1f}{result['p50_ms']:>10.1f}"
+                    f"{result['p95_ms']:>10.1f}{result['p99_ms']:>10.1f}{result['errors']:>8}"
+                )
+    finally:
+        await client.aclose()
+        if app is not None:
+            await app.router.shutdown()
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(
+                {
+                    "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                    "host": platform.node(),
+                    "args": {k: v for k, v in vars(args).items() if k not in ("compare", "save_baseline")},
+                    "results": results,
+                },
+                f,
+                indent=2,
+            )
+        print(f"baseline saved to {args.save_baseline}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print("REGRESSION", regression)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:8083")
+    parser.add_argument("--in-process", action="store_true", help="serve the app in this process")
+    parser.add_argument("--in-memory", action="store_true", help="in process, on mongomock")
+    parser.add_argument("--collection", default="bench_seasonal_forecasts")
+    parser.add_argument("--seed", type=int, default=0, help="items to create before the run")
+    parser.add_argument("--requests", type=int, default=500, help="per scenario and concurrency")
+    parser.add_argument("--warmup", type=int, default=50, help="untimed read requests first")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 50, 200])
+    parser.add_argument("--only", nargs="+", help="run the scenarios whose name contains one of these")
+    parser.add_argument("--save-baseline", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON to compare with, exit 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative change")
+    sys.exit(asyncio.run(main(parser.parse_args())))
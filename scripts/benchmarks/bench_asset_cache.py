@@ -0,0 +1,81 @@
+"""Cold vs warm climate EED cube requests through the on-disk asset cache.
+
+Reads model NetCDF files from the local S3 stand-in (see s3_standin.py)
+through climate_eed_service's `fetch_datasets` with an empty cache, then
+again with the cache filled by the first read, in both read modes (see
+bench_cube_subset.py):
+
+    python scripts/benchmarks/bench_asset_cache.py --models 12 --latency 0.05
+
+`requests` and `MB` are what reached the stand-in, `hits` the share of cache
+lookups served locally. `--cache-size` below the data size shows eviction.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import climate_eed_service  # noqa: E402
+from asset_cache import CACHE_REQUESTS, AssetCache  # noqa: E402
+from bench_cube_fetch import make_items  # noqa: E402
+from climate_eed_service import fetch_datasets, parse_cube_query  # noqa: E402
+from s3_standin import LatencyS3FileSystem, write_models  # noqa: E402
+
+REQUESTS = [
+    ("full", {}),
+    ("region day", {"bbox": "9,39,13,43", "datetime": "2024-02-03T00:00:00Z"}),
+    ("point", {"bbox": "10,40,10,40"}),
+]
+
+
+def lookups():
+    counts = {}
+    for metric in CACHE_REQUESTS.collect():
+        for sample in metric.samples:
+            if sample.name.endswith("_total"):
+                result = sample.labels["result"]
+                counts[result] = counts.get(result, 0) + sample.value
+    return counts
+
+
+def main(args):
+    with tempfile.TemporaryDirectory() as root:
+        hrefs = write_models(root, range(400, 400 + args.models), ny=args.ny, nx=args.nx)
+        items = make_items(hrefs)
+        fs = LatencyS3FileSystem(root, latency=args.latency, bandwidth=args.bandwidth * 1e6)
+        print(f"{args.models} models, {args.latency * 1000:.0f} ms per request, {args.bandwidth:.0f} MB/s")
+        print(f"{'request':<12}{'mode':>10}{'cache':>7}{'ms':>9}{'requests':>10}{'MB':>8}{'hits':>7}")
+        for name, params in REQUESTS:
+            query = parse_cube_query(params)
+            for mode, download_max in (("download", float("inf")), ("ranges", 0)):
+                climate_eed_service.CUBE_DOWNLOAD_MAX = download_max
+                with tempfile.TemporaryDirectory() as directory:
+                    climate_eed_service.asset_cache = AssetCache(directory, args.cache_size * 2**20)
+                    for cache in ("cold", "warm"):
+                        fs.reset_stats()
+                        before = lookups()
+                        start = time.perf_counter()
+                        fetch_datasets(fs, items, query)
+                        elapsed = time.perf_counter() - start
+                        after = lookups()
+                        hits = after.get("hit", 0) - before.get("hit", 0)
+                        total = hits + after.get("miss", 0) - before.get("miss", 0)
+                        print(
+                            f"{name:<12}{mode:>10}{cache:>7}{elapsed * 1000:>9.0f}"
+                            f"{fs.stats['requests']:>10}{fs.stats['bytes'] / 1e6:>8.2f}"
+                            f"{hits / total if total else 0:>7.0%}"
+                        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--models", type=int, default=12)
+    parser.add_argument("--ny", type=int, default=360)
+    parser.add_argument("--nx", type=int, default=480)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per request")
+    parser.add_argument("--bandwidth", type=float, default=100, help="MB/s per request")
+    parser.add_argument("--cache-size", type=int, default=1024, help="MiB")
+    main(parser.parse_args())
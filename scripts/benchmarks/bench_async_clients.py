@@ -0,0 +1,78 @@
+"""Compare requests/sec of the sync (pymongo) and async (motor) clients.
+
+Start two instances of the API against the same mongo, one per client:
+
+    python -m stac_fastapi.demo.app                   # sync, port 8083
+    MONGO_ASYNC=true uvicorn stac_fastapi.demo.app:app --port 8084
+
+then run:
+
+    python scripts/benchmarks/bench_async_clients.py \
+        --sync-url http://127.0.0.1:8083 --async-url http://127.0.0.1:8084
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+SEARCH_BODY = {
+    "collections": ["seasonal_forecasts"],
+    "datetime": "2024-02-01T00:00:00Z/2024-02-29T00:00:00Z",
+    "limit": 10,
+}
+
+
+async def run_load(base_url, method, path, concurrency, total, body=None):
+    """Fire `total` requests with at most `concurrency` in flight, return req/s."""
+    semaphore = asyncio.Semaphore(concurrency)
+    errors = 0
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+
+        async def one():
+            nonlocal errors
+            async with semaphore:
+                response = await client.request(method, path, json=body)
+                if response.status_code >= 400:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(total)))
+        elapsed = time.perf_counter() - start
+
+    return total / elapsed, errors
+
+
+async def main(args):
+    scenarios = [
+        ("GET", "/collections", None),
+        ("GET", f"/collections/{args.collection}/items", None),
+        ("POST", "/search", dict(SEARCH_BODY, collections=[args.collection])),
+    ]
+    print(f"{'endpoint':<45}{'concurrency':>12}{'sync req/s':>12}{'async req/s':>12}")
+    for method, path, body in scenarios:
+        for concurrency in args.concurrency:
+            sync_rps, sync_errors = await run_load(
+                args.sync_url, method, path, concurrency, args.requests, body
+            )
+            async_rps, async_errors = await run_load(
+                args.async_url, method, path, concurrency, args.requests, body
+            )
+            line = f"{method + ' ' + path:<45}{concurrency:>12}{sync_rps:>12.1f}{async_rps:>12.1f}"
+            if sync_errors or async_errors:
+                line += f"  (errors: sync={sync_errors} async={async_errors})"
+            print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sync-url", default="http://127.0.0.1:8083")
+    parser.add_argument("--async-url", default="http://127.0.0.1:8084")
+    parser.add_argument("--collection", default="seasonal_forecasts")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument(
+        "--concurrency", type=int, nargs="+", default=[10, 50, 200, 500]
+    )
+    asyncio.run(main(parser.parse_args()))
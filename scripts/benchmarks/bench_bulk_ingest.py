@@ -0,0 +1,104 @@
+"""Compare items/sec of one-by-one item creation and the bulk_items endpoint.
+
+Start the API against a scratch mongo (items are created in, and removed from,
+the `--collection` collection, which must exist):
+
+    python -m stac_fastapi.demo.app
+
+then run:
+
+    python scripts/benchmarks/bench_bulk_ingest.py --items 5000 --batch-size 100 500 1000
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+
+def make_item(run, i, collection):
+    """A seasonal-forecast item, unique to this run."""
+    return {
+        "type": "Feature",
+        "stac_version": "1.0.0",
+        "stac_extensions": [],
+        "id": f"bench_{run}_{i}",
+        "collection": collection,
+        "geometry": {
+            "type": "Polygon",
+            "coordinates": [[[6.0, 36.0], [19.0, 36.0], [19.0, 47.5], [6.0, 47.5], [6.0, 36.0]]],
+        },
+        "bbox": [6.0, 36.0, 19.0, 47.5],
+        "properties": {
+            "datetime": "2024-02-01T00:00:00Z",
+            "issue_date": "202402",
+            "model": 400 + i % 20,
+            "lead_time": i % 7,
+        },
+        "links": [],
+        "assets": {
+            "data": {
+                "href": f"s3://saferplaces.co/climate/seasonal/{i}.nc",
+                "type": "application/netcdf",
+                "roles": ["data"],
+            }
+        },
+    }
+
+
+async def one_by_one(client, items, collection, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def create(item):
+        async with semaphore:
+            response = await client.post(f"/collections/{collection}/items", json=item)
+            return response.status_code < 400
+
+    return sum(await asyncio.gather(*(create(item) for item in items)))
+
+
+async def bulk(client, items, collection, batch_size):
+    response = await client.post(
+        f"/collections/{collection}/bulk_items",
+        params={"batch_size": batch_size},
+        json={"type": "FeatureCollection", "features": items},
+    )
+    response.raise_for_status()
+    return response.json()["created"]
+
+
+async def cleanup(client, items, collection, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def delete(item):
+        async with semaphore:
+            await client.delete(f"/collections/{collection}/items/{item['id']}")
+
+    await asyncio.gather(*(delete(item) for item in items))
+
+
+async def main(args):
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=600) as client:
+        runs = [("one-by-one", None)] + [(f"bulk {size}", size) for size in args.batch_size]
+        print(f"{'path':<16}{'items':>8}{'created':>9}{'seconds':>10}{'items/s':>10}")
+        for run, (name, batch_size) in enumerate(runs):
+            items = [make_item(run, i, args.collection) for i in range(args.items)]
+            start = time.perf_counter()
+            if batch_size is None:
+                done = await one_by_one(client, items, args.collection, args.concurrency)
+            else:
+                done = await bulk(client, items, args.collection, batch_size)
+            elapsed = time.perf_counter() - start
+            print(f"{name:<16}{args.items:>8}{done:>9}{elapsed:>10.2f}{args.items / elapsed:>10.0f}")
+            await cleanup(client, items, args.collection, args.concurrency)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:8083")
+    parser.add_argument("--collection", default="seasonal_forecasts")
+    parser.add_argument("--items", type=int, default=5000)
+    parser.add_argument("--batch-size", type=int, nargs="+", default=[100, 500, 1000])
+    parser.add_argument("--concurrency", type=int, default=20)
+    asyncio.run(main(parser.parse_args()))
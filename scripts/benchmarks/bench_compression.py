@@ -0,0 +1,111 @@
+"""CPU cost vs bytes saved of the response compressions on item pages.
+
+Encodes pages of synthetic seasonal-forecast items as the search endpoint
+does, then compresses them with every content coding of
+stac_fastapi.demo.compression at a few levels, whole and chunked as streamed
+pages are (one flush per `--chunk` features):
+
+    python scripts/benchmarks/bench_compression.py --pages 10 100 1000
+
+`ms` is the compression time of one page, `MB/s` the input throughput and
+`saved` the share of bytes not sent. Pick the levels with the COMPRESSION_*
+settings.
+"""
+import argparse
+import timeit
+
+from stac_fastapi.demo.compression import (
+    BrotliCompressor,
+    GzipCompressor,
+    ZstdCompressor,
+    compress,
+    zstandard,
+)
+from stac_fastapi.demo.encoding import encode, item_collection_response
+
+
+def make_item(i):
+    """A seasonal-forecast item as returned by the search endpoint."""
+    issue_date = f"2024{i % 12 + 1:02d}"
+    return {
+        "type": "Feature",
+        "stac_version": "1.0.0",
+        "stac_extensions": [],
+        "id": f"seasonal_forecast_{i}",
+        "collection": "seasonal_forecasts",
+        "geometry": {
+            "type": "Polygon",
+            "coordinates": [[[6.0, 36.0], [19.0, 36.0], [19.0, 47.5], [6.0, 47.5], [6.0, 36.0]]],
+        },
+        "bbox": [6.0, 36.0, 19.0, 47.5],
+        "properties": {
+            "datetime": f"2024-{i % 12 + 1:02d}-01T00:00:00Z",
+            "issue_date": issue_date,
+            "model": 400 + i % 20,
+            "lead_time": i % 7,
+            "created": "2024-02-03T10:12:00Z",
+            "updated": "2024-02-03T10:12:00Z",
+        },
+        "links": [
+            {"rel": "self", "href": f"http://localhost:8083/collections/seasonal_forecasts/items/seasonal_forecast_{i}"},
+            {"rel": "collection", "href": "http://localhost:8083/collections/seasonal_forecasts"},
+        ],
+        "assets": {
+            "data": {
+                "href": f"s3://saferplaces.co/climate/seasonal/{issue_date}/{i}.nc",
+                "type": "application/netcdf",
+                "roles": ["data"],
+            }
+        },
+    }
+
+
+def codecs():
+    yield "gzip 1", lambda: GzipCompressor(1)
+    yield "gzip 6", lambda: GzipCompressor(6)
+    yield "gzip 9", lambda: GzipCompressor(9)
+    yield "br 1", lambda: BrotliCompressor(1)
+    yield "br 4", lambda: BrotliCompressor(4)
+    yield "br 6", lambda: BrotliCompressor(6)
+    if zstandard is not None:
+        yield "zstd 1", lambda: ZstdCompressor(1)
+        yield "zstd 3", lambda: ZstdCompressor(3)
+        yield "zstd 9", lambda: ZstdCompressor(9)
+
+
+def chunked(chunks, factory):
+    compressor = factory()
+    out = [compressor.compress(chunk) + compressor.flush() for chunk in chunks[:-1]]
+    out.append(compressor.compress(chunks[-1]) + compressor.finish())
+    return b"".join(out)
+
+
+def main(args):
+    print(f"{'page':>6}{'codec':>10}{'bytes':>12}{'ms':>9}{'MB/s':>9}{'saved':>8}{'streamed':>11}{'ms':>9}")
+    for page in args.pages:
+        items = [make_item(i) for i in range(page)]
+        body = item_collection_response(items, []).body
+        features = [encode(item) for item in items]
+        chunks = [b",".join(features[i:i + args.chunk]) for i in range(0, page, args.chunk)]
+        encode_ms = min(timeit.repeat(lambda: encode(items), number=args.number, repeat=3)) / args.number * 1000
+        print(f"{page:>6}{'identity':>10}{len(body):>12}{encode_ms:>9.2f}{'(encode)':>9}")
+        for name, factory in codecs():
+            size = len(compress(body, factory))
+            seconds = min(timeit.repeat(lambda: compress(body, factory), number=args.number, repeat=3)) / args.number
+            streamed = len(chunked(chunks, factory))
+            streamed_seconds = min(
+                timeit.repeat(lambda: chunked(chunks, factory), number=args.number, repeat=3)
+            ) / args.number
+            print(
+                f"{page:>6}{name:>10}{size:>12}{seconds * 1000:>9.2f}"
+                f"{len(body) / seconds / 1e6:>9.0f}{1 - size / len(body):>8.0%}"
+                f"{streamed:>11}{streamed_seconds * 1000:>9.2f}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--chunk", type=int, default=100, help="features per streamed chunk")
+    parser.add_argument("--number", type=int, default=20, help="timed runs per measure")
+    main(parser.parse_args())
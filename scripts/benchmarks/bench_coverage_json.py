@@ -0,0 +1,135 @@
+"""Time, memory and size of the CoverageJSON of a multi-model cube.
+
+Encodes the merged datasets of `--models` seasonal-forecast models (see
+s3_standin.py) the way the cube endpoint does, streaming with
+coverage_json.encode (`json` and `base64` ranges), against the previous
+encoder, which built the document from `.values.tolist()` and `json.dumps`:
+
+    python scripts/benchmarks/bench_coverage_json.py --models 12 --ny 180 --nx 240
+
+`peak MB` is the largest memory allocated while encoding, as tracemalloc
+sees it, the output not counted for the streaming encoders.
+"""
+import argparse
+import base64
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import xarray as xr
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import coverage_json  # noqa: E402
+from s3_standin import model_dataset  # noqa: E402
+
+
+def tolist_encode(dataset):
+    """The document as the cube endpoint used to build it."""
+    coverage = {
+        "type": "Coverage",
+        "domain": {
+            "type": "Domain",
+            "domainType": "MultiExtentCoverage",
+            "axes": {
+                "x": {"values": dataset.geo_x.values.tolist()},
+                "y": {"values": dataset.geo_y.values.tolist()},
+                "z": {"values": dataset.geo_z.values.tolist()},
+                "t": {"values": dataset.time.values.tolist()},
+            },
+        },
+        "parameters": {},
+    }
+    for var in dataset.data_vars:
+        coverage["parameters"][var] = {
+            "type": "Parameter",
+            "description": var,
+            "unit": "Unknown",
+            "values": dataset[var].values.tolist(),
+        }
+    yield json.dumps(coverage).encode()
+
+
+def streaming(binary):
+    def encode(dataset):
+        return coverage_json.encode(dataset, binary=binary)
+
+    return encode
+
+
+ENCODERS = [
+    ("tolist", tolist_encode),
+    ("json", streaming(False)),
+    ("base64", streaming(True)),
+]
+
+
+def cube(models, **shape):
+    return xr.merge(
+        [model_dataset(model, **shape).rename_vars({"COUT": f"COUT_{model}"}) for model in models],
+        join="outer",
+    )
+
+
+def run(encode, dataset):
+    """Seconds and bytes written of one encoding."""
+    start = time.perf_counter()
+    size = sum(len(piece) for piece in encode(dataset))
+    return time.perf_counter() - start, size
+
+
+def peak_memory(encode, dataset):
+    """Largest memory allocated by one encoding, traced apart as it slows it down."""
+    tracemalloc.start()
+    for _ in encode(dataset):
+        pass
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def check(dataset):
+    """The streamed documents decode to the dataset, missing values as null."""
+    name = next(iter(dataset.data_vars))
+    values = dataset[name].values
+    document = json.loads(b"".join(coverage_json.encode(dataset)))
+    ndarray = document["ranges"][name]
+    assert ndarray["shape"] == list(values.shape)
+    decoded = np.array([np.nan if v is None else v for v in ndarray["values"]], dtype=values.dtype)
+    np.testing.assert_array_equal(decoded.reshape(values.shape), values)
+    document = json.loads(b"".join(coverage_json.encode(dataset, binary=True)))
+    ndarray = document["ranges"][name]
+    decoded = np.frombuffer(base64.b64decode(ndarray["values"]), dtype=ndarray["valuesType"])
+    np.testing.assert_array_equal(decoded.reshape(values.shape), values)
+
+
+def main(args):
+    dataset = cube(range(400, 400 + args.models), ny=args.ny, nx=args.nx)
+    cells = sum(variable.size for variable in dataset.data_vars.values())
+    print(
+        f"{args.models} models of {args.ny}x{args.nx} cells, {cells / 1e6:.1f}M values, "
+        f"{dataset.nbytes / 1e6:.0f} MB in memory"
+    )
+    check(dataset)
+    print(f"{'encoder':<10}{'p50 ms':>10}{'peak MB':>10}{'out MB':>10}{'MB/s':>10}")
+    for name, encode in ENCODERS:
+        runs = [run(encode, dataset) for _ in range(args.repeat)]
+        elapsed, size = statistics.median(elapsed for elapsed, _ in runs), runs[0][1]
+        peak = peak_memory(encode, dataset)
+        print(
+            f"{name:<10}{elapsed * 1000:>10.0f}{peak / 1e6:>10.0f}{size / 1e6:>10.1f}"
+            f"{size / 1e6 / elapsed:>10.0f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--models", type=int, default=12)
+    parser.add_argument("--ny", type=int, default=180)
+    parser.add_argument("--nx", type=int, default=240)
+    parser.add_argument("--repeat", type=int, default=3)
+    main(parser.parse_args())
@@ -0,0 +1,87 @@
+"""Sequential vs concurrent asset reads of the climate EED cube endpoint.
+
+Writes a dozen model NetCDF files to a local S3 stand-in injecting per-request
+latency (see s3_standin.py) and reads them with climate_eed_service's
+`fetch_datasets` at increasing worker counts:
+
+    python scripts/benchmarks/bench_cube_fetch.py --models 12 --latency 0.05
+
+`workers 1` is the former one-asset-at-a-time loop. Only the downloads
+overlap: h5py decodes one file at a time whatever the thread, so the `decode`
+line (every file read with no latency) is the floor. The `cancel` line puts
+a missing file first, whose failed read fails the fetch, and counts the reads
+that still ran.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import pystac
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+# every run reads from the stand-in, see bench_asset_cache.py for the cache
+os.environ["CUBE_CACHE_SIZE"] = "0"
+
+from climate_eed_service import fetch_datasets  # noqa: E402
+from s3_standin import LatencyS3FileSystem, write_models  # noqa: E402
+
+
+def make_items(hrefs):
+    items = []
+    for model, href in hrefs.items():
+        item = pystac.Item(
+            f"seasonal_forecast_{model}", None, None, datetime(2024, 2, 1), {"model": model}
+        )
+        item.add_asset("data", pystac.Asset(href, media_type="application/netcdf"))
+        items.append(item)
+    return items
+
+
+def main(args):
+    with tempfile.TemporaryDirectory() as root:
+        hrefs = write_models(root, range(400, 400 + args.models))
+        items = make_items(hrefs)
+        local = LatencyS3FileSystem(root, latency=0, bandwidth=float("inf"))
+        start = time.perf_counter()
+        fetch_datasets(local, items, workers=1)
+        decode = time.perf_counter() - start
+
+        fs = LatencyS3FileSystem(root, latency=args.latency, bandwidth=args.bandwidth * 1e6)
+        print(f"{args.models} models, {args.latency * 1000:.0f} ms per request, {args.bandwidth:.0f} MB/s")
+        print(f"{'workers':>8}{'p50 ms':>10}{'min ms':>10}{'requests':>10}{'MB':>8}")
+        print(f"{'decode':>8}{decode * 1000:>10.0f}")
+        for workers in args.workers:
+            runs = []
+            for _ in range(args.repeat):
+                fs.reset_stats()
+                start = time.perf_counter()
+                datasets = fetch_datasets(fs, items, workers=workers)
+                runs.append(time.perf_counter() - start)
+                assert len(datasets) == len(items)
+            print(
+                f"{workers:>8}{statistics.median(runs) * 1000:>10.0f}{min(runs) * 1000:>10.0f}"
+                f"{fs.stats['requests']:>10}{fs.stats['bytes'] / 1e6:>8.1f}"
+            )
+
+        fs.reset_stats()
+        missing = make_items({"missing": "s3://bench/missing.nc"})
+        try:
+            fetch_datasets(fs, missing + items, workers=2)
+        except FileNotFoundError:
+            pass
+        time.sleep(args.latency * 10)
+        print(f"cancel: {fs.stats['requests']} of {len(items)} files read after a failed read")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--models", type=int, default=12)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per request")
+    parser.add_argument("--bandwidth", type=float, default=100, help="MB/s per request")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8, 12])
+    parser.add_argument("--repeat", type=int, default=3)
+    main(parser.parse_args())
@@ -0,0 +1,103 @@
+"""Bytes read and latency of climate EED cube requests, small vs full.
+
+Serves model NetCDF files from the local S3 stand-in (see s3_standin.py) and
+reads them through climate_eed_service's `fetch_datasets` with the selections
+of typical cube requests, from the full grid down to a single point:
+
+    python scripts/benchmarks/bench_cube_subset.py --models 12 --latency 0.05
+
+Every request runs in the three read modes: `download` fetches the objects
+whole and decodes the selected chunks, `ranges` (objects over
+CUBE_DOWNLOAD_MAX) reads the HDF5 metadata remotely in `--block-size`
+blocks, then fetches the selected chunks only, and `references` reads items
+indexed with chunk references (index_assets.py): the manifest, then the
+selected chunks. `requests` and `MB` are the GETs and bytes fetched from the
+stand-in, summed over the models.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import h5py
+import pystac
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+# every run reads from the stand-in, see bench_asset_cache.py for the cache
+os.environ["CUBE_CACHE_SIZE"] = "0"
+
+import climate_eed_service  # noqa: E402
+from bench_cube_fetch import make_items  # noqa: E402
+from chunk_references import references  # noqa: E402
+from climate_eed_service import fetch_datasets, parse_cube_query  # noqa: E402
+from s3_standin import LatencyS3FileSystem, write_models  # noqa: E402
+
+REQUESTS = [
+    ("full", {}),
+    ("one model", {"parameter-name": "COUT_400"}),
+    ("region", {"bbox": "9,39,13,43"}),
+    ("region day", {"bbox": "9,39,13,43", "datetime": "2024-02-03T00:00:00Z"}),
+    ("level", {"z": "850"}),
+    ("point", {"bbox": "10,40,10,40"}),
+    ("point day", {"bbox": "10,40,10,40", "datetime": "2024-02-03T00:00:00Z", "z": "850"}),
+]
+
+
+def main(args):
+    climate_eed_service.CUBE_BLOCK_SIZE = args.block_size
+    with tempfile.TemporaryDirectory() as root:
+        hrefs = write_models(root, range(400, 400 + args.models), ny=args.ny, nx=args.nx)
+        items = make_items(hrefs)
+        fs = LatencyS3FileSystem(root, latency=args.latency, bandwidth=args.bandwidth * 1e6)
+        indexed = make_items(hrefs)
+        for item, href in zip(indexed, hrefs.values()):
+            with h5py.File(fs.local_path(href), "r") as h5file:
+                manifest = references(h5file, href)
+            with open(fs.local_path(href) + ".refs.json", "w") as f:
+                json.dump(manifest, f)
+            item.add_asset(
+                "references",
+                pystac.Asset(href + ".refs.json", media_type="application/json", roles=["references"]),
+            )
+        size = sum(fs.info(href)["size"] for href in hrefs.values())
+        print(
+            f"{args.models} models of {args.ny}x{args.nx} cells, {size / 1e6:.1f} MB, "
+            f"{args.latency * 1000:.0f} ms per request, {args.bandwidth:.0f} MB/s"
+        )
+        print(f"{'request':<12}{'mode':>12}{'p50 ms':>10}{'requests':>10}{'MB':>8}{'cells':>12}")
+        for name, params in REQUESTS:
+            query = parse_cube_query(params)
+            modes = (
+                ("download", float("inf"), items),
+                ("ranges", 0, items),
+                ("references", 0, indexed),
+            )
+            for mode, download_max, mode_items in modes:
+                climate_eed_service.CUBE_DOWNLOAD_MAX = download_max
+                runs = []
+                for _ in range(args.repeat):
+                    fs.reset_stats()
+                    start = time.perf_counter()
+                    datasets = fetch_datasets(fs, mode_items, query, workers=args.workers)
+                    runs.append(time.perf_counter() - start)
+                cells = sum(var.size for dataset in datasets for var in dataset.data_vars.values())
+                print(
+                    f"{name:<12}{mode:>12}{statistics.median(runs) * 1000:>10.0f}"
+                    f"{fs.stats['requests']:>10}{fs.stats['bytes'] / 1e6:>8.2f}{cells:>12}"
+                )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--models", type=int, default=12)
+    parser.add_argument("--ny", type=int, default=360)
+    parser.add_argument("--nx", type=int, default=480)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per request")
+    parser.add_argument("--bandwidth", type=float, default=100, help="MB/s per request")
+    parser.add_argument("--block-size", type=int, default=16 * 2**10)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=3)
+    main(parser.parse_args())
@@ -0,0 +1,115 @@
+"""Per-item cost of turning mongo documents into response bytes.
+
+Compares, on synthetic seasonal-forecast items decoded from raw BSON:
+
+    roundtrip  json.loads(bson.json_util.dumps(doc)) + json.dumps (old path)
+    orjson     stac_fastapi.demo.encoding.encode on a projected document
+    rawbson    RawBSONDocument decoded to a dict, then encode
+
+and the cost of adding the inferred links to a page:
+
+    itemlinks  stac_fastapi.types.links.ItemLinks per item (the old serializer)
+    templated  stac_fastapi.demo.serializers.ItemSerializer
+
+    python scripts/benchmarks/bench_encoding.py --items 1000
+"""
+import argparse
+import json
+import timeit
+
+import bson
+from bson import json_util
+from bson.raw_bson import RawBSONDocument
+
+from stac_fastapi.types.links import ItemLinks, resolve_links
+
+from stac_fastapi.demo.encoding import encode
+from stac_fastapi.demo.serializers import ItemSerializer
+
+BASE_URL = "http://localhost:8083/"
+
+
+def make_item(i):
+    """A seasonal-forecast item as stored by the transactions client."""
+    return {
+        "_id": bson.ObjectId(),
+        "type": "Feature",
+        "stac_version": "1.0.0",
+        "stac_extensions": [],
+        "id": f"seasonal_forecast_{i}",
+        "collection": "seasonal_forecasts",
+        "geometry": {
+            "type": "Polygon",
+            "coordinates": [[[6.0, 36.0], [19.0, 36.0], [19.0, 47.5], [6.0, 47.5], [6.0, 36.0]]],
+        },
+        "bbox": [6.0, 36.0, 19.0, 47.5],
+        "properties": {
+            "datetime": "2024-02-01T00:00:00Z",
+            "issue_date": "202402",
+            "model": 400 + i % 20,
+            "lead_time": i % 7,
+            "created": "2024-02-03T10:12:00Z",
+            "updated": "2024-02-03T10:12:00Z",
+        },
+        "links": [],
+        "assets": {
+            "data": {
+                "href": f"s3://saferplaces.co/climate/seasonal/{i}.nc",
+                "type": "application/netcdf",
+                "roles": ["data"],
+            }
+        },
+    }
+
+
+def main(args):
+    raw = [bson.encode(make_item(i)) for i in range(args.items)]
+    projected = [bson.encode({k: v for k, v in make_item(i).items() if k != "_id"}) for i in range(args.items)]
+
+    def roundtrip():
+        docs = [json.loads(json_util.dumps(bson.decode(b))) for b in raw]
+        return json.dumps({"type": "FeatureCollection", "features": docs}).encode()
+
+    def orjson_path():
+        docs = [bson.decode(b) for b in projected]
+        return encode({"type": "FeatureCollection", "features": docs})
+
+    def rawbson_path():
+        docs = [bson.decode(RawBSONDocument(b).raw) for b in projected]
+        return encode({"type": "FeatureCollection", "features": docs})
+
+    print(f"{'path':<12}{'us/item':>10}{'bytes/item':>12}")
+    for name, func in (("roundtrip", roundtrip), ("orjson", orjson_path), ("rawbson", rawbson_path)):
+        best = min(timeit.repeat(func, number=args.number, repeat=args.repeat))
+        per_item = best / args.number / args.items * 1e6
+        size = len(func()) / args.items
+        print(f"{name:<12}{per_item:>10.2f}{size:>12.0f}")
+
+    def itemlinks():
+        docs = [bson.decode(b) for b in projected]
+        for doc in docs:
+            links = ItemLinks(
+                collection_id=doc["collection"], item_id=doc["id"], base_url=BASE_URL
+            ).create_links()
+            if doc["links"]:
+                links += resolve_links(doc["links"], BASE_URL)
+            doc["links"] = links
+        return encode({"type": "FeatureCollection", "features": docs})
+
+    def templated():
+        docs = ItemSerializer(BASE_URL).page([bson.decode(b) for b in projected])
+        return encode({"type": "FeatureCollection", "features": docs})
+
+    for name, func in (("itemlinks", itemlinks), ("templated", templated)):
+        best = min(timeit.repeat(func, number=args.number, repeat=args.repeat))
+        per_item = best / args.number / args.items * 1e6
+        size = len(func()) / args.items
+        print(f"{name:<12}{per_item:>10.2f}{size:>12.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=1000)
+    parser.add_argument("--number", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=5)
+    main(parser.parse_args())
@@ -0,0 +1,121 @@
+"""Local stand-in for the S3 bucket of the climate EED service benchmarks.
+
+`LatencyS3FileSystem` serves `s3://bucket/key` from a local directory the way
+s3fs reads objects: files are fsspec buffered files fetching byte ranges, one
+GET per range, with s3fs' default block size and readahead cache. Every GET
+waits `latency` seconds plus the transfer time at `bandwidth` bytes/s and is
+counted, with its bytes, in `stats`; `cat_ranges` sends its GETs concurrently
+like s3fs.
+
+`write_models` fills the directory with one seasonal-forecast NetCDF file per
+model, shaped like the ones the service reads (COUT over time, geo_z, geo_y,
+geo_x).
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+from fsspec.spec import AbstractBufferedFile, AbstractFileSystem
+
+
+class LatencyS3FileSystem(AbstractFileSystem):
+    protocol = ("s3", "s3a")
+    # s3fs.S3FileSystem defaults
+    default_block_size = 50 * 2**20
+    default_cache_type = "readahead"
+
+    def __init__(self, root, latency=0.05, bandwidth=100e6, **kwargs):
+        super().__init__(**kwargs)
+        self.root = root
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "bytes": 0}
+
+    def local_path(self, path):
+        return os.path.join(self.root, self._strip_protocol(path))
+
+    def info(self, path, **kwargs):
+        """HEAD an object."""
+        size = os.path.getsize(self.local_path(path))
+        time.sleep(self.latency)
+        with self._lock:
+            self.stats["requests"] += 1
+        return {"name": self._strip_protocol(path), "size": size, "type": "file"}
+
+    def get_range(self, path, start, end):
+        """GET `bytes=start-(end-1)` of an object."""
+        with open(self.local_path(path), "rb") as f:
+            f.seek(start)
+            data = f.read(end - start)
+        time.sleep(self.latency + len(data) / self.bandwidth)
+        with self._lock:
+            self.stats["requests"] += 1
+            self.stats["bytes"] += len(data)
+        return data
+
+    def cat_ranges(self, paths, starts, ends, max_gap=None, on_error="return", **kwargs):
+        """Concurrent GETs, as s3fs gathers them."""
+        with ThreadPoolExecutor(max_workers=min(len(paths), 32) or 1) as pool:
+            return list(pool.map(self.get_range, paths, starts, ends))
+
+    def reset_stats(self):
+        with self._lock:
+            self.stats = {"requests": 0, "bytes": 0}
+
+    def _open(self, path, mode="rb", block_size=None, cache_type=None, cache_options=None, **kwargs):
+        return LatencyS3File(
+            self,
+            path,
+            mode,
+            block_size=block_size or self.default_block_size,
+            cache_type=cache_type or self.default_cache_type,
+            cache_options=cache_options,
+            **kwargs,
+        )
+
+
+class LatencyS3File(AbstractBufferedFile):
+    def _fetch_range(self, start, end):
+        return self.fs.get_range(self.path, start, end)
+
+
+def model_dataset(model, times=7, levels=3, ny=120, nx=160, seed=0):
+    """A seasonal forecast of one model: COUT over (time, geo_z, geo_y, geo_x)."""
+    rng = np.random.default_rng(seed + model)
+    cout = rng.normal(280.0, 10.0, size=(times, levels, ny, nx)).astype("float32")
+    # land cells have no value
+    cout[:, :, : ny // 10, : nx // 10] = np.nan
+    return xr.Dataset(
+        {"COUT": (("time", "geo_z", "geo_y", "geo_x"), cout)},
+        coords={
+            "time": pd.date_range("2024-02-01", periods=times, freq="D"),
+            "geo_z": np.array([1000.0, 850.0, 500.0, 300.0, 200.0][:levels]),
+            "geo_y": np.linspace(36.0, 47.5, ny),
+            "geo_x": np.linspace(6.0, 19.0, nx),
+        },
+    )
+
+
+def write_models(root, models, bucket="bucket", **shape):
+    """Write one NetCDF file per model, return their hrefs by model."""
+    os.makedirs(os.path.join(root, bucket), exist_ok=True)
+    hrefs = {}
+    for model in models:
+        key = f"{bucket}/seasonal/202402/{model}.nc"
+        path = os.path.join(root, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        dataset = model_dataset(model, **shape)
+        ny, nx = dataset.sizes["geo_y"], dataset.sizes["geo_x"]
+        chunks = (1, 1, min(ny, 40), min(nx, 40))
+        dataset.to_netcdf(
+            path,
+            engine="h5netcdf",
+            encoding={"COUT": {"chunksizes": chunks, "zlib": True, "complevel": 1}},
+        )
+        hrefs[model] = f"s3://{key}"
+    return hrefs
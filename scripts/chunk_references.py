@@ -0,0 +1,248 @@
+"""Chunk reference manifests of the NetCDF assets.
+
+Opening a NetCDF (HDF5) object remotely walks its metadata and chunk index a
+few bytes at a time, each read a round trip under h5py's global lock. A
+manifest records what a reader needs from that walk once, at ingest: the
+variables as Zarr (v2) `.zarray`/`.zattrs` documents and the byte range of
+each of their chunks in the object. It is kerchunk's version 1 reference
+format, which fsspec's `ReferenceFileSystem` reads too:
+
+    {"version": 1, "templates": {"u": "s3://bucket/key.nc"},
+     "refs": {".zgroup": "{...}", "COUT/.zarray": "{...}",
+              "COUT/0.0.0.0": ["{{u}}", offset, length], ...}}
+
+Variables stored in at most `inline_bytes` are copied into the manifest, as
+`base64:` strings, so the coordinates cost no request; the chunks of the
+data variables are always references, keeping manifests small.
+
+`ReferenceStore` is the reading side: a Zarr store of a manifest xarray opens
+without any request, its `prefetch` fetching the chunks a selection needs in
+one batch of coalesced range requests. Chunks are decoded by numcodecs, out
+of h5py's lock.
+
+Only the filters Zarr has codecs for are supported (deflate and shuffle), as
+are numeric variables of the root group: `references` raises ValueError on
+anything else and the asset is read as HDF5.
+"""
+import base64
+import json
+import math
+import re
+from bisect import bisect_right
+from collections.abc import MutableMapping
+
+import h5py
+import numpy as np
+
+INLINE_BYTES = 64 * 2**10
+
+# HDF5 dimension scale and netCDF bookkeeping attributes
+_INTERNAL_ATTRIBUTES = {
+    "CLASS",
+    "NAME",
+    "REFERENCE_LIST",
+    "DIMENSION_LIST",
+    "_Netcdf4Dimid",
+    "_Netcdf4Coordinates",
+    "_NCProperties",
+    "_nc3_strict",
+}
+# NAME of the datasets netCDF creates for dimensions without a coordinate
+_NOT_A_VARIABLE = "This is a netCDF dimension but not a netCDF variable"
+_TEMPLATE = re.compile(r"{{(\w+)}}")
+
+
+def references(h5file, url, inline_bytes=INLINE_BYTES):
+    """Manifest of the variables of an open NetCDF file stored at `url`."""
+    refs = {
+        ".zgroup": _json({"zarr_format": 2}),
+        ".zattrs": _json(_attributes(h5file.attrs)),
+    }
+    for name, dataset in h5file.items():
+        if not isinstance(dataset, h5py.Dataset):
+            raise ValueError(f"{url}: groups are not supported ({name})")
+        if _attribute(dataset.attrs.get("NAME", "")).startswith(_NOT_A_VARIABLE):
+            continue
+        refs.update(_variable_references(name, dataset, inline_bytes))
+    return {"version": 1, "templates": {"u": url}, "refs": refs}
+
+
+def _variable_references(name, dataset, inline_bytes):
+    if dataset.dtype.kind not in "biuf":
+        raise ValueError(f"{name}: {dataset.dtype} variables are not supported")
+    if dataset.compression not in (None, "gzip") or dataset.fletcher32 or dataset.scaleoffset:
+        raise ValueError(f"{name}: HDF5 filters other than deflate and shuffle are not supported")
+    attrs = _attributes(dataset.attrs)
+    attrs["_ARRAY_DIMENSIONS"] = _dimensions(name, dataset)
+    fill_value = attrs.pop("_FillValue", None)
+    chunks = dataset.chunks or dataset.shape
+    refs = {f"{name}/.zattrs": _json(attrs)}
+    stored = list(_stored_chunks(dataset))
+    inline = sum(size for _, _, size in stored) <= inline_bytes
+    for coord, offset, size in stored:
+        key = f"{name}/" + (".".join(str(c // n) for c, n in zip(coord, chunks)) or "0")
+        if inline or offset is None:
+            refs[key] = "base64:" + base64.b64encode(_chunk_bytes(dataset, coord)).decode()
+        else:
+            refs[key] = ["{{u}}", offset, size]
+    if fill_value is None and len(stored) < math.prod(-(-s // n) for s, n in zip(dataset.shape, chunks)):
+        # HDF5 reads never written chunks as the dataset fill value; xarray
+        # masks it then, as netCDF4 does with the default fill values
+        fill_value = dataset.fillvalue.item()
+    refs[f"{name}/.zarray"] = _json(
+        {
+            "zarr_format": 2,
+            "shape": list(dataset.shape),
+            "chunks": list(chunks),
+            "dtype": dataset.dtype.str,
+            "fill_value": _fill_value(fill_value),
+            "order": "C",
+            "filters": (
+                [{"id": "shuffle", "elementsize": dataset.dtype.itemsize}]
+                if dataset.shuffle else None
+            ),
+            "compressor": (
+                {"id": "zlib", "level": dataset.compression_opts}
+                if dataset.compression == "gzip" else None
+            ),
+        }
+    )
+    return refs
+
+
+def _stored_chunks(dataset):
+    """(first element, byte offset, size) of the chunks of a dataset in the file.
+
+    The offset is None for data stored in the object header (compact layout).
+    """
+    dsid = dataset.id
+    if dataset.chunks is None:
+        if dsid.get_storage_size():
+            yield (0,) * dataset.ndim, dsid.get_offset(), dsid.get_storage_size()
+        return
+    infos = []
+    if hasattr(dsid, "chunk_iter"):  # HDF5 1.14: one pass over the chunk index
+        dsid.chunk_iter(infos.append)
+    else:
+        infos = [dsid.get_chunk_info(i) for i in range(dsid.get_num_chunks())]
+    for info in infos:
+        if info.filter_mask:
+            raise ValueError(f"{dataset.name}: chunks skipping filters are not supported")
+        yield info.chunk_offset, info.byte_offset, info.size
+
+
+def _chunk_bytes(dataset, coord):
+    if dataset.chunks is None:
+        return np.ascontiguousarray(dataset[()]).tobytes()
+    return dataset.id.read_direct_chunk(coord)[1]
+
+
+def _dimensions(name, dataset):
+    if dataset.is_scale:
+        return [name]
+    return [
+        dim[0].name.rpartition("/")[2] if len(dim) else f"phony_dim_{i}"
+        for i, dim in enumerate(dataset.dims)
+    ]
+
+
+def _attributes(attrs):
+    return {
+        name: _attribute(value)
+        for name, value in attrs.items()
+        if name not in _INTERNAL_ATTRIBUTES
+    }
+
+
+def _attribute(value):
+    if isinstance(value, bytes):
+        return value.decode()
+    if isinstance(value, np.ndarray):
+        return [_attribute(v) for v in value.tolist()]
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _fill_value(value):
+    """A fill value as Zarr metadata spells it, non finite floats as strings."""
+    if isinstance(value, float) and not math.isfinite(value):
+        return "NaN" if math.isnan(value) else ("Infinity" if value > 0 else "-Infinity")
+    return value
+
+
+def _json(value):
+    return json.dumps(value, separators=(",", ":"))
+
+
+def coalesce(ranges, gap):
+    """Merge sorted byte ranges less than `gap` apart, to fetch fewer of them."""
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start - merged[-1][1] < gap:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+class ReferenceStore(MutableMapping):
+    """Read-only Zarr store of a manifest.
+
+    `cat_ranges(url, ranges)` returns the bytes of `(start, end)` ranges of
+    the object at `url`. Chunks are fetched by `prefetch`, or one at a time
+    when Zarr asks for one it didn't get.
+    """
+
+    def __init__(self, manifest, cat_ranges, gap=0):
+        if manifest.get("version") != 1:
+            raise ValueError(f"Unsupported reference manifest version {manifest.get('version')}")
+        self.refs = manifest["refs"]
+        self.templates = manifest.get("templates", {})
+        self.cat_ranges = cat_ranges
+        self.gap = gap
+        self.chunks = {}
+
+    def metadata(self, name):
+        """The `.zarray` document of a variable."""
+        return json.loads(self[f"{name}/.zarray"])
+
+    def prefetch(self, keys):
+        """Fetch chunks in one batch per object, ranges less than `gap` apart merged."""
+        wanted = {}
+        for key in keys:
+            ref = self.refs.get(key)
+            if isinstance(ref, list) and key not in self.chunks:
+                url, offset, size = ref
+                url = _TEMPLATE.sub(lambda m: self.templates[m.group(1)], url)
+                wanted.setdefault(url, []).append((key, offset, offset + size))
+        for url, chunks in wanted.items():
+            ranges = [tuple(r) for r in coalesce([(s, e) for _, s, e in chunks], self.gap)]
+            parts = self.cat_ranges(url, ranges)
+            starts = [start for start, _ in ranges]
+            for key, start, end in chunks:
+                i = bisect_right(starts, start) - 1
+                offset = start - starts[i]
+                self.chunks[key] = parts[i][offset:offset + end - start]
+
+    def __getitem__(self, key):
+        ref = self.refs[key]  # a missing chunk holds the fill value
+        if isinstance(ref, str):
+            if ref.startswith("base64:"):
+                return base64.b64decode(ref[len("base64:"):])
+            return ref.encode()
+        if key not in self.chunks:
+            self.prefetch([key])
+        return self.chunks[key]
+
+    def __iter__(self):
+        return iter(self.refs)
+
+    def __len__(self):
+        return len(self.refs)
+
+    def __setitem__(self, key, value):
+        raise TypeError("ReferenceStore is read-only")
+
+    def __delitem__(self, key):
+        raise TypeError("ReferenceStore is read-only")
@@ -1,56 +1,372 @@
 # Basic flask app to serve the EED climate data
 # """
-from flask import Flask, request, jsonify
+import io
+import itertools
+import os
+import threading
+from bisect import bisect_right
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from functools import partial
+
+from flask import Flask, Response, request, jsonify
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, generate_latest
 from pystac_client import Client
+from pystac_client.exceptions import APIError
+import h5netcdf
+import h5py
+import numpy as np
+import pandas as pd
 import xarray as xr
 import s3fs
 import json
 
+import coverage_json
+from asset_cache import AssetCache
+from chunk_references import ReferenceStore, coalesce
 
-def xarray_to_prs_coverage_json(dataset):
-    # Extract necessary information from xarray dataset
-    latitudes = dataset.geo_y.values.tolist()
-    longitudes = dataset.geo_x.values.tolist()
-    altitudes = dataset.geo_z.values.tolist()
-    times = dataset.time.values.tolist()
-    data_vars = list(dataset.data_vars)
-
-    # Construct PRS.Coverage+JSON structure
-    coverage_json = {
-        "type": "Coverage",
-        "domain": {
-            "type": "Domain",
-            "domainType": "MultiExtentCoverage",
-            "axes": {
-                "x": {"values": longitudes},    #"bounds": [min(longitudes), max(longitudes)], "num": len(longitudes)},
-                "y": {"values": latitudes},     #"bounds": [min(latitudes), max(latitudes)], "num": len(latitudes)},
-                "z": {"values": altitudes},     #"bounds": [min(altitudes), max(altitudes)], "num": len(altitudes)},
-                "t": {"values": times},         #"bounds": [min(times), max(times)], "num": len(times)}
-            }
-        },
-        "parameters": {}
-    }
+# STAC API the items of the cubes are searched in
+STAC_API_URL = os.environ.get("STAC_API_URL", "http://127.0.0.1:8083/")
+# assets read at once by one cube request, and by all of them together
+CUBE_FETCH_WORKERS = int(os.environ.get("CUBE_FETCH_WORKERS", 8))
+CUBE_MAX_FETCHES = int(os.environ.get("CUBE_MAX_FETCHES", 32))
+
+# subsets of larger objects are read remotely rather than downloaded: the
+# HDF5 metadata in blocks of CUBE_BLOCK_SIZE, then the chunks they need at
+# once, merging ranges less than CUBE_COALESCE_GAP apart. Each metadata read
+# is a round trip under h5py's lock, so small objects are faster downloaded.
+CUBE_DOWNLOAD_MAX = int(os.environ.get("CUBE_DOWNLOAD_MAX", 64 * 2**20))
+CUBE_BLOCK_SIZE = int(os.environ.get("CUBE_BLOCK_SIZE", 16 * 2**10))
+CUBE_COALESCE_GAP = int(os.environ.get("CUBE_COALESCE_GAP", 16 * 2**10))
+
+_fetch_slots = threading.BoundedSemaphore(CUBE_MAX_FETCHES)
+# local copies of the assets, shared by the worker processes (asset_cache.py)
+asset_cache = AssetCache.from_environ()
+
+
+def parse_cube_query(args):
+    """Selection of a cube request, raising ValueError on malformed values.
+
+    parameter-name: comma separated variables, `COUT` or `COUT_<model>`
+    bbox:           minx,miny,maxx,maxy, a point when min == max
+    z:              a level, levels (1000,850), an interval (1000/300) or
+                    R<count>/<first>/<step>
+    datetime:       an instant or an interval, `..` for an open end
+    """
+    query = {}
+    if args.get('parameter-name'):
+        query['parameters'] = set(args['parameter-name'].split(','))
+    if args.get('bbox'):
+        bbox = [float(value) for value in args['bbox'].split(',')]
+        if len(bbox) != 4:
+            raise ValueError(f"bbox expects 4 values, got {args['bbox']}")
+        query['bbox'] = bbox
+    if args.get('z'):
+        z = args['z']
+        if z.startswith('R'):
+            count, first, step = z[1:].split('/')
+            query['z'] = [float(first) + i * float(step) for i in range(int(count))]
+        elif '/' in z:
+            low, high = sorted(float(value) for value in z.split('/'))
+            query['z'] = (low, high)
+        else:
+            query['z'] = [float(value) for value in z.split(',')]
+    if args.get('datetime'):
+        bounds = [
+            None if value in ('', '..') else pd.Timestamp(value)
+            for value in args['datetime'].split('/')
+        ]
+        if len(bounds) > 2:
+            raise ValueError(f"Invalid datetime {args['datetime']}")
+        # the files' times are naive UTC
+        bounds = [
+            bound.tz_convert('UTC').tz_localize(None) if bound is not None and bound.tz else bound
+            for bound in bounds
+        ]
+        query['datetime'] = (bounds[0], bounds[-1])
+    return query
+
+
+def _indexer(mask, values=None, target=None):
+    """isel indexer of a mask: a slice when contiguous, so h5py reads hyperslabs.
+
+    An empty mask selecting a single point (`target`) falls back to the
+    nearest value.
+    """
+    indices = np.flatnonzero(mask)
+    if not len(indices) and target is not None and len(values):
+        indices = np.array([np.abs(values - target).argmin()])
+    if len(indices) and indices[-1] - indices[0] + 1 == len(indices):
+        return slice(int(indices[0]), int(indices[-1]) + 1)
+    return indices
+
+
+def _between(values, low, high):
+    mask = np.ones(len(values), dtype=bool)
+    if low is not None:
+        mask &= values >= low
+    if high is not None:
+        mask &= values <= high
+    point = low if low is not None and low == high else None
+    return _indexer(mask, values, point)
+
+
+def selection(dataset, query):
+    """Variables and isel indexers of a query on a dataset."""
+    names = list(dataset.data_vars)
+    parameters = query.get('parameters')
+    if parameters:
+        names = [
+            name for name in names
+            if name in parameters or name.rpartition('_')[0] in parameters
+        ]
+    indexers = {}
+    if 'bbox' in query:
+        minx, miny, maxx, maxy = query['bbox']
+        indexers['geo_x'] = _between(dataset.geo_x.values, minx, maxx)
+        indexers['geo_y'] = _between(dataset.geo_y.values, miny, maxy)
+    if 'z' in query:
+        levels = dataset.geo_z.values
+        if isinstance(query['z'], tuple):
+            indexers['geo_z'] = _between(levels, *query['z'])
+        else:
+            indexers['geo_z'] = _indexer(np.isin(levels, query['z']))
+    if 'datetime' in query:
+        start, end = query['datetime']
+        times = dataset.time.values
+        indexers['time'] = _between(
+            times,
+            None if start is None else start.to_datetime64(),
+            None if end is None else end.to_datetime64(),
+        )
+    return names, indexers
+
+
+def subset(dataset, query):
+    """Apply the variables, bbox, levels and times of a query, lazily.
+
+    Only indexes the dataset: nothing is read until it is loaded.
+    """
+    names, indexers = selection(dataset, query)
+    return dataset[names].isel(indexers)
+
+
+def _chunk_coords(shape, chunks, dims, indexers):
+    """Grid positions of the chunks of an array an isel selection reads."""
+    blocks = []
+    for dim, size, chunk in zip(dims, shape, chunks):
+        indices = np.arange(size)[indexers.get(dim, slice(None))]
+        blocks.append(np.unique(indices // chunk).tolist())
+    return itertools.product(*blocks)
+
+
+def chunk_ranges(variable, dims, indexers):
+    """Byte ranges of the HDF5 chunks of `variable` an isel selection reads."""
+    if variable.chunks is None:
+        # contiguous: one range
+        offset = variable.id.get_offset()
+        return [] if offset is None else [(offset, offset + variable.id.get_storage_size())]
+    ranges = []
+    for coord in _chunk_coords(variable.shape, variable.chunks, dims, indexers):
+        info = variable.id.get_chunk_info_by_coord(
+            tuple(c * n for c, n in zip(coord, variable.chunks))
+        )
+        if info.byte_offset is not None:  # never written chunks hold the fill value
+            ranges.append((info.byte_offset, info.byte_offset + info.size))
+    return ranges
+
+
+def chunk_keys(store, name, dims, indexers):
+    """Zarr keys of the chunks of variable `name` an isel selection reads."""
+    metadata = store.metadata(name)
+    return [
+        f"{name}/" + (".".join(map(str, coord)) or "0")
+        for coord in _chunk_coords(metadata["shape"], metadata["chunks"], dims, indexers)
+    ]
+
+
+class RangeFile(io.RawIOBase):
+    """Read-only file of a remote object for h5py.
+
+    Serves prefetched ranges from memory and reads everything else in
+    `block_size` aligned blocks, both through `cat_ranges` (the asset cache).
+    """
+
+    def __init__(self, cat_ranges, size, block_size):
+        super().__init__()
+        self.cat_ranges = cat_ranges
+        self.size = size
+        self.block_size = block_size
+        self.pos = 0
+        self.starts = []
+        self.parts = []
+        self.blocks = {}
 
-    print("DATA VARS")
-    print(data_vars)
-    # Add data variables to PRS.Coverage+JSON structure
-    for var in data_vars:
-        coverage_json["parameters"][var] = {
-            "type": "Parameter",
-            "description": var,
-            "unit": "Unknown",
-            "values": dataset[var].values.tolist()
-        }
+    def prefetch(self, ranges):
+        """Fetch byte ranges in one batch, concurrently on s3fs."""
+        ranges = sorted(ranges)
+        self.starts = [start for start, _ in ranges]
+        self.parts = self.cat_ranges(ranges) if ranges else []
 
-    # return json.dumps(coverage_json)
-    return coverage_json
+    def readable(self):
+        return True
 
+    def seekable(self):
+        return True
 
+    def tell(self):
+        return self.pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            self.pos = offset
+        elif whence == io.SEEK_CUR:
+            self.pos += offset
+        else:
+            self.pos = self.size + offset
+        return self.pos
+
+    def readinto(self, buffer):
+        size = min(len(buffer), max(self.size - self.pos, 0))
+        i = bisect_right(self.starts, self.pos) - 1
+        if i >= 0 and self.pos + size <= self.starts[i] + len(self.parts[i]):
+            offset = self.pos - self.starts[i]
+            buffer[:size] = self.parts[i][offset:offset + size]
+        elif size:
+            buffer[:size] = self._read_blocks(self.pos, self.pos + size)
+        self.pos += size
+        return size
+
+    def _read_blocks(self, start, end):
+        first, last = start // self.block_size, (end - 1) // self.block_size
+        missing = [b for b in range(first, last + 1) if b not in self.blocks]
+        ranges = [
+            (b * self.block_size, min((b + 1) * self.block_size, self.size)) for b in missing
+        ]
+        if ranges:
+            self.blocks.update(zip(missing, self.cat_ranges(ranges)))
+        data = b"".join(self.blocks[b] for b in range(first, last + 1))
+        offset = start - first * self.block_size
+        return data[offset:offset + end - start]
+
+
+def open_references(fs, href, rename, query):
+    """Read a NetCDF asset through its chunk reference manifest at `href`.
+
+    The manifest holds the metadata, so only the chunks of the selection are
+    requested, in one batch (chunk_references.py).
+    """
+    manifest = json.loads(asset_cache.cat_file(fs, href))
+    store = ReferenceStore(manifest, partial(asset_cache.cat_ranges, fs), CUBE_COALESCE_GAP)
+    original = {new: old for old, new in rename.items()}
+    with xr.open_dataset(store, engine='zarr', consolidated=False) as dataset:
+        dataset = dataset.rename_vars(rename)
+        names, indexers = selection(dataset, query)
+        if not names:
+            return None
+        keys = []
+        for name in names:
+            keys += chunk_keys(store, original.get(name, name), dataset[name].dims, indexers)
+        with _fetch_slots:
+            store.prefetch(keys)
+        return dataset[names].isel(indexers).load()
+
+
+def open_item(fs, item, query=None):
+    """Read the NetCDF asset of a model item, COUT renamed COUT_<model>.
+
+    The selection of the query is applied before anything is loaded, so only
+    the chunks it covers are read and decoded. Items indexed at ingest are
+    read through the chunk references of their `references` asset. Otherwise
+    objects up to CUBE_DOWNLOAD_MAX bytes are downloaded whole first, and
+    larger ones are opened remotely: the chunks the selection covers are
+    looked up in the HDF5 chunk index and fetched in one batch before h5py
+    decodes them.
+    """
+    href = item.assets['data'].href
+    rename = {'COUT': f'COUT_{item.properties["model"]}'}
+    query = query or {}
+    if 'references' in item.assets:
+        return open_references(fs, item.assets['references'].href, rename, query)
+    subsetting = bool(set(query) & {'bbox', 'z', 'datetime'})
+    size = asset_cache.info(fs, href)['size']
+    if not subsetting or size <= CUBE_DOWNLOAD_MAX:
+        # download first: h5py holds a global lock around every call, including
+        # the reads it makes through a file object, which would serialize them
+        with _fetch_slots:
+            data = asset_cache.cat_file(fs, href)
+        with xr.open_dataset(io.BytesIO(data), engine='h5netcdf') as dataset:
+            selected = subset(dataset.rename_vars(rename), query)
+            return selected.load() if selected.data_vars else None
+
+    original = {new: old for old, new in rename.items()}
+    reader = RangeFile(partial(asset_cache.cat_ranges, fs, href), size, CUBE_BLOCK_SIZE)
+    with _fetch_slots:
+        with h5py.File(reader, 'r') as h5file:
+            store = xr.backends.H5NetCDFStore(h5netcdf.File(h5file, 'r'))
+            with xr.open_dataset(store) as dataset:
+                dataset = dataset.rename_vars(rename)
+                names, indexers = selection(dataset, query)
+                if not names:
+                    return None
+                ranges = []
+                for name in names:
+                    variable = h5file[original.get(name, name)]
+                    ranges += chunk_ranges(variable, dataset[name].dims, indexers)
+                reader.prefetch(coalesce(ranges, CUBE_COALESCE_GAP))
+                return dataset[names].isel(indexers).load()
+
+
+def parameter_items(items, parameters):
+    """The items with a variable among the requested `parameters`.
+
+    The model variable of an item is COUT_<model>, `COUT` selects all of
+    them. Other names can't be told from the item and keep every item.
+    """
+    if not parameters or not all(name.startswith('COUT') for name in parameters):
+        return items
+    return [
+        item for item in items
+        if 'COUT' in parameters or f'COUT_{item.properties["model"]}' in parameters
+    ]
+
+
+def fetch_datasets(fs, items, query=None, workers=CUBE_FETCH_WORKERS):
+    """Read the assets of `items` `workers` at a time.
+
+    Returns the datasets, in item order, leaving out the items the query
+    selects no variable of. The first failed read fails the fetch and cancels
+    the reads not started yet.
+    """
+    executor = ThreadPoolExecutor(max_workers=workers)
+    futures = [executor.submit(open_item, fs, item, query) for item in items]
+    try:
+        done, _ = wait(futures, return_when=FIRST_EXCEPTION)
+        for future in done:
+            future.result()  # the first failed read fails the request
+        datasets = (future.result() for future in futures)
+        return [dataset for dataset in datasets if dataset is not None]
+    finally:
+        for future in futures:
+            future.cancel()
+        executor.shutdown(wait=False)
 
 
 
 app = Flask(__name__)
 
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus scrape endpoint, with the asset cache counters."""
+    registry = REGISTRY
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
+
+
 @app.route('/climate_data', methods=['GET'])
 def get_climate_data():
     # Get the query parameters
@@ -72,327 +388,71 @@ def get_climate_data():
 @app.route('/collections/<collection_id>/cube', methods=['GET'])
 def get_cube(collection_id):
     '''Return the data in the OGC API complaint cube format
-    parameter-name:     Parameter (COUT)
+    parameter-name:     Parameter (COUT, or COUT_<model> for one model)
     bbox:               Bounding Box comma separated values (minx,miny,maxx,maxy)
     z:                  Vertical Extent (1000/300)
     datetime:           Time Extent (2021-01-19T06:00:00/2021-01-20T06:00:00)
     f:                  Output format (json, csv, netcdf, etc.)
+    range-encoding:     Values of the ranges, json (default) or base64
+
+    The selection is applied to the unloaded datasets, see parse_cube_query
+    and subset. The coverage is streamed, see coverage_json.
+
+    The item search and the asset reads are over before the response starts,
+    so their failures are answered with their status: malformed parameters
+    (400), no item or no requested parameter found (404), and the STAC API
+    or the reads failing (502).
     '''
-    parameter_name = None
-    bbox = None
-    z = None
-    datetime = None
-    f = None
+    parameter_name = request.args.get('parameter-name')
+    bbox = request.args.get('bbox')
+    datetime = request.args.get('datetime')
+    try:
+        query = parse_cube_query(request.args)
+    except ValueError as err:
+        return jsonify({"description": str(err)}), 400
+    range_encoding = request.args.get('range-encoding', 'json')
+    if range_encoding not in ('json', 'base64'):
+        return jsonify({"description": f"Invalid range-encoding {range_encoding}, expected json or base64"}), 400
 
-    # Get the query parameters
-    if 'parameter-name' in request.args:
-        parameter_name = request.args['parameter-name']
-    if 'bbox' in request.args:
-        bbox = request.args['bbox']
-    if 'z' in request.args:
-        z = request.args['z']
-    if 'datetime' in request.args:
-        datetime = request.args['datetime']
-    if 'f' in request.args:
-        f = request.args['f']
-    
-    print("Query parameters")
-    print("parameter-name",parameter_name)
-    print("bbox",bbox)
-    print("z",z)
-    print("datetime",datetime)
-    print("f",f)
-    # Versione conforme allo standard STAC
-    client = Client.open('http://127.0.0.1:8083/')  # Replace with the URL of your catalog
-    client.add_conforms_to("ITEM_SEARCH")
-    client.add_conforms_to("QUERY")
-
-    search_result = client.search(collections=[collection_id],bbox=bbox,datetime=datetime)  # query={"issue_date": {"eq": "202402"},"model": {"eq": 464}})
-
-    print("SEARCH RESULT")
-    print(search_result)
-    fs_s3 = s3fs.S3FileSystem(anon=True) 
-
-    # agg_dataset = None
-    data_arrays = []
-    for item in search_result.items():
-        print(item)
-        item_props = item.to_dict().get('properties')
-        print("-------------------")
-        print(item_props)
-        print("-------------------")
-        asset_href = item.get_assets()['data'].href
-        s3_file_obj = fs_s3.open(asset_href, mode='rb')
-        
-        dataset = xr.open_dataset(s3_file_obj,engine='h5netcdf')
-
-        # rename COUT variable to COUT_<model>
-        dataset = dataset.rename_vars({ 'COUT': f'COUT_{item_props["model"]}' })
-
-        # # add variable model from item properties to dataset
-        # dataset.coords['model'] = item.properties['model']
-
-        data_arrays.append(dataset)
-
-    # TODO: Remove model dimension and create N variables named COUT_<model_1>, COUT_<model_2>, etc.
-    # and return the data requested in the parameter-name query parameter
-
-    # TODO: https://developer.ogc.org/api/edr/index.html#tag/Collection-data-queries/operation/GetDataForCube
-    if data_arrays:
-        agg_dataset = xr.merge(data_arrays, join='outer')
-        print("+++++++++++++++++++++++++++++++++++++++++++++++++++++")
-        print(agg_dataset)
-        print(agg_dataset.dims)
-        # agg_dataset.to_dataframe().to_csv('data.csv')
-        # print("AGGREGATED DATASET")
-        coverage = xarray_to_prs_coverage_json(agg_dataset)
-        print(coverage['domain'])
-        
-    else:
-        print("No data found")
+    try:
+        # Versione conforme allo standard STAC
+        client = Client.open(STAC_API_URL)
+        client.add_conforms_to("ITEM_SEARCH")
+        client.add_conforms_to("QUERY")
+        client.add_conforms_to("FIELDS")
 
+        # only fetch what the cube needs, the item geometries are not used
+        search_result = client.search(
+            collections=[collection_id],
+            bbox=bbox,
+            datetime=datetime,
+            fields=["id", "properties.model", "assets.data.href", "assets.references.href"],
+        )
+        items = list(search_result.items())
+    except APIError as err:
+        app.logger.exception("Searching the items of %s failed", collection_id)
+        return jsonify({"description": f"Failed to search the items of {collection_id}: {err}"}), 502
+    if not items:
+        return jsonify({"description": f"No data found in {collection_id}"}), 404
+    items = parameter_items(items, query.get('parameters'))
+    no_parameter = {"description": f"No parameter {parameter_name} found"}
+    if not items:
+        return jsonify(no_parameter), 404
 
-    
-    # Return the data in the OGC API complaint cube format
-    data = {
-        "type": "Coverage",
-        "domainType": "string",
-        "coverages": [
-            {
-            "type": "Coverage",
-            "domain": {
-                "type": "Domain",
-                "domainType": "string",
-                "axes": {
-                "x": {
-                    "dataType": "string",
-                    "values": [
-                    0
-                    ],
-                    "coordinates": [
-                    "string",
-                    "string"
-                    ],
-                    "bounds": [
-                    0
-                    ]
-                },
-                "y": {
-                    "dataType": "string",
-                    "values": [
-                    0
-                    ],
-                    "coordinates": [
-                    "string",
-                    "string"
-                    ],
-                    "bounds": [
-                    0
-                    ]
-                },
-                "z": {
-                    "dataType": "string",
-                    "values": [
-                    0
-                    ],
-                    "coordinates": [
-                    "string",
-                    "string"
-                    ],
-                    "bounds": [
-                    0
-                    ]
-                },
-                "t": {
-                    "dataType": "string",
-                    "values": [
-                    "string"
-                    ],
-                    "coordinates": [
-                    "string",
-                    "string"
-                    ],
-                    "bounds": [
-                    "string"
-                    ]
-                }
-                },
-                "referencing": [
-                {
-                    "coordinates": [
-                    "string"
-                    ],
-                    "system": {
-                    "type": "string",
-                    "calendar": "string",
-                    "timeScale": "string"
-                    }
-                }
-                ]
-            },
-            "ranges": {
-                "property1": {
-                "type": "NdArray",
-                "dataType": "float",
-                "shape": [
-                    0
-                ],
-                "axisNames": [
-                    "string"
-                ],
-                "values": [
-                    0
-                ]
-                },
-                "property2": {
-                "type": "NdArray",
-                "dataType": "float",
-                "shape": [
-                    0
-                ],
-                "axisNames": [
-                    "string"
-                ],
-                "values": [
-                    0
-                ]
-                }
-            }
-            }
-        ],
-        "parameters": {
-            "property1": {
-            "id": "string",
-            "type": "Parameter",
-            "description": {
-                "property1": "string",
-                "property2": "string"
-            },
-            "observedProperty": {
-                "id": "string",
-                "label": {
-                "property1": "string",
-                "property2": "string"
-                },
-                "description": {
-                "property1": "string",
-                "property2": "string"
-                },
-                "categories": [
-                {
-                    "id": "string",
-                    "label": {
-                    "property1": "string",
-                    "property2": "string"
-                    },
-                    "description": {
-                    "property1": "string",
-                    "property2": "string"
-                    }
-                }
-                ]
-            },
-            "unit": {
-                "id": "string",
-                "label": {
-                "property1": "string",
-                "property2": "string"
-                },
-                "symbol": "string"
-            },
-            "categoryEncoding": {
-                "property1": 0,
-                "property2": 0
-            }
-            },
-            "property2": {
-            "id": "string",
-            "type": "Parameter",
-            "description": {
-                "property1": "string",
-                "property2": "string"
-            },
-            "observedProperty": {
-                "id": "string",
-                "label": {
-                "property1": "string",
-                "property2": "string"
-                },
-                "description": {
-                "property1": "string",
-                "property2": "string"
-                },
-                "categories": [
-                {
-                    "id": "string",
-                    "label": {
-                    "property1": "string",
-                    "property2": "string"
-                    },
-                    "description": {
-                    "property1": "string",
-                    "property2": "string"
-                    }
-                }
-                ]
-            },
-            "unit": {
-                "id": "string",
-                "label": {
-                "property1": "string",
-                "property2": "string"
-                },
-                "symbol": "string"
-            },
-            "categoryEncoding": {
-                "property1": 0,
-                "property2": 0
-            }
-            }
-        },
-        "ranges": {
-            "property1": {
-            "type": "NdArray",
-            "dataType": "float",
-            "shape": [
-                0
-            ],
-            "axisNames": [
-                "string"
-            ],
-            "values": [
-                0
-            ]
-            },
-            "property2": {
-            "type": "NdArray",
-            "dataType": "float",
-            "shape": [
-                0
-            ],
-            "axisNames": [
-                "string"
-            ],
-            "values": [
-                0
-            ]
-            }
-        },
-        "referencing": [
-            {
-            "coordinates": [
-                "string"
-            ],
-            "system": {
-                "type": "string",
-                "calendar": "string",
-                "timeScale": "string"
-            }
-            }
-        ]
-    }
+    fs_s3 = s3fs.S3FileSystem(anon=True)
+    try:
+        datasets = fetch_datasets(fs_s3, items, query)
+    except Exception as err:
+        app.logger.exception("Reading the assets of %s failed", collection_id)
+        return jsonify({"description": f"Failed to read the data of {collection_id}: {err}"}), 502
+    if not datasets:
+        return jsonify(no_parameter), 404
 
-    return jsonify(coverage)
+    agg_dataset = xr.merge(datasets, join='outer')
+    return Response(
+        coverage_json.encode(agg_dataset, binary=range_encoding == 'base64'),
+        mimetype='application/json',
+    )
 
 if __name__ == '__main__':
     app.run(port=8080, debug=True)
@@ -0,0 +1,93 @@
+"""Index the NetCDF assets of a collection's items with chunk references.
+
+Run after the items are ingested:
+
+    python scripts/index_assets.py --collection seasonal
+
+For every item whose `data` asset has no `references` asset yet, the asset
+is downloaded, its chunk reference manifest (chunk_references.py) is written
+next to it as `<href>.refs.json`, or under `--output`, and the item gets a
+`references` asset pointing to it, with a merge patch. The cube service then
+reads the item without opening the HDF5 file. `--force` indexes every item
+again, e.g. after the data objects are replaced. The STAC API is the cube
+service's, `STAC_API_URL` (default http://127.0.0.1:8083/), unless `--api`
+is given.
+
+Writing the manifests needs write access to their location (s3fs picks the
+credentials up from the environment). Assets that can't be described as
+Zarr are reported and left to be read as HDF5.
+"""
+import argparse
+import io
+import json
+import os
+import posixpath
+import sys
+
+import fsspec
+import h5py
+import httpx
+from pystac_client import Client
+
+from chunk_references import INLINE_BYTES, references
+
+MEDIA_TYPE = "application/json"
+STAC_API_URL = os.environ.get("STAC_API_URL", "http://127.0.0.1:8083/")
+
+
+def manifest_href(href, output=None):
+    """Where the manifest of the asset at `href` is written."""
+    if output is None:
+        return href + ".refs.json"
+    return output.rstrip("/") + "/" + href.split("://", 1)[-1].lstrip("/") + ".refs.json"
+
+
+def index_item(item, output=None, inline_bytes=INLINE_BYTES):
+    """Write the manifest of an item's data asset, return its asset."""
+    href = item.assets["data"].href
+    fs, path = fsspec.core.url_to_fs(href)
+    with h5py.File(io.BytesIO(fs.cat_file(path)), "r") as h5file:
+        manifest = references(h5file, href, inline_bytes)
+    target = manifest_href(href, output)
+    out, out_path = fsspec.core.url_to_fs(target)
+    out.makedirs(posixpath.dirname(out_path), exist_ok=True)
+    out.pipe_file(out_path, json.dumps(manifest, separators=(",", ":")).encode())
+    return {
+        "href": target,
+        "type": MEDIA_TYPE,
+        "roles": ["references"],
+        "title": "Chunk references of the data asset",
+    }
+
+
+def main(args):
+    client = Client.open(args.api)
+    failed = 0
+    with httpx.Client(base_url=args.api.rstrip("/"), timeout=60) as api:
+        for item in client.search(collections=[args.collection]).items():
+            if "data" not in item.assets or ("references" in item.assets and not args.force):
+                continue
+            try:
+                asset = index_item(item, args.output, args.inline_bytes)
+            except ValueError as error:
+                print(f"{item.id}: not indexed, {error}", file=sys.stderr)
+                failed += 1
+                continue
+            response = api.patch(
+                f"/collections/{args.collection}/items/{item.id}",
+                json={"assets": {"references": asset}},
+            )
+            response.raise_for_status()
+            print(f"{item.id}: {asset['href']}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--api", default=STAC_API_URL, help="STAC API (default: $STAC_API_URL)")
+    parser.add_argument("--collection", required=True)
+    parser.add_argument("--output", help="prefix of the manifests (default: next to the assets)")
+    parser.add_argument("--inline-bytes", type=int, default=INLINE_BYTES,
+                        help="variables up to this size are copied into the manifest")
+    parser.add_argument("--force", action="store_true", help="index indexed items again")
+    sys.exit(main(parser.parse_args()))
@@ -1,7 +1,11 @@
+import io
+
 from pystac_client import Client
 import xarray as xr
 import s3fs
 
+from asset_cache import AssetCache
+
 # catalog = Client.open("https://planetarycomputer.microsoft.com/api/stac/v1/")
 # search_results = catalog.search(
 #     collections=["era5-pds"], query={"era5:kind": {"eq": "an"}}
@@ -28,13 +32,14 @@ search_result = client.search(
 print("SEARCH RESULT")
 print(search_result)
 fs_s3 = s3fs.S3FileSystem(anon=True) 
+asset_cache = AssetCache.from_environ()
 
 # agg_dataset = None
 data_arrays = []
 for item in search_result.items():
     print(item)
     asset_href = item.get_assets()['data'].href
-    s3_file_obj = fs_s3.open(asset_href, mode='rb')
+    s3_file_obj = io.BytesIO(asset_cache.cat_file(fs_s3, asset_href))
     
     dataset = xr.open_dataset(s3_file_obj,engine='h5netcdf')
 
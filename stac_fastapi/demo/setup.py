@@ -14,6 +14,9 @@ install_requires = [
     "stac-fastapi.extensions==2.3.0",
     "fastapi-utils",
     "pymongo",
+    "orjson",
+    "brotli",
+    "prometheus-client",
     "pystac[validation]",
     "uvicorn",
 ]
@@ -28,6 +31,8 @@ extra_reqs = {
     ],
     "docs": ["mkdocs", "mkdocs-material", "pdocs"],
     "server": ["uvicorn[standard]>=0.12.0,<0.14.0"],
+    "async": ["motor"],
+    "zstd": ["zstandard"],
 }
 
 
@@ -54,5 +59,10 @@ setup(
     install_requires=install_requires,
     tests_require=extra_reqs["dev"],
     extras_require=extra_reqs,
-    entry_points={"console_scripts": ["stac-fastapi-demo=stac_fastapi.demo.app:run"]},
+    entry_points={
+        "console_scripts": [
+            "stac-fastapi-demo=stac_fastapi.demo.app:run",
+            "stac-fastapi-demo-indexes=stac_fastapi.demo.index_cli:main",
+        ]
+    },
 )
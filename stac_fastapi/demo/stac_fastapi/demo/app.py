@@ -1,22 +1,50 @@
 """FastAPI application."""
+import asyncio
+import logging
+
+from fastapi.responses import JSONResponse
+from pymongo import errors
+from starlette.concurrency import run_in_threadpool
+from stac_fastapi.api.errors import DEFAULT_STATUS_CODES
 from stac_fastapi.api.app import StacApi
 from stac_fastapi.api.models import create_get_request_model, create_post_request_model
 from stac_fastapi.extensions.core import (
+    FieldsExtension,
     SortExtension,
     ContextExtension,
     TransactionExtension,
     TokenPaginationExtension,
     QueryExtension,
 )
+from stac_fastapi.demo.bulk import BulkItemsExtension
+from stac_fastapi.demo.compression import CompressionMiddleware
 from stac_fastapi.demo.config import MongoSettings
-from stac_fastapi.demo.core import CoreCrudClient
-from stac_fastapi.demo.transactions import TransactionsClient
+from stac_fastapi.demo.database import mongo
+from stac_fastapi.demo.indexes import async_ensure_indexes, ensure_indexes
+from stac_fastapi.demo.metrics import MetricsMiddleware, metrics
+from stac_fastapi.demo.updates import PartialUpdateExtension
+
+logger = logging.getLogger(__name__)
 
 settings = MongoSettings()
 
+if settings.mongo_async:
+    from stac_fastapi.demo.async_core import AsyncCoreCrudClient as CoreCrudClient
+    from stac_fastapi.demo.async_transactions import (
+        AsyncTransactionsClient as TransactionsClient,
+    )
+else:
+    from stac_fastapi.demo.core import CoreCrudClient
+    from stac_fastapi.demo.transactions import TransactionsClient
+
+transactions_client = TransactionsClient()
+
 extensions = [
-    TransactionExtension(client=TransactionsClient(), settings=settings),
+    TransactionExtension(client=transactions_client, settings=settings),
+    BulkItemsExtension(client=transactions_client, settings=settings),
+    PartialUpdateExtension(client=transactions_client),
     SortExtension(),
+    FieldsExtension(),
     ContextExtension(),
     QueryExtension(),
     TokenPaginationExtension(),
@@ -30,8 +58,68 @@ api = StacApi(
     client=CoreCrudClient(post_request_model=post_request_model),
     search_get_request_model=create_get_request_model(extensions),
     search_post_request_model=post_request_model,
+    # mongo unreachable (or the pool exhausted past its wait queue timeout)
+    exceptions={**DEFAULT_STATUS_CODES, errors.ConnectionFailure: 503},
+    # instead of the default BrotliMiddleware
+    middlewares=[CompressionMiddleware],
 )
 app = api.app
+app.add_middleware(MetricsMiddleware)
+app.add_api_route("/metrics", metrics, include_in_schema=False)
+
+
+@app.on_event("startup")
+async def connect():
+    """Open the shared pool and create the indices missing from the spec."""
+    mongo.connect(settings)
+    if settings.ensure_indexes:
+        await create_indexes()
+
+
+@app.on_event("shutdown")
+async def disconnect():
+    """Close the shared pool."""
+    mongo.close()
+
+
+async def create_indexes() -> bool:
+    """Create the missing indices, False when mongo isn't reachable.
+
+    An index mongo refuses to build doesn't hold up startup or readiness,
+    `stac-fastapi-demo-indexes reconcile` has to fix it.
+    """
+    try:
+        if settings.mongo_async:
+            await async_ensure_indexes(mongo.db)
+        else:
+            await run_in_threadpool(ensure_indexes, mongo.db)
+    except errors.ConnectionFailure as err:
+        logger.warning("mongo unreachable, indices not checked: %s", err)
+        return False
+    except errors.OperationFailure as err:
+        logger.error(
+            "indices not all created, run stac-fastapi-demo-indexes reconcile: %s", err
+        )
+    indexes_ready.set()
+    return True
+
+
+# set once the startup index check went through, retried by the readiness probe
+indexes_ready = asyncio.Event()
+
+
+@app.get("/_mgmt/ready", include_in_schema=False)
+async def ready():
+    """Readiness probe: mongo answers and the indices have been checked."""
+    if settings.mongo_async:
+        reachable = await mongo.async_ping()
+    else:
+        reachable = await run_in_threadpool(mongo.ping)
+    if reachable and settings.ensure_indexes and not indexes_ready.is_set():
+        reachable = await create_indexes()
+    if not reachable:
+        return JSONResponse({"status": "unavailable"}, status_code=503)
+    return {"status": "ready"}
 
 
 def run():
@@ -0,0 +1,159 @@
+"""Async item crud client."""
+from datetime import datetime
+from functools import partial
+from typing import Callable, Dict, List, Optional, Union
+
+import attr
+from fastapi import Request
+from stac_fastapi.types.core import AsyncBaseCoreClient
+from stac_fastapi.types.search import BaseSearchPostRequest
+from stac_fastapi.types.stac import Collection, Collections, Item, ItemCollection, LandingPage
+
+from stac_fastapi.demo.caching import VALIDATORS, is_conditional
+from stac_fastapi.demo.catalog import CatalogSnapshot, async_read_version
+from stac_fastapi.demo.core_base import CoreClientBase, ItemPage
+from stac_fastapi.demo.counting import async_count_matched
+from stac_fastapi.demo.database import MongoTables
+from stac_fastapi.demo.encoding import HIDDEN, NO_ID, collection_response, item_response
+from stac_fastapi.demo.metrics import async_slow_query, timed
+from stac_fastapi.demo.pagination import SortSpec
+from stac_fastapi.demo.serializers import CollectionSerializer, ItemSerializer
+from stac_fastapi.demo.streaming import async_stream_response
+
+NumType = Union[float, int]
+
+
+@attr.s
+class AsyncCoreCrudClient(CoreClientBase, MongoTables, AsyncBaseCoreClient):
+    """Client for core endpoints defined by stac, backed by motor."""
+
+    async def landing_page(self, **kwargs) -> LandingPage:
+        return self._landing_page_response(kwargs["request"], await self._catalog())
+
+    async def all_collections(self, **kwargs) -> Collections:
+        """Read all collections from the database."""
+        return self._collections_response(kwargs["request"], await self._catalog())
+
+    async def _catalog(self) -> CatalogSnapshot:
+        """Return the cached collections, reloading them after a collection write."""
+        if self.catalog.needs_check():
+            self.catalog.validate(await async_read_version(self.meta_table))
+        snapshot = self.catalog.snapshot
+        if snapshot is None:
+            version = self.catalog.version
+            collections = await self.collection_table.find({}, HIDDEN).to_list(length=None)
+            snapshot = CatalogSnapshot(version, collections)
+            self.catalog.store(snapshot)
+        return snapshot
+
+    async def get_collection(self, collection_id: str, **kwargs) -> Collection:
+        """Get collection by id."""
+        request = kwargs["request"]
+        response, collection, headers = await self._conditional_find(
+            self.collection_table, {"id": collection_id}, request, "collection"
+        )
+        if response is not None:
+            return response
+        if collection is not None:
+            collection = CollectionSerializer(str(request.base_url)).db_to_stac(collection)
+        return collection_response(collection, collection_id, headers)
+
+    async def item_collection(
+        self, collection_id: str, limit: int = 10, token: str = None, **kwargs
+    ) -> ItemCollection:
+        """Read an item collection from the database."""
+        return await self._item_page(
+            self._items_page(collection_id, limit, token, kwargs["request"])
+        )
+
+    async def get_item(self, item_id: str, collection_id: str, **kwargs) -> Item:
+        """Get item by item id, collection id."""
+        request = kwargs["request"]
+        response, item, headers = await self._conditional_find(
+            self.item_table, {"id": item_id, "collection": collection_id}, request, "item"
+        )
+        if response is not None:
+            return response
+        if item is not None:
+            item = ItemSerializer(str(request.base_url)).db_to_stac(item)
+        return item_response(item, item_id, collection_id, headers)
+
+    async def _conditional_find(self, table, query: Dict, request: Request, endpoint: str):
+        """Read a document, answering conditional requests.
+
+        Returns the 304 response (None when the request's validators don't
+        match), the document (None when missing) and its validator headers.
+        """
+        if is_conditional(request):
+            with timed("mongo"):
+                validators = await table.find_one(query, VALIDATORS)
+            response = self._not_modified(request, validators, endpoint)
+            if response is not None:
+                return response, None, None
+        with timed("mongo"):
+            doc = await table.find_one(query, NO_ID)
+        return self._found(request, doc, endpoint)
+
+    async def _context(self, queries: Dict, limit: int) -> Optional[Callable[[int], Dict]]:
+        """Count the matches of `queries` when the Context extension is enabled."""
+        args = self._count_args(queries)
+        if args is None:
+            return None
+        with timed("mongo"):
+            count = await async_count_matched(self.item_table, *args)
+        return self._context_fields(count, limit)
+
+    async def _unindexed_sort(self, keys: SortSpec):
+        """Apply the `unindexed_sort` policy to a sort no index supports."""
+        if self._create_sort_index(keys):
+            await self.item_table.create_index(keys)
+            self.planner.add_index(keys)
+
+    async def _item_page(self, page: ItemPage):
+        """Read a page of items, streamed or buffered."""
+        results = page.find(self.item_table)
+        context = await self._context(page.filter, page.limit)
+        log_slow = partial(
+            async_slow_query,
+            lambda: page.find(self.item_table),
+            page.queries,
+            page.sort,
+            threshold_ms=self.settings.slow_query_ms,
+        )
+        stream = page.stream(context, log_slow)
+        if stream is not None:
+            return page.cached(async_stream_response(results.batch_size(stream.batch_size), stream))
+
+        with timed("mongo") as query:
+            found = await results.to_list(length=page.limit + 1)
+        log_slow(query.elapsed)
+        return page.response(found, context)
+
+    async def get_search(
+        self,
+        collections: Optional[List[str]] = None,
+        ids: Optional[List[str]] = None,
+        bbox: Optional[List[NumType]] = None,
+        datetime: Optional[Union[str, datetime]] = None,
+        limit: Optional[int] = 10,
+        query: Optional[str] = None,
+        token: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+        sortby: Optional[str] = None,
+        **kwargs,
+    ) -> ItemCollection:
+        """GET search catalog."""
+        search_request = self._search_request(
+            collections, ids, bbox, datetime, limit, query, token, fields, sortby,
+            kwargs.get("intersects"),
+        )
+        return await self.post_search(search_request, request=kwargs["request"])
+
+    async def post_search(
+        self, search_request: BaseSearchPostRequest, **kwargs
+    ) -> ItemCollection:
+        """POST search catalog."""
+        plan = self.planner.plan(search_request)
+        if plan.sort_index:
+            await self._unindexed_sort(plan.sort_index)
+        return await self._item_page(self._search_page(search_request, plan, kwargs["request"]))
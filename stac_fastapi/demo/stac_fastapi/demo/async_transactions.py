@@ -0,0 +1,122 @@
+"""async transactions extension client."""
+
+import logging
+from typing import Dict, List
+
+import attr
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from stac_fastapi.demo.bulk import check_items, write_results
+from stac_fastapi.demo.catalog import async_bump_version
+from stac_fastapi.demo.database import MongoTables
+from stac_fastapi.demo.encoding import HIDDEN
+from stac_fastapi.demo.transactions_base import TransactionsClientBase
+from stac_fastapi.demo.updates import collection_patch_update, item_patch_update
+from stac_fastapi.types import stac as stac_types
+from stac_fastapi.types.core import AsyncBaseTransactionsClient
+from stac_fastapi.demo.types.error_checks import AsyncErrorChecks
+
+logger = logging.getLogger(__name__)
+
+
+@attr.s
+class AsyncTransactionsClient(TransactionsClientBase, MongoTables, AsyncBaseTransactionsClient):
+    """Transactions extension specific CRUD operations, backed by motor."""
+
+    @property
+    def error_check(self) -> AsyncErrorChecks:
+        return AsyncErrorChecks(client=self.client)
+
+    async def create_item(self, model: stac_types.Item, **kwargs):
+        """Create item."""
+        try:
+            await self.item_table.insert_one(self._new_item(model))
+        except DuplicateKeyError:
+            raise self._item_conflict(model)
+        return "success"
+
+    async def check_collection(self, collection_id: str):
+        """Raise NotFoundError when the collection doesn't exist."""
+        await self.error_check.check_collection_not_found(collection_id)
+
+    async def bulk_item_insert(self, collection_id: str, batch: List, offset: int = 0, **kwargs):
+        """Insert a batch of items with one unordered bulk write.
+
+        Returns the per-item results, see `stac_fastapi.demo.bulk`.
+        """
+        valid, results = check_items(collection_id, batch, offset)
+        if not valid:
+            return results
+
+        error = None
+        try:
+            await self.item_table.bulk_write(self._inserts(valid), ordered=False)
+        except BulkWriteError as err:
+            error = err
+        results.extend(write_results(valid, error))
+        return results
+
+    async def create_collection(self, model: stac_types.Collection, **kwargs):
+        """Create collection."""
+        try:
+            await self.collection_table.insert_one(self._new_collection(model))
+        except DuplicateKeyError:
+            raise self._collection_conflict(model)
+        await async_bump_version(self.meta_table)
+        return "success"
+
+    async def update_item(self, model: stac_types.Item, **kwargs):
+        """Replace (or create) an item in one round trip."""
+        model = self._replaced_item(model)
+        return await self.item_table.find_one_and_replace(
+            {"id": model["id"], "collection": model["collection"]},
+            model,
+            projection=HIDDEN,
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def update_collection(self, model: stac_types.Collection, **kwargs):
+        """Replace (or create) a collection in one round trip."""
+        await self.collection_table.replace_one(
+            {"id": model["id"]}, self._replaced_collection(model), upsert=True
+        )
+        await async_bump_version(self.meta_table)
+        return model
+
+    async def patch_item(self, collection_id: str, item_id: str, patch: Dict, **kwargs):
+        """Apply a merge patch to an item."""
+        item = await self.item_table.find_one_and_update(
+            {"id": item_id, "collection": collection_id},
+            item_patch_update(patch),
+            projection=HIDDEN,
+            return_document=ReturnDocument.AFTER,
+        )
+        return self._patched_item(item, collection_id, item_id)
+
+    async def patch_collection(self, collection_id: str, patch: Dict, **kwargs):
+        """Apply a merge patch to a collection."""
+        update = collection_patch_update(patch)
+        if not update:
+            collection = await self.collection_table.find_one({"id": collection_id}, HIDDEN)
+        else:
+            collection = await self.collection_table.find_one_and_update(
+                {"id": collection_id},
+                update,
+                projection=HIDDEN,
+                return_document=ReturnDocument.AFTER,
+            )
+        collection = self._patched_collection(collection, collection_id)
+        if update:
+            await async_bump_version(self.meta_table)
+        return collection
+
+    async def delete_item(self, item_id: str, collection_id: str, **kwargs):
+        """Delete item."""
+        await self.item_table.delete_one({"id": item_id, "collection": collection_id})
+
+    async def delete_collection(self, collection_id: str, **kwargs):
+        """Delete collection."""
+        await self.collection_table.delete_one({"id": collection_id})
+        await async_bump_version(self.meta_table)
@@ -0,0 +1,205 @@
+"""Bulk item ingestion.
+
+`POST /collections/{collection_id}/bulk_items` takes an ItemCollection (or a
+plain list of items) as JSON, or one item per line as NDJSON, and hands it to
+the transactions client in batches of `BULK_BATCH_SIZE` items (overridable per
+request with `?batch_size=`). Each batch is one unordered `bulk_write`,
+instead of a round trip per item; the unique `(collection, id)` index rejects
+the items already stored, even when another request inserts them meanwhile.
+NDJSON bodies are read as they arrive, so a batch is written before the next
+one is received. The collection is checked once, before the first batch (404
+when it doesn't exist); past that, every outcome is reported per item.
+
+The response reports every item by its position in the body:
+
+    {"created": 2, "failed": 1, "items": [
+        {"index": 0, "id": "a", "status": "created"},
+        {"index": 1, "id": "a", "status": "failed", "error": "..."}, ...]}
+"""
+import asyncio
+from operator import itemgetter
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import attr
+import orjson
+from fastapi import APIRouter, FastAPI, HTTPException, Query, Request
+from pymongo.errors import BulkWriteError
+from starlette.concurrency import run_in_threadpool
+
+from stac_fastapi.demo.datetimes import normalize_item
+from stac_fastapi.demo.encoding import json_response
+from stac_fastapi.types.config import ApiSettings
+from stac_fastapi.types.errors import InvalidQueryParameter
+from stac_fastapi.types.extension import ApiExtension
+
+NDJSON_TYPES = {"application/x-ndjson", "application/geo+json-seq"}
+
+DUPLICATE_KEY = 11000
+
+# (position in the request body, item)
+IndexedItem = Tuple[int, Dict]
+
+
+def created(index: int, item_id: str) -> Dict:
+    """Result of an inserted item."""
+    return {"index": index, "id": item_id, "status": "created"}
+
+
+def failed(index: int, item_id: Optional[str], error: str) -> Dict:
+    """Result of a rejected item."""
+    return {"index": index, "id": item_id, "status": "failed", "error": error}
+
+
+def check_items(
+    collection_id: str, batch: List[Any], offset: int
+) -> Tuple[List[IndexedItem], List[Dict]]:
+    """Split a batch into insertable items and the results of rejected ones.
+
+    NDJSON lines arrive as bytes and are decoded here, so one bad line only
+    fails that item. Items without a `collection` are put in `collection_id`,
+    search keys are normalized as `create_item` does.
+    """
+    valid, results, seen = [], [], set()
+    for index, item in enumerate(batch, offset):
+        if isinstance(item, bytes):
+            try:
+                item = orjson.loads(item)
+            except orjson.JSONDecodeError as err:
+                results.append(failed(index, None, f"Invalid JSON: {err}"))
+                continue
+        if not isinstance(item, dict) or not isinstance(item.get("id"), str):
+            results.append(failed(index, None, "Item has no id"))
+            continue
+        item_id = item["id"]
+        item.setdefault("collection", collection_id)
+        try:
+            normalize_item(item)
+        except InvalidQueryParameter as err:
+            results.append(failed(index, item_id, str(err)))
+            continue
+        if item["collection"] != collection_id:
+            results.append(
+                failed(index, item_id, f"Item belongs to collection {item['collection']}")
+            )
+        elif item_id in seen:
+            results.append(failed(index, item_id, "Item appears twice in the batch"))
+        else:
+            seen.add(item_id)
+            valid.append((index, item))
+    return valid, results
+
+
+def already_exists(item: Dict) -> str:
+    """Error of an item conflicting with a stored one."""
+    return f"Item {item['id']} in collection {item['collection']} already exists"
+
+
+def write_results(valid: List[IndexedItem], error: Optional[BulkWriteError]) -> List[Dict]:
+    """Per-item results of an unordered bulk insert of `valid`."""
+    errors = {}
+    if error is not None:
+        for write_error in error.details.get("writeErrors", []):
+            position = write_error["index"]
+            if write_error.get("code") == DUPLICATE_KEY:
+                errors[position] = already_exists(valid[position][1])
+            else:
+                errors[position] = write_error["errmsg"]
+    return [
+        failed(index, item["id"], errors[position])
+        if position in errors
+        else created(index, item["id"])
+        for position, (index, item) in enumerate(valid)
+    ]
+
+
+def _items_of(body: Any) -> List[Any]:
+    if isinstance(body, list):
+        return body
+    if isinstance(body, dict) and isinstance(body.get("features"), list):
+        return body["features"]
+    if isinstance(body, dict) and isinstance(body.get("items"), dict):
+        # stac-fastapi `Items` body, keyed by item id
+        return list(body["items"].values())
+    raise HTTPException(status_code=400, detail="Expected an ItemCollection or a list of items")
+
+
+async def read_batches(request: Request, batch_size: int) -> AsyncIterator[List[Any]]:
+    """Yield the items of the request body `batch_size` at a time."""
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    if content_type not in NDJSON_TYPES:
+        try:
+            items = _items_of(orjson.loads(await request.body()))
+        except orjson.JSONDecodeError:
+            raise HTTPException(status_code=400, detail="Invalid JSON body")
+        for start in range(0, len(items), batch_size):
+            yield items[start:start + batch_size]
+        return
+
+    batch, pending = [], b""
+    async for chunk in request.stream():
+        lines = (pending + chunk).split(b"\n")
+        pending = lines.pop()
+        for line in lines:
+            if line.strip():
+                batch.append(line)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+    if pending.strip():
+        batch.append(pending)
+    if batch:
+        yield batch
+
+
+@attr.s
+class BulkItemsExtension(ApiExtension):
+    """Bulk item ingestion.
+
+    Adds `POST /collections/{collection_id}/bulk_items`. The client must have
+    (sync or async) `check_collection(collection_id)`, raising `NotFoundError`
+    when the collection doesn't exist, and `bulk_item_insert(collection_id,
+    batch, offset)` returning the per-item results of one batch.
+    """
+
+    client = attr.ib()
+    settings: ApiSettings = attr.ib()
+    conformance_classes: List[str] = attr.ib(factory=list)
+    schema_href: Optional[str] = attr.ib(default=None)
+
+    async def _call(self, func, *args):
+        if asyncio.iscoroutinefunction(func):
+            return await func(*args)
+        return await run_in_threadpool(func, *args)
+
+    def register(self, app: FastAPI) -> None:
+        """Register the extension with a FastAPI application."""
+        router = APIRouter()
+
+        async def bulk_items(
+            collection_id: str,
+            request: Request,
+            batch_size: Optional[int] = Query(None, gt=0),
+        ):
+            """Insert the items of the body in batched unordered bulk writes."""
+            batch_size = batch_size or self.settings.bulk_batch_size
+            await self._call(self.client.check_collection, collection_id)
+            results, offset = [], 0
+            async for batch in read_batches(request, batch_size):
+                results.extend(
+                    await self._call(self.client.bulk_item_insert, collection_id, batch, offset)
+                )
+                offset += len(batch)
+
+            results.sort(key=itemgetter("index"))
+            inserted = sum(result["status"] == "created" for result in results)
+            return json_response(
+                {"created": inserted, "failed": len(results) - inserted, "items": results}
+            )
+
+        router.add_api_route(
+            name="Bulk Create Items",
+            path="/collections/{collection_id}/bulk_items",
+            methods=["POST"],
+            endpoint=bulk_items,
+        )
+        app.include_router(router, tags=["Bulk Transaction Extension"])
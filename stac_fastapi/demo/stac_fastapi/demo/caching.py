@@ -0,0 +1,137 @@
+"""HTTP conditional requests for items and collections.
+
+Writes through the transactions client store a hash of the document's
+content in its `_etag` member (never returned, see `encoding.HIDDEN`), so the
+strong `ETag` of `GET /collections/{id}` and `GET /collections/{id}/items/{id}`
+is known without encoding the document. Merge patches don't read the document
+they change, they store a fresh random token instead, which changes just the
+same. Documents written to mongo directly have no `_etag` and get it computed
+on read. The links of a response are built from the request's base URL, so
+the `ETag` hashes `_etag` with the base URL: the same document served under
+two hosts has two representations.
+
+`Last-Modified` comes from `properties.updated` (items, stamped by every
+update) or the collection's `updated`, falling back to `created`.
+
+A request carrying `If-None-Match` or `If-Modified-Since` first reads only
+those validators; when they match it is answered with 304 and the document is
+never loaded. `CACHE_CONTROL` sets the Cache-Control header per endpoint.
+"""
+import hashlib
+import uuid
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, Optional
+
+from pydantic.datetime_parse import parse_datetime
+from starlette.requests import Request
+from starlette.responses import Response
+
+from stac_fastapi.demo.encoding import canonical
+
+ETAG_FIELD = "_etag"
+
+# projection reading the validators of a document, not the document
+VALIDATORS = {
+    "_id": 0,
+    ETAG_FIELD: 1,
+    "updated": 1,
+    "created": 1,
+    "properties.updated": 1,
+    "properties.created": 1,
+}
+
+
+def content_hash(doc: Dict) -> str:
+    """Hash of a document's content, whatever the order of its members."""
+    content = {key: value for key, value in doc.items() if key not in ("_id", ETAG_FIELD)}
+    return hashlib.blake2b(canonical(content), digest_size=16).hexdigest()
+
+
+def stamp(doc: Dict) -> Dict:
+    """Store the content hash in a document about to be written."""
+    doc[ETAG_FIELD] = content_hash(doc)
+    return doc
+
+
+def new_etag() -> str:
+    """Version token of a document changed in place."""
+    return uuid.uuid4().hex
+
+
+def last_modified(doc: Dict) -> Optional[datetime]:
+    """Modification time of an item or a collection, if it has one."""
+    properties = doc.get("properties") or {}
+    for value in (
+        properties.get("updated"),
+        doc.get("updated"),
+        properties.get("created"),
+        doc.get("created"),
+    ):
+        if value:
+            try:
+                modified = parse_datetime(value)
+            except (TypeError, ValueError):
+                continue
+            if modified.tzinfo is None:
+                modified = modified.replace(tzinfo=timezone.utc)
+            return modified
+    return None
+
+
+def is_conditional(request: Request) -> bool:
+    return "if-none-match" in request.headers or "if-modified-since" in request.headers
+
+
+def representation_etag(etag: str, base_url: str) -> str:
+    """ETag of a document with the links of `base_url`."""
+    return hashlib.blake2b(f"{etag} {base_url}".encode(), digest_size=16).hexdigest()
+
+
+def document_headers(
+    doc: Dict, base_url: str, cache_control: Optional[str] = None
+) -> Dict[str, str]:
+    """Validator headers of a document served at `base_url`, removing its `_etag`."""
+    etag = doc.pop(ETAG_FIELD, None) or content_hash(doc)
+    headers = {"ETag": f'"{representation_etag(etag, base_url)}"'}
+    modified = last_modified(doc)
+    if modified is not None:
+        headers["Last-Modified"] = format_datetime(modified.astimezone(timezone.utc), usegmt=True)
+    if cache_control:
+        headers["Cache-Control"] = cache_control
+    return headers
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    """Weak comparison, as If-None-Match requires."""
+    if header.strip() == "*":
+        return True
+    tags = (tag.strip() for tag in header.split(","))
+    return any((tag[2:] if tag.startswith("W/") else tag) == etag for tag in tags)
+
+
+def not_modified(request: Request, headers: Optional[Dict[str, str]]) -> Optional[Response]:
+    """304 response when the request's validators match the document's."""
+    if headers is None:
+        return None
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-Modified-Since is ignored when If-None-Match is present
+        matches = _etag_matches(if_none_match, headers["ETag"])
+    else:
+        since = request.headers.get("if-modified-since")
+        modified = headers.get("Last-Modified")
+        if since is None or modified is None:
+            return None
+        try:
+            matches = parsedate_to_datetime(modified) <= parsedate_to_datetime(since)
+        except (TypeError, ValueError):
+            return None
+    return Response(status_code=304, headers=headers) if matches else None
+
+
+def with_cache_control(response: Response, cache_control: Optional[str]) -> Response:
+    """Set the Cache-Control policy of an endpoint on its response."""
+    if cache_control:
+        response.headers["Cache-Control"] = cache_control
+    return response
@@ -0,0 +1,111 @@
+"""In-process cache of the collections list and the rendered landing page.
+
+`/` and `/collections` are what every client (pystac_client's `Client.open`
+first of all) hits before anything else, and both used to read and encode
+every collection on each request. They are now served from encoded bytes kept
+per worker.
+
+Collection writes bump a version counter stored in mongo (`stac.stac_meta`),
+and each worker compares its cached version against it before serving from
+the cache. The check is a single `_id` lookup, so with several workers
+(`WEB_CONCURRENCY`) a write through any of them is seen by all. Setting
+`CATALOG_CHECK_INTERVAL` trades that for fewer lookups: workers then re-check
+at most that often and may serve a list that is stale by up to the interval.
+Collections written to mongo directly, bypassing the transactions client,
+don't bump the version.
+"""
+import time
+from typing import Dict, List, Optional
+
+from stac_fastapi.demo.encoding import encode
+from stac_fastapi.demo.serializers import CollectionSerializer
+
+VERSION_ID = "collections"
+
+# distinct base urls (Host headers) a worker keeps rendered pages for
+MAX_BASE_URLS = 16
+
+
+def read_version(meta_table) -> int:
+    """Current collections version, 0 before the first write."""
+    doc = meta_table.find_one({"_id": VERSION_ID})
+    return doc["version"] if doc else 0
+
+
+async def async_read_version(meta_table) -> int:
+    """Current collections version through a motor collection."""
+    doc = await meta_table.find_one({"_id": VERSION_ID})
+    return doc["version"] if doc else 0
+
+
+def bump_version(meta_table):
+    """Invalidate every worker's cache after a collection write."""
+    meta_table.update_one({"_id": VERSION_ID}, {"$inc": {"version": 1}}, upsert=True)
+
+
+async def async_bump_version(meta_table):
+    """Invalidate every worker's cache through a motor collection."""
+    await meta_table.update_one(
+        {"_id": VERSION_ID}, {"$inc": {"version": 1}}, upsert=True
+    )
+
+
+class CatalogSnapshot:
+    """Collections and rendered landing pages of one catalog version.
+
+    Both pages hold absolute links, so they are rendered per base url.
+    """
+
+    def __init__(self, version: int, collections: List[Dict]):
+        self.version = version
+        self.collections = collections
+        self.landing_pages: Dict[str, bytes] = {}
+        self.collections_pages: Dict[str, bytes] = {}
+
+    def store_landing_page(self, base_url: str, body: bytes):
+        """Cache the landing page rendered for `base_url`."""
+        if len(self.landing_pages) >= MAX_BASE_URLS:
+            self.landing_pages = {}
+        self.landing_pages[base_url] = body
+
+    def collections_page(self, base_url: str) -> bytes:
+        """The `/collections` document with the links of `base_url`."""
+        body = self.collections_pages.get(base_url)
+        if body is None:
+            body = encode(CollectionSerializer(base_url).collections(self.collections))
+            if len(self.collections_pages) >= MAX_BASE_URLS:
+                self.collections_pages = {}
+            self.collections_pages[base_url] = body
+        return body
+
+
+class CatalogCache:
+    """Snapshot of the current catalog version.
+
+    Requests take the snapshot once and only read from it, so a concurrent
+    invalidation replaces it without touching what they are serving.
+    """
+
+    def __init__(self, check_interval: float = 0):
+        self.check_interval = check_interval
+        self.version: Optional[int] = None
+        self.snapshot: Optional[CatalogSnapshot] = None
+        self._checked = 0.0
+
+    def needs_check(self) -> bool:
+        """Whether the version must be compared with mongo before serving."""
+        if self.version is None:
+            return True
+        return time.monotonic() - self._checked >= self.check_interval
+
+    def validate(self, version: int):
+        """Drop the snapshot when mongo holds another version."""
+        if version != self.version:
+            self.version = version
+            self.snapshot = None
+        self._checked = time.monotonic()
+
+    def store(self, snapshot: CatalogSnapshot):
+        """Keep a snapshot unless its version has been replaced meanwhile."""
+        if snapshot.version == self.version:
+            self.snapshot = snapshot
@@ -0,0 +1,224 @@
+"""Negotiated response compression.
+
+Replaces the Brotli middleware stac-fastapi installs by default (brotli or
+gzip only, whatever the client's preferences) with one that picks among
+zstd, brotli and gzip from `Accept-Encoding`, honouring q-values and falling
+back to the server's order (zstd, br, gzip) on ties. zstd needs the
+`zstandard` package (the `zstd` extra) and is not offered without it.
+
+Complete responses smaller than `COMPRESSION_MINIMUM_SIZE` are sent as is.
+Streamed pages (see streaming.py) are compressed chunk by chunk and flushed
+after each one so clients can decode features as they arrive. Only JSON and
+text bodies are compressed, and the ETag of a compressed response is made
+weak: the bytes differ from the identity representation, the content doesn't.
+"""
+import zlib
+from typing import Callable, Dict, List, Optional
+
+import brotli
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from stac_fastapi.demo.config import MongoSettings
+
+try:
+    import zstandard
+except ImportError:  # optional, see the `zstd` extra
+    zstandard = None
+
+COMPRESSIBLE_TYPES = ("application/json", "application/geo+json", "application/x-ndjson", "text/")
+
+
+class GzipCompressor:
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class BrotliCompressor:
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality, mode=brotli.MODE_TEXT)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class ZstdCompressor:
+    def __init__(self, level: int):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+def compressors(settings: MongoSettings) -> Dict[str, Callable]:
+    """Compressor factories by content coding, in server preference order."""
+    available = {}
+    if zstandard is not None:
+        available["zstd"] = lambda: ZstdCompressor(settings.compression_zstd_level)
+    available["br"] = lambda: BrotliCompressor(settings.compression_brotli_quality)
+    available["gzip"] = lambda: GzipCompressor(settings.compression_gzip_level)
+    return available
+
+
+def parse_accept_encoding(header: str) -> Dict[str, float]:
+    """Content codings of an Accept-Encoding header with their q-values."""
+    accepted = {}
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding] = quality
+    return accepted
+
+
+def negotiate(header: Optional[str], available: List[str]) -> Optional[str]:
+    """Content coding to respond with, None for identity."""
+    if not header:
+        return None
+    accepted = parse_accept_encoding(header)
+    wildcard = accepted.get("*", 0.0)
+    best, best_quality = None, 0.0
+    for coding in available:
+        quality = accepted.get(coding, wildcard)
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+def _compressible(headers: Headers) -> bool:
+    if "content-encoding" in headers:
+        return False
+    return headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing JSON and text responses."""
+
+    def __init__(self, app: ASGIApp, settings: Optional[MongoSettings] = None):
+        self.app = app
+        settings = settings or MongoSettings()
+        self.minimum_size = settings.compression_minimum_size
+        self.compressors = compressors(settings)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        coding = negotiate(
+            Headers(scope=scope).get("accept-encoding"), list(self.compressors)
+        )
+        if coding is None:
+            await self.app(scope, receive, self._vary(send))
+            return
+        send = _CompressingSend(send, coding, self.compressors[coding], self.minimum_size)
+        await self.app(scope, receive, send)
+
+    @staticmethod
+    def _vary(send: Send) -> Send:
+        """Mark compressible responses sent uncompressed as negotiated too."""
+
+        async def wrapper(message: Message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(raw=message["headers"])
+                if _compressible(headers):
+                    headers.add_vary_header("Accept-Encoding")
+            await send(message)
+
+        return wrapper
+
+
+class _CompressingSend:
+    """`send` of one response, compressing its body."""
+
+    def __init__(self, send: Send, coding: str, factory: Callable, minimum_size: int):
+        self.send = send
+        self.coding = coding
+        self.factory = factory
+        self.minimum_size = minimum_size
+        self.start: Optional[Message] = None
+        self.compressor = None
+        self.passthrough = False
+
+    async def __call__(self, message: Message):
+        if message["type"] == "http.response.start":
+            # held back until the first body chunk tells whether to compress
+            self.start = message
+            headers = Headers(raw=message["headers"])
+            self.passthrough = not _compressible(headers)
+            if not self.passthrough:
+                MutableHeaders(raw=message["headers"]).add_vary_header("Accept-Encoding")
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self._flush_start()
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.compressor is None:
+            if not more_body and len(body) < self.minimum_size:
+                self.passthrough = True
+                await self._flush_start()
+                await self.send(message)
+                return
+            self.compressor = self.factory()
+            self._compressed_headers(streamed=more_body)
+
+        if more_body:
+            chunk = self.compressor.compress(body) + self.compressor.flush()
+        else:
+            chunk = self.compressor.compress(body) + self.compressor.finish()
+            if self.start is not None:
+                # a complete response, compressed in one go
+                MutableHeaders(raw=self.start["headers"])["content-length"] = str(len(chunk))
+        await self._flush_start()
+        await self.send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+    def _compressed_headers(self, streamed: bool):
+        headers = MutableHeaders(raw=self.start["headers"])
+        headers["content-encoding"] = self.coding
+        if streamed:
+            del headers["content-length"]
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            headers["etag"] = "W/" + etag
+
+    async def _flush_start(self):
+        if self.start is not None:
+            start, self.start = self.start, None
+            await self.send(start)
+
+
+def compress(data: bytes, factory: Callable) -> bytes:
+    """Compress a whole body, as the middleware does, for benchmarks."""
+    compressor = factory()
+    return compressor.compress(data) + compressor.finish()
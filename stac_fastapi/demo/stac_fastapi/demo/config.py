@@ -1,38 +1,91 @@
 """API configuration."""
 import os
+from typing import Dict
 
-from pymongo import GEOSPHERE, MongoClient, errors
+from pymongo import MongoClient
 
 from stac_fastapi.types.config import ApiSettings
 
 DOMAIN = os.getenv("MONGO_HOST")
 PORT = os.getenv("MONGO_PORT")
 
+
 class MongoSettings(ApiSettings):
     """API settings."""
 
+    # serve the API with the motor backed async clients instead of the pymongo ones
+    mongo_async: bool = False
+    # create the missing indices of indexes.INDEXES at startup, turn off when
+    # the index CLI runs at deploy time instead
+    ensure_indexes: bool = True
+    # connection pool of each worker, see database.py
+    mongo_max_pool_size: int = 20
+    mongo_min_pool_size: int = 0
+    mongo_wait_queue_timeout_ms: int = 2000
+    mongo_server_selection_timeout_ms: int = 3000
+    # item pages of at least this many items are streamed, see streaming.py
+    stream_threshold: int = 1000
+    stream_batch_size: int = 100
+    # number of compiled search plans kept per worker, see planner.py
+    plan_cache_size: int = 256
+    # what to do with a sortby no index supports: "reject" (400), "create" the
+    # supporting index, or "allow" the in-memory sort
+    unindexed_sort: str = "reject"
+    # field the search `datetime` interval applies to: the forecast
+    # "issue_date" month or the item "datetime", see datetimes.py
+    datetime_field: str = "issue_date"
+    # numberMatched of the Context extension: "exact", "capped" at count_cap or
+    # "estimated", cached for count_ttl seconds, see counting.py
+    count_mode: str = "capped"
+    count_cap: int = 10000
+    count_ttl: float = 30
+    # seconds a worker serves cached collections without checking the catalog
+    # version in mongo, see catalog.py
+    catalog_check_interval: float = 0
+    # items per bulk_write of the bulk_items endpoint, see bulk.py
+    bulk_batch_size: int = 500
+    # searches waiting longer than this on mongo are logged with their explain()
+    # summary, see metrics.py; 0 disables the log
+    slow_query_ms: float = 500
+    # Cache-Control header per endpoint: "landing", "collections",
+    # "collection", "items", "item" and "search" (JSON in the environment);
+    # items and collections are revalidated with their ETag, see caching.py
+    cache_control: Dict[str, str] = {"collection": "no-cache", "item": "no-cache"}
+    # responses smaller than this are sent uncompressed, and the level of each
+    # content coding, see compression.py and scripts/benchmarks/bench_compression.py
+    compression_minimum_size: int = 1024
+    compression_gzip_level: int = 6
+    compression_brotli_quality: int = 4
+    compression_zstd_level: int = 3
+
+    @property
+    def client_options(self) -> dict:
+        """Connection and pool options shared by the pymongo and motor clients."""
+        return dict(
+            host=[str(DOMAIN) + ":" + str(PORT)],
+            serverSelectionTimeoutMS=self.mongo_server_selection_timeout_ms,
+            maxPoolSize=self.mongo_max_pool_size,
+            minPoolSize=self.mongo_min_pool_size,
+            waitQueueTimeoutMS=self.mongo_wait_queue_timeout_ms,
+            username=os.getenv("MONGO_USER"),
+            password=os.getenv("MONGO_PASS"),
+        )
+
     @property
     def create_client(self):
-        """Create mongo client."""
+        """Create mongo client.
+
+        pymongo connects in the background, so this never blocks; use the
+        shared pool in database.py rather than a client per caller.
+        """
+        return MongoClient(**self.client_options)
+
+    @property
+    def create_async_client(self):
+        """Create motor client."""
         try:
-            client = MongoClient(
-                host=[str(DOMAIN) + ":" + str(PORT)],
-                serverSelectionTimeoutMS=3000,
-                username=os.getenv("MONGO_USER"),
-                password=os.getenv("MONGO_PASS"),
-            )
-
-            # create indices - they are only created if they don't already exist
-            item_table = client.stac.stac_item
-            item_table.create_index([("bbox", GEOSPHERE), ("properties.datetime", 1)])
-            item_table.create_index([("geometry", GEOSPHERE)])
-            item_table.create_index([("properties.datetime", 1)])
-            item_table.create_index([("properties.created", 1)])
-            item_table.create_index([("properties.updated", 1)])
-            item_table.create_index([("bbox", GEOSPHERE)])
-
-        except errors.ServerSelectionTimeoutError as err:
-            client = None
-            print("pymongo ERROR:", err)
-
-        return client
+            from motor.motor_asyncio import AsyncIOMotorClient
+        except ImportError:
+            raise RuntimeError("Motor must be installed in order to use the async clients")
+
+        return AsyncIOMotorClient(**self.client_options)
@@ -1,140 +1,132 @@
 """Item crud client."""
-import json
-from typing import Union, Optional, List, Type
-from urllib.parse import urljoin
-from bson.json_util import dumps
-import attr
-from datetime import datetime, timedelta
-from stac_fastapi.demo import serializers
-from pydantic import ValidationError
-from stac_fastapi.demo.types.error_checks import ErrorChecks
-from stac_fastapi.types.search import BaseSearchPostRequest
+from datetime import datetime
+from functools import partial
+from typing import Callable, Dict, List, Optional, Union
 
-from stac_fastapi.demo.config import MongoSettings
-from fastapi import HTTPException
+import attr
+from fastapi import Request
 from stac_fastapi.types.core import BaseCoreClient
+from stac_fastapi.types.search import BaseSearchPostRequest
 from stac_fastapi.types.stac import Collection, Collections, Item, ItemCollection, LandingPage
-from fastapi import Request
-from stac_pydantic.links import Relations
-from stac_pydantic.shared import MimeTypes
 
-from stac_pydantic.shared import BBox
-import xarray as xr
-import s3fs
+from stac_fastapi.demo.caching import VALIDATORS, is_conditional
+from stac_fastapi.demo.catalog import CatalogSnapshot, read_version
+from stac_fastapi.demo.core_base import CoreClientBase, ItemPage
+from stac_fastapi.demo.counting import count_matched
+from stac_fastapi.demo.database import MongoTables
+from stac_fastapi.demo.encoding import HIDDEN, NO_ID, collection_response, item_response
+from stac_fastapi.demo.metrics import slow_query, timed
+from stac_fastapi.demo.pagination import SortSpec
+from stac_fastapi.demo.serializers import CollectionSerializer, ItemSerializer
+from stac_fastapi.demo.streaming import stream_response
 
 NumType = Union[float, int]
 
 
-
-def generate_month_list(start_date, end_date):
-    # Parse start and end dates
-    # format like 2021-01-19T00:00:00Z
-    date_format = "%Y-%m-%dT%H:%M:%SZ"
-    start = datetime.strptime(start_date, date_format)
-    end = datetime.strptime(end_date, date_format)
-
-    # Initialize list to store formatted dates
-    month_list = []
-
-    # Iterate through each month between start and end dates
-    while start <= end:
-        # Format current date as YYYYMM and append to list
-        month_list.append(start.strftime("%Y%m"))
-        # Move to the next month
-        start += timedelta(days=32)
-        start = start.replace(day=1)
-
-    return month_list
-
-
 @attr.s
-class CoreCrudClient(BaseCoreClient):
+class CoreCrudClient(CoreClientBase, MongoTables, BaseCoreClient):
     """Client for core endpoints defined by stac."""
-    settings = MongoSettings()
-    client = settings.create_client
-    item_table = client.stac.stac_item
-    collection_table = client.stac.stac_collection
-    # error_check = ErrorChecks(client=client)
-    # item_serializer: Type[serializers.Serializer] = attr.ib(
-    #     default=serializers.ItemSerializer
-    # )
-    # collection_serializer: Type[serializers.Serializer] = attr.ib(
-    #     default=serializers.CollectionSerializer
-    # )
 
     def landing_page(self, **kwargs) -> LandingPage:
-        request: Request = kwargs["request"]
-        base_url = str(request.base_url)
-        extension_schemas = [
-            schema.schema_href for schema in self.extensions if schema.schema_href
-        ]
-        landing_page = self._landing_page(
-            base_url=base_url,
-            conformance_classes=self.conformance_classes(),
-            extension_schemas=extension_schemas,
-        )
-        # Add Collections links
-        collections = self.all_collections(request=kwargs["request"])
-        for collection in collections:
-            landing_page["links"].append(
-                {
-                    "rel": Relations.child.value,
-                    "type": MimeTypes.json.value,
-                    "title": collection.get("title") or collection.get("id"),
-                    "href": urljoin(base_url, f"collections/{collection['id']}"),
-                }
-            )
-        
-        # Add OpenAPI URL
-        landing_page["links"].append(
-            {
-                "rel": "service-desc",
-                "type": "application/vnd.oai.openapi+json;version=3.0",
-                "title": "OpenAPI service description",
-                "href": urljoin(base_url, request.app.openapi_url.lstrip("/")),
-            }
-        )
-        
-        # Add human readable service-doc
-        landing_page["links"].append(
-            {
-                "rel": "service-doc",
-                "type": "text/html",
-                "title": "OpenAPI service documentation",
-                "href": urljoin(base_url, request.app.docs_url.lstrip("/")),
-            }
-        )
-        return landing_page
+        return self._landing_page_response(kwargs["request"], self._catalog())
 
     def all_collections(self, **kwargs) -> Collections:
         """Read all collections from the database."""
-        collections = self.collection_table.find()
-        collections = [json.loads(dumps(collection)) for collection in collections]
-        return collections
+        return self._collections_response(kwargs["request"], self._catalog())
+
+    def _catalog(self) -> CatalogSnapshot:
+        """Return the cached collections, reloading them after a collection write."""
+        if self.catalog.needs_check():
+            self.catalog.validate(read_version(self.meta_table))
+        snapshot = self.catalog.snapshot
+        if snapshot is None:
+            version = self.catalog.version
+            snapshot = CatalogSnapshot(version, list(self.collection_table.find({}, HIDDEN)))
+            self.catalog.store(snapshot)
+        return snapshot
 
     def get_collection(self, collection_id: str, **kwargs) -> Collection:
         """Get collection by id."""
-        collection = self.collection_table.find_one({"id": collection_id})
-        return json.loads(dumps(collection))
+        request = kwargs["request"]
+        response, collection, headers = self._conditional_find(
+            self.collection_table, {"id": collection_id}, request, "collection"
+        )
+        if response is not None:
+            return response
+        if collection is not None:
+            collection = CollectionSerializer(str(request.base_url)).db_to_stac(collection)
+        return collection_response(collection, collection_id, headers)
 
     def item_collection(
         self, collection_id: str, limit: int = 10, token: str = None, **kwargs
     ) -> ItemCollection:
         """Read an item collection from the database."""
-        collection_children = (
-            self.item_table.find({"collection": collection_id})
+        return self._item_page(
+            self._items_page(collection_id, limit, token, kwargs["request"])
         )
-        items = [json.loads(dumps(item)) for item in collection_children]
-
-        return {
-            "type": "FeatureCollection",
-            "features": items
-        }
 
     def get_item(self, item_id: str, collection_id: str, **kwargs) -> Item:
         """Get item by item id, collection id."""
-        item = self.item_table.find_one({"id": item_id, "collection": collection_id})
-        return json.loads(dumps(item))
+        request = kwargs["request"]
+        response, item, headers = self._conditional_find(
+            self.item_table, {"id": item_id, "collection": collection_id}, request, "item"
+        )
+        if response is not None:
+            return response
+        if item is not None:
+            item = ItemSerializer(str(request.base_url)).db_to_stac(item)
+        return item_response(item, item_id, collection_id, headers)
+
+    def _conditional_find(self, table, query: Dict, request: Request, endpoint: str):
+        """Read a document, answering conditional requests.
+
+        Returns the 304 response (None when the request's validators don't
+        match), the document (None when missing) and its validator headers.
+        """
+        if is_conditional(request):
+            with timed("mongo"):
+                validators = table.find_one(query, VALIDATORS)
+            response = self._not_modified(request, validators, endpoint)
+            if response is not None:
+                return response, None, None
+        with timed("mongo"):
+            doc = table.find_one(query, NO_ID)
+        return self._found(request, doc, endpoint)
+
+    def _context(self, queries: Dict, limit: int) -> Optional[Callable[[int], Dict]]:
+        """Count the matches of `queries` when the Context extension is enabled."""
+        args = self._count_args(queries)
+        if args is None:
+            return None
+        with timed("mongo"):
+            count = count_matched(self.item_table, *args)
+        return self._context_fields(count, limit)
+
+    def _unindexed_sort(self, keys: SortSpec):
+        """Apply the `unindexed_sort` policy to a sort no index supports."""
+        if self._create_sort_index(keys):
+            self.item_table.create_index(keys)
+            self.planner.add_index(keys)
+
+    def _item_page(self, page: ItemPage):
+        """Read a page of items, streamed or buffered."""
+        results = page.find(self.item_table)
+        context = self._context(page.filter, page.limit)
+        log_slow = partial(
+            slow_query,
+            lambda: page.find(self.item_table),
+            page.queries,
+            page.sort,
+            threshold_ms=self.settings.slow_query_ms,
+        )
+        stream = page.stream(context, log_slow)
+        if stream is not None:
+            return page.cached(stream_response(results.batch_size(stream.batch_size), stream))
+
+        with timed("mongo") as query:
+            found = list(results)
+        log_slow(query.elapsed)
+        return page.response(found, context)
 
     def get_search(
         self,
@@ -150,187 +142,17 @@ class CoreCrudClient(BaseCoreClient):
         **kwargs,
     ) -> ItemCollection:
         """GET search catalog."""
-        base_args = {
-            "collections": collections,
-            "ids": ids,
-            "bbox": bbox,
-            "limit": limit,
-            "token": token,
-            "datetime": datetime,
-            "query": json.loads(query) if query else query,
-        }
-        pass
+        search_request = self._search_request(
+            collections, ids, bbox, datetime, limit, query, token, fields, sortby,
+            kwargs.get("intersects"),
+        )
+        return self.post_search(search_request, request=kwargs["request"])
 
     def post_search(
         self, search_request: BaseSearchPostRequest, **kwargs
     ) -> ItemCollection:
         """POST search catalog."""
-        base_url = str(kwargs["request"].base_url)
-        queries = {}
-
-        queries.update({"collection": {"$in": search_request.collections}})
-
-        if search_request.intersects:
-            intersect_filter = {
-                "geometry": {
-                    "$geoIntersects": {
-                        "$geometry": {
-                            "type": search_request.intersects.type,
-                            "coordinates": search_request.intersects.coordinates,
-                        }
-                    }
-                }
-            }
-            queries.update(**intersect_filter)
-
-
-        print("DATETIME")
-        print(search_request.datetime)
-        str_start_date = search_request.datetime.split("/")[0]
-        str_end_date = search_request.datetime.split("/")[1]
-        print(str_start_date)
-        print(str_end_date)
-
-        parsed_dates = generate_month_list(str_start_date, str_end_date)
-        print(parsed_dates)
-        print("+++++++++++++++++++++++++++++++++++++")
-        # # parse date format like 2021-01-19T00:00:00Z
-        # date_format = "%Y-%m-%dT%H:%M:%SZ"
-        # start_date = datetime.strptime(str_start_date,date_format)
-        # end_date = datetime.strptime(str_end_date,date_format)
-        print("---")
-        if search_request.datetime:
-            datetime_filter = {
-                "properties.issue_date": { "$in": parsed_dates }
-            }
-            print("QUERY")
-            print(datetime_filter)
-            queries.update(**datetime_filter)
-
-        if search_request.query:
-            if type(search_request.query) == str:
-                search_request.query = json.loads(search_request.query)
-            for (field_name, expr) in search_request.query.items():
-                field = "properties." + field_name
-                for (op, value) in expr.items():
-                    key_filter = {field: {f"${op}": value}}
-                    queries.update(**key_filter)
-
-        if search_request.bbox:
-            bbox_filter = {
-                "bbox": {
-                    "$geoWithin": {
-                        "$geometry": {
-                            "type": "Polygon",
-                            "coordinates": [
-                                [
-                                    [search_request.bbox[0], search_request.bbox[1]],
-                                    [search_request.bbox[2], search_request.bbox[1]],
-                                    [search_request.bbox[2], search_request.bbox[3]],
-                                    [search_request.bbox[0], search_request.bbox[3]],
-                                    [search_request.bbox[0], search_request.bbox[1]]
-                                ]
-                            ]
-                        }
-                    }
-                }
-            }
-            queries.update(**bbox_filter)
-
-        results = (self.item_table.find(queries).limit(search_request.limit))
-
-        items = [json.loads(dumps(item)) for item in results]
-
-        return ItemCollection(
-            type="FeatureCollection",
-            features=items
-        )
-
-    
-    def test_endpoint() -> str:
-        return "Hello World"
-
-
-    # def post_search(
-    #     self, search_request: BaseSearchPostRequest, **kwargs
-    # ) -> ItemCollection:
-    #     """POST search catalog."""
-    #     base_url = str(kwargs["request"].base_url)
-    #     queries = {}
-
-    #     queries.update({"collection": {"$in": search_request.collections}})
-
-    #     if search_request.intersects:
-    #         intersect_filter = {
-    #             "geometry": {
-    #                 "$geoIntersects": {
-    #                     "$geometry": {
-    #                         "type": search_request.intersects.type,
-    #                         "coordinates": search_request.intersects.coordinates,
-    #                     }
-    #                 }
-    #             }
-    #         }
-    #         queries.update(**intersect_filter)
-
-    #     if search_request.query:
-    #         if type(search_request.query) == str:
-    #             search_request.query = json.loads(search_request.query)
-    #         for (field_name, expr) in search_request.query.items():
-    #             field = "properties." + field_name
-    #             for (op, value) in expr.items():
-    #                 key_filter = {field: {f"${op}": value}}
-    #                 queries.update(**key_filter)
-
-    #     if search_request.bbox:
-    #         bbox_filter = {
-    #             "bbox": {
-    #                 "$geoWithin": {
-    #                     "$geometry": {
-    #                         "type": "Polygon",
-    #                         "coordinates": [
-    #                             [
-    #                                 [search_request.bbox[0], search_request.bbox[1]],
-    #                                 [search_request.bbox[2], search_request.bbox[1]],
-    #                                 [search_request.bbox[2], search_request.bbox[3]],
-    #                                 [search_request.bbox[0], search_request.bbox[3]],
-    #                                 [search_request.bbox[0], search_request.bbox[1]]
-    #                             ]
-    #                         ]
-    #                     }
-    #                 }
-    #             }
-    #         }
-    #         queries.update(**bbox_filter)
-
-    #     results = (self.item_table.find(queries).limit(search_request.limit))
-
-    #     items = [json.loads(dumps(item)) for item in results]
-    #     print("ITEMS")
-    #     print(items)
-    #     print("...")
-    #     fs_s3 = s3fs.S3FileSystem(anon=True) 
-
-    #     # read nc files and return the data in assets field
-    #     for item in items:
-    #         print(item['assets'])
-    #         print("--")
-    #         if item["assets"]:
-    #             file_nc = item["assets"]['data']['href']
-    #             s3_file_obj = fs_s3.open(file_nc, mode='rb')
-
-    #             data = xr.open_dataset(s3_file_obj,engine='h5netcdf')
-    #             print(data)
-
-    #             # cast time to string
-    #             data['time'] = data['time'].astype(str)
-
-    #             item['assets']['data']['values'] = data.to_dict()
-        
-    #     print("ITEMS")
-    #     print(items)
-
-    #     return ItemCollection(
-    #         type="FeatureCollection",
-    #         features=items
-    #     )
+        plan = self.planner.plan(search_request)
+        if plan.sort_index:
+            self._unindexed_sort(plan.sort_index)
+        return self._item_page(self._search_page(search_request, plan, kwargs["request"]))
@@ -0,0 +1,303 @@
+"""Request handling shared by the pymongo and motor core clients.
+
+`CoreCrudClient` (core.py) and `AsyncCoreCrudClient` (async_core.py) only
+differ in how they talk to mongo: they run the queries and hand what they
+read to the synchronous helpers of `CoreClientBase`, which build the landing
+page, turn GET search parameters into a search request, plan searches and
+answer conditional requests. `ItemPage` is a page of items, from its mongo
+query to its response, buffered or streamed.
+"""
+import json
+from functools import partial
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import unquote_plus, urljoin
+
+import attr
+from fastapi import HTTPException, Request
+from pydantic import ValidationError
+from stac_fastapi.types.errors import InvalidQueryParameter
+from stac_fastapi.types.search import BaseSearchPostRequest
+from stac_pydantic.links import Relations
+from stac_pydantic.shared import MimeTypes
+from starlette.responses import Response
+
+from stac_fastapi.demo.caching import (
+    ETAG_FIELD,
+    document_headers,
+    not_modified,
+    with_cache_control,
+)
+from stac_fastapi.demo.catalog import CatalogCache, CatalogSnapshot
+from stac_fastapi.demo.config import MongoSettings
+from stac_fastapi.demo.counting import CountCache, context_fields
+from stac_fastapi.demo.encoding import HIDDEN, JSON, encode, item_collection_response
+from stac_fastapi.demo.fields import parse_get_fields
+from stac_fastapi.demo.metrics import record_results, timed
+from stac_fastapi.demo.pagination import SortSpec, page_query, paginate, pagination_links
+from stac_fastapi.demo.planner import QueryPlanner, parse_get_sortby
+from stac_fastapi.demo.serializers import ItemSerializer
+from stac_fastapi.demo.streaming import FeatureStream, should_stream, wants_ndjson
+
+
+@attr.s
+class ItemPage:
+    """A page of items: its mongo query, and its response from the documents read."""
+
+    request: Request = attr.ib()
+    settings: MongoSettings = attr.ib()
+    # filter before paging, counted by the Context extension
+    filter: Dict = attr.ib()
+    projection: Dict = attr.ib()
+    sort: Optional[SortSpec] = attr.ib()
+    limit: int = attr.ib()
+    token: Optional[str] = attr.ib()
+    # cache control setting of the endpoint
+    endpoint: str = attr.ib()
+    serializer: Optional[ItemSerializer] = attr.ib()
+    # POST search body, carried by the pagination links
+    body: Optional[Dict] = attr.ib(default=None)
+
+    def __attrs_post_init__(self):
+        self.queries, self.sort, self.forward = page_query(self.filter, self.sort, self.token)
+
+    def find(self, table):
+        """Cursor of the page, and of its first item of the next page."""
+        return table.find(self.queries, self.projection).sort(self.sort).limit(self.limit + 1)
+
+    def stream(
+        self,
+        context: Optional[Callable[[int], Dict]],
+        done: Optional[Callable[[float], None]] = None,
+    ) -> Optional[FeatureStream]:
+        """Encoder of a streamed response, None when the page is sent whole.
+
+        `done` gets the mongo time of the stream once it is read.
+        """
+        if not should_stream(self.request, self.limit, self.settings):
+            return None
+        return FeatureStream(
+            self.limit,
+            self.sort,
+            self.forward,
+            self.token,
+            links=partial(pagination_links, self.request, body=self.body),
+            ndjson=wants_ndjson(self.request),
+            batch_size=self.settings.stream_batch_size,
+            context=context,
+            serialize=self.serializer.db_to_stac if self.serializer else None,
+            done=done,
+        )
+
+    def response(self, found: List[Dict], context: Optional[Callable[[int], Dict]]) -> Response:
+        """The FeatureCollection of the documents read."""
+        docs, next_token, prev_token = paginate(
+            found, self.limit, self.sort, self.forward, self.token
+        )
+        extra = context(len(docs)) if context else {}
+        record_results(len(docs))
+        with timed("encode"):
+            if self.serializer is not None:
+                docs = self.serializer.page(docs)
+            response = item_collection_response(
+                docs,
+                pagination_links(self.request, next_token, prev_token, body=self.body),
+                **extra,
+            )
+        return self.cached(response)
+
+    def cached(self, response: Response) -> Response:
+        return with_cache_control(response, self.settings.cache_control.get(self.endpoint))
+
+
+@attr.s
+class CoreClientBase:
+    """Everything of the core clients but their mongo calls."""
+
+    settings = MongoSettings()
+    planner = QueryPlanner(
+        cache_size=settings.plan_cache_size, datetime_field=settings.datetime_field
+    )
+    counts = CountCache(ttl=settings.count_ttl)
+    catalog = CatalogCache(check_interval=settings.catalog_check_interval)
+
+    def _landing_page_response(self, request: Request, catalog: CatalogSnapshot) -> Response:
+        """The landing page, built once per base url and catalog version."""
+        base_url = str(request.base_url)
+        body = catalog.landing_pages.get(base_url)
+        if body is None:
+            body = encode(self._landing_page_document(request, catalog))
+            catalog.store_landing_page(base_url, body)
+        return self._cached(body, "landing")
+
+    def _landing_page_document(self, request: Request, catalog: CatalogSnapshot) -> Dict:
+        base_url = str(request.base_url)
+        extension_schemas = [
+            schema.schema_href for schema in self.extensions if schema.schema_href
+        ]
+        landing_page = self._landing_page(
+            base_url=base_url,
+            conformance_classes=self.conformance_classes(),
+            extension_schemas=extension_schemas,
+        )
+        # Add Collections links
+        for collection in catalog.collections:
+            landing_page["links"].append(
+                {
+                    "rel": Relations.child.value,
+                    "type": MimeTypes.json.value,
+                    "title": collection.get("title") or collection.get("id"),
+                    "href": urljoin(base_url, f"collections/{collection['id']}"),
+                }
+            )
+
+        # Add OpenAPI URL
+        landing_page["links"].append(
+            {
+                "rel": "service-desc",
+                "type": "application/vnd.oai.openapi+json;version=3.0",
+                "title": "OpenAPI service description",
+                "href": urljoin(base_url, request.app.openapi_url.lstrip("/")),
+            }
+        )
+
+        # Add human readable service-doc
+        landing_page["links"].append(
+            {
+                "rel": "service-doc",
+                "type": "text/html",
+                "title": "OpenAPI service documentation",
+                "href": urljoin(base_url, request.app.docs_url.lstrip("/")),
+            }
+        )
+        return landing_page
+
+    def _collections_response(self, request: Request, catalog: CatalogSnapshot) -> Response:
+        return self._cached(catalog.collections_page(str(request.base_url)), "collections")
+
+    def _cached(self, body: bytes, endpoint: str) -> Response:
+        return with_cache_control(
+            Response(body, media_type=JSON), self.settings.cache_control.get(endpoint)
+        )
+
+    def _not_modified(self, request: Request, validators: Optional[Dict], endpoint: str):
+        """The 304 answering a conditional request from a document's stored validators.
+
+        None when they don't match, or when the document has no stored ETag
+        and has to be read whole to hash it.
+        """
+        if validators is None or ETAG_FIELD not in validators:
+            return None
+        return not_modified(request, self._headers(request, validators, endpoint))
+
+    def _found(
+        self, request: Request, doc: Optional[Dict], endpoint: str
+    ) -> Tuple[Optional[Response], Optional[Dict], Optional[Dict]]:
+        """The 304 (None when the validators don't match), the document and its headers."""
+        if doc is None:
+            return None, None, None
+        headers = self._headers(request, doc, endpoint)
+        return not_modified(request, headers), doc, headers
+
+    def _headers(self, request: Request, doc: Dict, endpoint: str) -> Dict[str, str]:
+        return document_headers(
+            doc, str(request.base_url), self.settings.cache_control.get(endpoint)
+        )
+
+    def _count_args(self, queries: Dict) -> Optional[Tuple]:
+        """Arguments of `count_matched` after the table.
+
+        None when the Context extension is disabled.
+        """
+        if not self.extension_is_enabled("ContextExtension"):
+            return None
+        return queries, self.settings.count_mode, self.settings.count_cap, self.counts
+
+    @staticmethod
+    def _context_fields(count, limit: int) -> Callable[[int], Dict]:
+        """Function building the context members from the number of returned items."""
+        return partial(context_fields, count, limit)
+
+    def _create_sort_index(self, keys: SortSpec) -> bool:
+        """Apply the `unindexed_sort` policy to a sort no index supports.
+
+        True when the index has to be created, raises when the sort is rejected.
+        """
+        policy = self.settings.unindexed_sort
+        if policy == "create":
+            return True
+        if policy != "allow":
+            fields = ", ".join(field for field, _ in keys)
+            raise InvalidQueryParameter(f"Sorting by {fields} is not supported by an index")
+        return False
+
+    def _search_request(
+        self,
+        collections=None,
+        ids=None,
+        bbox=None,
+        datetime=None,
+        limit=10,
+        query=None,
+        token=None,
+        fields=None,
+        sortby=None,
+        intersects=None,
+    ) -> BaseSearchPostRequest:
+        """The POST search request of GET /search parameters."""
+        base_args = {
+            "collections": collections,
+            "ids": ids,
+            "bbox": bbox,
+            "limit": limit,
+            "token": token,
+            "query": json.loads(query) if query else query,
+        }
+        if datetime:
+            base_args["datetime"] = datetime
+        # the GET request model splits every parameter on ",", geojson included
+        if intersects:
+            base_args["intersects"] = json.loads(unquote_plus(",".join(intersects)))
+        if sortby:
+            base_args["sortby"] = parse_get_sortby(sortby)
+        if fields:
+            base_args["fields"] = parse_get_fields(fields)
+
+        try:
+            return self.post_request_model(**base_args)
+        except ValidationError:
+            raise HTTPException(status_code=400, detail="Invalid parameters provided")
+
+    def _items_page(
+        self, collection_id: str, limit: int, token: Optional[str], request: Request
+    ) -> ItemPage:
+        return ItemPage(
+            request,
+            self.settings,
+            {"collection": collection_id},
+            HIDDEN,
+            None,
+            limit,
+            token,
+            "items",
+            ItemSerializer(str(request.base_url)),
+        )
+
+    def _search_page(
+        self, search_request: BaseSearchPostRequest, plan, request: Request
+    ) -> ItemPage:
+        # GET /search is delegated here, its links carry the token in the query string
+        body = None
+        if request.method == "POST":
+            body = json.loads(search_request.json(exclude_none=True))
+        return ItemPage(
+            request,
+            self.settings,
+            plan.filter,
+            plan.projection,
+            plan.sort,
+            search_request.limit,
+            search_request.token,
+            "search",
+            ItemSerializer(str(request.base_url)),
+            body,
+        )
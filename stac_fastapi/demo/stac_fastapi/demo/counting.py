@@ -0,0 +1,130 @@
+"""`numberMatched` for the Context extension.
+
+Counting every match would cost as much as the search itself, so the count
+strategy is picked per deployment (`COUNT_MODE`):
+
+    exact      count_documents on the search filter
+    capped     count at most `COUNT_CAP` matches; past that `matched` is the
+               cap and the context carries `"more": true`
+    estimated  collection metadata: estimated_document_count for unfiltered
+               searches, an index-only count for searches filtered by
+               collection alone, capped for everything else
+
+Counts are cached per filter for `COUNT_TTL` seconds, so paging through the
+results of a search counts its matches once.
+"""
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from bson import json_util
+
+COUNT_MODES = ("exact", "capped", "estimated")
+
+# (matched, more)
+Count = Tuple[int, bool]
+
+
+class CountCache:
+    """Small TTL cache of match counts keyed on the mongo filter."""
+
+    def __init__(self, ttl: float = 30, maxsize: int = 1024):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._counts: "OrderedDict[str, Tuple[float, Count]]" = OrderedDict()
+
+    @staticmethod
+    def key(mode: str, queries: Dict) -> str:
+        """Cache key of a count."""
+        return mode + json_util.dumps(queries, sort_keys=True)
+
+    def get(self, key: str) -> Optional[Count]:
+        """Return a cached count, None when missing or expired."""
+        entry = self._counts.get(key)
+        if entry is None:
+            return None
+        expires, count = entry
+        if expires < time.monotonic():
+            self._counts.pop(key, None)
+            return None
+        return count
+
+    def set(self, key: str, count: Count):
+        """Cache a count, evicting the oldest one when full."""
+        self._counts[key] = (time.monotonic() + self.ttl, count)
+        self._counts.move_to_end(key)
+        while len(self._counts) > self.maxsize:
+            self._counts.popitem(last=False)
+
+    def clear(self):
+        """Drop every cached count."""
+        self._counts.clear()
+
+
+def count_strategy(queries: Dict, mode: str) -> str:
+    """Pick how to count the matches of `queries` in `mode`."""
+    if mode not in COUNT_MODES:
+        raise ValueError(f"Unknown count mode {mode}, expected one of {COUNT_MODES}")
+    if mode == "estimated":
+        if not queries:
+            return "metadata"
+        if set(queries) == {"collection"}:
+            return "exact"
+        return "capped"
+    return mode
+
+
+def count_matched(table, queries: Dict, mode: str, cap: int, cache: CountCache) -> Count:
+    """Count the items matching `queries` with a pymongo collection."""
+    key = cache.key(mode, queries)
+    count = cache.get(key)
+    if count is not None:
+        return count
+
+    strategy = count_strategy(queries, mode)
+    if strategy == "metadata":
+        count = (table.estimated_document_count(), False)
+    elif strategy == "capped":
+        matched = table.count_documents(queries, limit=cap + 1)
+        count = (min(matched, cap), matched > cap)
+    else:
+        count = (table.count_documents(queries), False)
+
+    cache.set(key, count)
+    return count
+
+
+async def async_count_matched(
+    table, queries: Dict, mode: str, cap: int, cache: CountCache
+) -> Count:
+    """Count the items matching `queries` with a motor collection."""
+    key = cache.key(mode, queries)
+    count = cache.get(key)
+    if count is not None:
+        return count
+
+    strategy = count_strategy(queries, mode)
+    if strategy == "metadata":
+        count = (await table.estimated_document_count(), False)
+    elif strategy == "capped":
+        matched = await table.count_documents(queries, limit=cap + 1)
+        count = (min(matched, cap), matched > cap)
+    else:
+        count = (await table.count_documents(queries), False)
+
+    cache.set(key, count)
+    return count
+
+
+def context_fields(count: Optional[Count], limit: int, returned: int) -> Dict:
+    """Context extension members of an item page."""
+    context = {"returned": returned, "limit": limit}
+    fields = {"numberReturned": returned}
+    if count is not None:
+        matched, more = count
+        context["matched"] = matched
+        fields["numberMatched"] = matched
+        if more:
+            context["more"] = True
+    fields["context"] = context
+    return fields
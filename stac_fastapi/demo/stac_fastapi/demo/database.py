@@ -0,0 +1,89 @@
+"""Process wide mongo connection pool.
+
+Every client (core, transactions, bulk) goes through the `mongo` pool instead
+of opening its own `MongoClient` at import. The app connects it on startup and
+closes it on shutdown, so importing the package never blocks on server
+selection and the number of connections is bounded by `MONGO_MAX_POOL_SIZE`
+per worker (times `WEB_CONCURRENCY` per host).
+
+pymongo and motor reconnect on their own: while mongo is down requests fail
+with 503 (see app.py) and `/_mgmt/ready` reports it, and both recover without
+a restart once it is back.
+"""
+from typing import Optional
+
+from pymongo import errors
+
+from stac_fastapi.demo.config import MongoSettings
+
+
+class MongoPool:
+    """Lazily connected pymongo or motor client shared by the process."""
+
+    def __init__(self):
+        self.client = None
+        self.asynchronous = False
+
+    def connect(self, settings: Optional[MongoSettings] = None, asynchronous: Optional[bool] = None):
+        """Create the client. Neither driver blocks here, they connect in the background."""
+        if self.client is not None:
+            return self.client
+        settings = settings or MongoSettings()
+        self.asynchronous = settings.mongo_async if asynchronous is None else asynchronous
+        if self.asynchronous:
+            self.client = settings.create_async_client
+        else:
+            self.client = settings.create_client
+        return self.client
+
+    def close(self):
+        """Close every pooled connection."""
+        if self.client is not None:
+            self.client.close()
+            self.client = None
+
+    @property
+    def db(self):
+        """The `stac` database, connecting on first use outside of the app lifespan."""
+        if self.client is None:
+            self.connect()
+        return self.client.stac
+
+    def ping(self) -> bool:
+        """Check that a server is reachable."""
+        try:
+            self.db.command("ping")
+        except errors.ConnectionFailure:
+            return False
+        return True
+
+    async def async_ping(self) -> bool:
+        """Check that a server is reachable through motor."""
+        try:
+            await self.db.command("ping")
+        except errors.ConnectionFailure:
+            return False
+        return True
+
+
+mongo = MongoPool()
+
+
+class MongoTables:
+    """Mongo collections of the shared pool, mixed into the API clients."""
+
+    @property
+    def client(self):
+        return mongo.connect()
+
+    @property
+    def item_table(self):
+        return mongo.db.stac_item
+
+    @property
+    def collection_table(self):
+        return mongo.db.stac_collection
+
+    @property
+    def meta_table(self):
+        return mongo.db.stac_meta
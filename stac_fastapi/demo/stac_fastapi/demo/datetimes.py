@@ -0,0 +1,123 @@
+"""Datetime search filters.
+
+The `datetime` search parameter is turned into a range predicate on an
+indexed field, for every STAC interval form: an instant, `start/end`, and
+intervals open on either side (`../end`, `start/..`, `/end`, `start/`).
+
+Which field the interval applies to is set per deployment (`DATETIME_FIELD`):
+
+    issue_date  forecast issue month, `properties.issue_date`: the interval
+                selects the items issued in the months it touches
+    datetime    `properties.datetime`, stored as RFC 3339 UTC strings
+
+Both are normalized at ingest to strings which sort like what they stand for,
+so an interval is a plain index range scan: `issue_date` to a zero padded
+`YYYYMM` (a single month is then an equality match), `datetime` to UTC with
+the fractions of a second always written out to microseconds
+(`2024-02-01T10:00:00.000000Z`). A string comparison of mixed widths would
+put `10:00:00.3Z` before `10:00:00Z`.
+"""
+import re
+from datetime import date, datetime, timezone
+from typing import Dict, Optional, Tuple
+
+from pydantic.datetime_parse import parse_datetime
+
+from stac_fastapi.types.errors import InvalidQueryParameter
+
+DATETIME_FIELDS = {
+    "issue_date": "properties.issue_date",
+    "datetime": "properties.datetime",
+}
+
+OPEN_ENDS = ("", "..")
+
+_MONTH = re.compile(r"(\d{4})-?(\d{2})(?!\d)")
+
+
+def _parse(value) -> datetime:
+    if isinstance(value, str):
+        value = value.strip()
+    try:
+        instant = parse_datetime(value)
+    except (TypeError, ValueError):
+        raise InvalidQueryParameter(f"Invalid datetime {value}")
+    if instant.tzinfo is None:
+        return instant.replace(tzinfo=timezone.utc)
+    return instant.astimezone(timezone.utc)
+
+
+def parse_interval(value: str) -> Tuple[Optional[datetime], Optional[datetime]]:
+    """Parse a STAC datetime parameter into (start, end), None for open ends."""
+    parts = value.split("/")
+    if len(parts) == 1:
+        instant = _parse(parts[0])
+        return instant, instant
+    if len(parts) != 2:
+        raise InvalidQueryParameter(f"Invalid datetime interval {value}")
+
+    start, end = (None if part.strip() in OPEN_ENDS else _parse(part) for part in parts)
+    if start is not None and end is not None and start > end:
+        raise InvalidQueryParameter(f"Invalid datetime interval {value}, start is after end")
+    return start, end
+
+
+def issue_month(instant: date) -> str:
+    """`YYYYMM` issue key of a date or an instant."""
+    return instant.strftime("%Y%m")
+
+
+def rfc3339(instant: datetime) -> str:
+    """Format an UTC instant like the stored `properties.datetime`."""
+    return instant.strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+def datetime_filter(value: str, field: str = "issue_date") -> Dict:
+    """Mongo filter selecting the items in a STAC datetime interval."""
+    if field not in DATETIME_FIELDS:
+        raise ValueError(f"Unknown datetime field {field}, expected one of {set(DATETIME_FIELDS)}")
+    start, end = parse_interval(value)
+    key = issue_month if field == "issue_date" else rfc3339
+    low = key(start) if start is not None else None
+    high = key(end) if end is not None else None
+
+    if field == "issue_date" and low is not None and low == high:
+        return {DATETIME_FIELDS[field]: low}
+    condition = {}
+    if low is not None:
+        condition["$gte"] = low
+    if high is not None:
+        condition["$lte"] = high
+    return {DATETIME_FIELDS[field]: condition} if condition else {}
+
+
+def normalize_issue_date(value) -> str:
+    """Canonical `YYYYMM` form of an issue date.
+
+    Accepts `YYYYMM` strings or integers, `YYYY-MM`, dates and datetimes.
+    """
+    if isinstance(value, date):
+        return issue_month(value)
+    if isinstance(value, int) and not isinstance(value, bool):
+        value = str(value)
+    match = _MONTH.match(value.strip()) if isinstance(value, str) else None
+    if match is None or not 1 <= int(match.group(2)) <= 12:
+        raise InvalidQueryParameter(f"Invalid issue_date {value}, expected YYYYMM")
+    return match.group(1) + match.group(2)
+
+
+def normalize_datetime(value) -> str:
+    """Canonical form of a `properties.datetime`, from a string or a datetime."""
+    return rfc3339(_parse(value))
+
+
+def normalize_item(item: Dict) -> Dict:
+    """Normalize the typed search keys of an item before it is stored."""
+    properties = item.get("properties")
+    if not isinstance(properties, dict):
+        return item
+    if properties.get("issue_date") is not None:
+        properties["issue_date"] = normalize_issue_date(properties["issue_date"])
+    if properties.get("datetime") is not None:
+        properties["datetime"] = normalize_datetime(properties["datetime"])
+    return item
@@ -0,0 +1,67 @@
+"""Mongo document to JSON response encoding.
+
+Documents are read without `_id` (see `HIDDEN`) so they are plain JSON types,
+encoded once with orjson and returned as a ready `Response`, which the
+stac-fastapi route wrapper passes through untouched. This replaces
+`json.loads(bson.json_util.dumps(doc))`, which serialised every document,
+parsed it back and left FastAPI to serialise it a second time.
+"""
+from typing import Any, Dict, List, Optional
+
+import orjson
+from bson import json_util
+from starlette.responses import Response
+
+from stac_fastapi.types.errors import NotFoundError
+
+NO_ID = {"_id": 0}
+# internal members never sent to clients: mongo's id and the stored ETag (caching.py)
+HIDDEN = {"_id": 0, "_etag": 0}
+
+GEOJSON = "application/geo+json"
+JSON = "application/json"
+
+# bson.json_util only kicks in for values orjson can't handle natively
+# (ObjectId, Decimal128, ...); naive bson datetimes are UTC
+_OPTIONS = orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z
+
+
+def encode(obj: Any) -> bytes:
+    """Encode a document (or any structure of documents) to JSON bytes."""
+    return orjson.dumps(obj, default=json_util.default, option=_OPTIONS)
+
+
+def canonical(obj: Any) -> bytes:
+    """Encode with sorted keys, for hashing."""
+    return orjson.dumps(obj, default=json_util.default, option=_OPTIONS | orjson.OPT_SORT_KEYS)
+
+
+def json_response(obj: Any, media_type: str = JSON) -> Response:
+    """Wrap an already encodable structure in a response."""
+    return Response(encode(obj), media_type=media_type)
+
+
+def item_response(
+    item: Optional[Dict], item_id: str, collection_id: str, headers: Optional[Dict] = None
+) -> Response:
+    """Encode a single item, raising NotFoundError when it is missing."""
+    if item is None:
+        raise NotFoundError(f"Item {item_id} in collection {collection_id} not found")
+    return Response(encode(item), media_type=GEOJSON, headers=headers)
+
+
+def collection_response(
+    collection: Optional[Dict], collection_id: str, headers: Optional[Dict] = None
+) -> Response:
+    """Encode a single collection, raising NotFoundError when it is missing."""
+    if collection is None:
+        raise NotFoundError(f"Collection {collection_id} not found")
+    return Response(encode(collection), media_type=JSON, headers=headers)
+
+
+def item_collection_response(items: List[Dict], links: List[Dict], **extra) -> Response:
+    """Encode a page of items as a FeatureCollection."""
+    return json_response(
+        {"type": "FeatureCollection", "features": items, "links": links, **extra},
+        GEOJSON,
+    )
@@ -0,0 +1,76 @@
+"""Fields extension pushed down to a mongo projection.
+
+`include`/`exclude` sets are turned into the projection of the `find` so
+unwanted fields never leave mongo. Fields an item can't do without, and the
+keys the page is sorted on (they feed the pagination tokens), are always kept.
+"""
+from typing import Dict, Iterable, List, Optional, Set
+
+from stac_fastapi.demo.encoding import HIDDEN, NO_ID
+
+# the members a STAC Item must have, whatever the request asked for
+REQUIRED_FIELDS = {
+    "type",
+    "stac_version",
+    "id",
+    "collection",
+    "geometry",
+    "bbox",
+    "links",
+    "assets",
+    "properties.datetime",
+}
+
+
+def parse_get_fields(fields: Optional[List[str]]) -> Dict[str, Set[str]]:
+    """Split GET `fields` (`a,+b,-c`) into include/exclude sets."""
+    include, exclude = set(), set()
+    for field in fields or []:
+        if field.startswith("-"):
+            exclude.add(field[1:])
+        else:
+            include.add(field.lstrip("+"))
+    return {"include": include, "exclude": exclude}
+
+
+def _is_ancestor(parent: str, field: str) -> bool:
+    return field.startswith(parent + ".")
+
+
+def _outermost(fields: Iterable[str]) -> Set[str]:
+    """Drop fields nested under another field of the set (mongo path collisions)."""
+    fields = set(fields)
+    return {f for f in fields if not any(_is_ancestor(p, f) for p in fields)}
+
+
+def fields_projection(fields, sort_fields: Iterable[str] = ()) -> Dict[str, int]:
+    """Build the mongo projection for a Fields extension request.
+
+    `fields` is the POST `PostFieldsExtension` model or a dict as returned by
+    `parse_get_fields`.
+    """
+    if fields is None:
+        return HIDDEN
+    if isinstance(fields, dict):
+        include, exclude = fields.get("include"), fields.get("exclude")
+    else:
+        include, exclude = fields.include, fields.exclude
+    include, exclude = set(include or ()), set(exclude or ())
+    keep = REQUIRED_FIELDS | set(sort_fields)
+
+    if include - exclude:
+        projection = {field: 1 for field in _outermost((include - exclude) | keep)}
+        # only _id can be excluded from an inclusion
+        projection.update(NO_ID)
+        return projection
+
+    # an exclusion can't reach into a kept field or one of its parents
+    exclude = {
+        field
+        for field in exclude
+        if not any(field == k or _is_ancestor(field, k) for k in keep)
+    }
+    projection = {field: 0 for field in _outermost(exclude)}
+    projection.update(HIDDEN)
+    return projection
+
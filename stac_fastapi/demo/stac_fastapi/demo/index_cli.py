@@ -0,0 +1,137 @@
+"""Index management CLI.
+
+    stac-fastapi-demo-indexes status             # spec vs live indices
+    stac-fastapi-demo-indexes create             # create the missing ones
+    stac-fastapi-demo-indexes drop [--dry-run]   # drop the ones not in the spec
+    stac-fastapi-demo-indexes reconcile [--dry-run]
+    stac-fastapi-demo-indexes verify [--corpus searches.json] [--collection c]
+
+`verify` compiles a corpus of representative searches with the API's query
+planner, runs `explain()` on the first page query of each and flags the ones
+whose winning plan scans the whole collection (COLLSCAN) or sorts in memory
+(SORT). It exits with 1 when a search is flagged, so it can gate deployments.
+A corpus file is a JSON list of `{"name": ..., "search": {POST /search body}}`.
+
+`create` and `reconcile` exit with 1 when mongo refuses to build an index, the
+unique `(collection, id)` one over duplicate items for instance.
+"""
+import argparse
+import json
+import sys
+from typing import Dict, List
+
+from pymongo.errors import OperationFailure
+from stac_fastapi.api.models import create_post_request_model
+from stac_fastapi.extensions.core import (
+    FieldsExtension,
+    QueryExtension,
+    SortExtension,
+    TokenPaginationExtension,
+)
+
+from stac_fastapi.demo.config import MongoSettings
+from stac_fastapi.demo.database import mongo
+from stac_fastapi.demo.indexes import INDEXES, apply_diff, diff_indexes, plan_flags, plan_stages
+from stac_fastapi.demo.pagination import page_query
+from stac_fastapi.demo.planner import QueryPlanner
+
+
+def default_corpus(collection: str) -> List[Dict]:
+    """The searches our clients run the most."""
+    return [
+        {"name": "items page", "search": {"collections": [collection]}},
+        {
+            "name": "issue month",
+            "search": {
+                "collections": [collection],
+                "datetime": "2024-02-01T00:00:00Z/2024-02-29T23:59:59Z",
+            },
+        },
+        {
+            "name": "issue months",
+            "search": {
+                "collections": [collection],
+                "datetime": "2023-11-01T00:00:00Z/2024-02-29T23:59:59Z",
+            },
+        },
+        {
+            "name": "model of an issue",
+            "search": {
+                "collections": [collection],
+                "datetime": "2024-02-01T00:00:00Z/2024-02-29T23:59:59Z",
+                "query": {"model": {"eq": 464}},
+            },
+        },
+        {"name": "ids", "search": {"ids": ["seasonal_forecast_1", "seasonal_forecast_2"]}},
+        {"name": "sort by id", "search": {"collections": [collection], "sortby": [{"field": "id", "direction": "asc"}]}},
+        {"name": "bbox", "search": {"collections": [collection], "bbox": [6.0, 36.0, 19.0, 47.5]}},
+    ]
+
+
+def verify(db, settings: MongoSettings, corpus: List[Dict]) -> int:
+    """Explain every search of the corpus, return the number flagged."""
+    search_model = create_post_request_model(
+        [QueryExtension(), SortExtension(), FieldsExtension(), TokenPaginationExtension()]
+    )
+    planner = QueryPlanner(cache_size=0, datetime_field=settings.datetime_field)
+    flagged = 0
+    print(f"{'search':<24}{'flags':<28}{'indexes':<50}stages")
+    for entry in corpus:
+        search = search_model(**entry["search"])
+        plan = planner.plan(search)
+        queries, sort, _ = page_query(plan.filter, plan.sort, None)
+        cursor = db.stac_item.find(queries, plan.projection).sort(sort).limit(search.limit + 1)
+        stages, indexes = plan_stages(cursor.explain())
+        flags = plan_flags(stages)
+        flagged += bool(flags)
+        print(f"{entry['name']:<24}{', '.join(flags) or 'ok':<28}{', '.join(indexes) or '-':<50}{' > '.join(stages)}")
+    return flagged
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the indices of the STAC mongo database.")
+    parser.add_argument("command", choices=["status", "create", "drop", "reconcile", "verify"])
+    parser.add_argument("--dry-run", action="store_true", help="only print what would change")
+    parser.add_argument("--corpus", help="JSON file of searches to verify")
+    parser.add_argument("--collection", default="seasonal_forecasts", help="collection of the default corpus")
+    args = parser.parse_args(argv)
+
+    settings = MongoSettings()
+    mongo.connect(settings, asynchronous=False)
+    if not mongo.ping():
+        sys.exit("mongo is not reachable")
+    db = mongo.db
+
+    if args.command == "verify":
+        if args.corpus:
+            with open(args.corpus) as f:
+                corpus = json.load(f)
+        else:
+            corpus = default_corpus(args.collection)
+        sys.exit(1 if verify(db, settings, corpus) else 0)
+
+    failed = False
+    create = args.command in ("create", "reconcile")
+    drop = args.command in ("drop", "reconcile")
+    for name, spec in INDEXES.items():
+        diff = diff_indexes(list(db[name].list_indexes()), spec)
+        print(f"{name}: in sync" if not diff else f"{name}:")
+        for index in diff.missing:
+            print(f"  missing  {index.name}")
+        for index in diff.changed:
+            print(f"  changed  {index.name}")
+        for index in diff.extra:
+            print(f"  extra    {index}")
+        if args.command != "status" and not args.dry_run:
+            try:
+                apply_diff(db[name], diff, create=create, drop=drop)
+            except OperationFailure as err:
+                # e.g. a unique index over duplicates, which have to be removed first
+                print(f"  failed   {err}")
+                failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""Declarative index spec and its reconciliation with mongo.
+
+`INDEXES` lists, per mongo collection, every index the API relies on. The
+`stac-fastapi-demo-indexes` CLI (see index_cli.py) creates, drops and
+reconciles the live indices against it outside of app startup; at startup the
+app only creates the missing ones (`ENSURE_INDEXES`), with one `list_indexes`
+per collection when nothing is missing. An index mongo refuses to build
+(a unique index over duplicates) is logged and doesn't stop the others.
+`plan_stages`/`plan_flags` read the index usage out of `explain()` outputs.
+"""
+import logging
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import attr
+from pymongo import GEOSPHERE, IndexModel
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+
+def _keys(keys: Sequence) -> Tuple[Tuple[str, Any], ...]:
+    return tuple((field, direction) for field, direction in keys)
+
+
+@attr.s(frozen=True)
+class IndexSpec:
+    """One index: its keys, in order, and options."""
+
+    keys: Tuple[Tuple[str, Any], ...] = attr.ib(converter=_keys)
+    unique: bool = attr.ib(default=False)
+
+    @property
+    def name(self) -> str:
+        """Default mongo name of the index."""
+        return "_".join(f"{field}_{direction}" for field, direction in self.keys)
+
+    def model(self) -> IndexModel:
+        """IndexModel for `create_indexes`."""
+        return IndexModel(list(self.keys), name=self.name, unique=self.unique)
+
+    def matches(self, info: Dict) -> bool:
+        """Check a `list_indexes` entry against the spec."""
+        return _keys(info["key"].items()) == self.keys and bool(info.get("unique")) == self.unique
+
+
+ITEM_INDEXES = [
+    # bbox filter, the datetime suffix doesn't prevent bbox only queries
+    IndexSpec([("bbox", GEOSPHERE), ("properties.datetime", 1)]),
+    IndexSpec([("geometry", GEOSPHERE)]),
+    IndexSpec([("properties.created", 1)]),
+    IndexSpec([("properties.updated", 1)]),
+    # item identity (conflicts of concurrent inserts), get_item, ids filter and sortby=id
+    IndexSpec([("collection", 1), ("id", 1)], unique=True),
+    IndexSpec([("id", 1)]),
+    # keyset pagination order, see pagination.DEFAULT_SORT
+    IndexSpec([("properties.datetime", 1), ("id", 1)]),
+    IndexSpec([("collection", 1), ("properties.datetime", 1), ("id", 1)]),
+    # month range of the datetime filter, see datetimes.py
+    IndexSpec(
+        [("collection", 1), ("properties.issue_date", 1), ("properties.datetime", 1), ("id", 1)]
+    ),
+]
+
+COLLECTION_INDEXES = [
+    IndexSpec([("id", 1)], unique=True),
+]
+
+# mongo collection name -> indices, all in the `stac` database
+INDEXES = {
+    "stac_item": ITEM_INDEXES,
+    "stac_collection": COLLECTION_INDEXES,
+}
+
+
+@attr.s
+class IndexDiff:
+    """Differences between the spec and the live indices of a collection."""
+
+    missing: List[IndexSpec] = attr.ib(factory=list)
+    extra: List[str] = attr.ib(factory=list)
+    # same name, different keys or options: dropped then created
+    changed: List[IndexSpec] = attr.ib(factory=list)
+
+    def __bool__(self):
+        return bool(self.missing or self.extra or self.changed)
+
+
+def diff_indexes(live: List[Dict], spec: List[IndexSpec]) -> IndexDiff:
+    """Compare `list_indexes` output with the spec of a collection."""
+    diff = IndexDiff()
+    live = {info["name"]: info for info in live if info["name"] != "_id_"}
+    for index in spec:
+        match = next((name for name, info in live.items() if index.matches(info)), None)
+        if match is not None:
+            live.pop(match)
+        elif index.name in live:
+            diff.changed.append(index)
+            live.pop(index.name)
+        else:
+            diff.missing.append(index)
+    diff.extra = list(live)
+    return diff
+
+
+def _build_failed(
+    name: str, index: IndexSpec, err: OperationFailure, failure: Optional[OperationFailure]
+) -> OperationFailure:
+    logger.error("index %s of %s not created: %s", index.name, name, err)
+    return failure or err
+
+
+def ensure_indexes(db, indexes: Dict[str, List[IndexSpec]] = INDEXES) -> Dict[str, List[str]]:
+    """Create the missing indices of every collection, returning their names.
+
+    Each index is built on its own; once they have all been tried, raises
+    the first `OperationFailure` of those mongo refused.
+    """
+    created, failure = {}, None
+    for name, spec in indexes.items():
+        diff = diff_indexes(list(db[name].list_indexes()), spec)
+        for index in diff.missing:
+            try:
+                created.setdefault(name, []).extend(db[name].create_indexes([index.model()]))
+            except OperationFailure as err:
+                failure = _build_failed(name, index, err, failure)
+    if failure is not None:
+        raise failure
+    return created
+
+
+async def async_ensure_indexes(db, indexes: Dict[str, List[IndexSpec]] = INDEXES):
+    """Create the missing indices through a motor database."""
+    created, failure = {}, None
+    for name, spec in indexes.items():
+        live = await db[name].list_indexes().to_list(length=None)
+        diff = diff_indexes(live, spec)
+        for index in diff.missing:
+            try:
+                names = await db[name].create_indexes([index.model()])
+            except OperationFailure as err:
+                failure = _build_failed(name, index, err, failure)
+            else:
+                created.setdefault(name, []).extend(names)
+    if failure is not None:
+        raise failure
+    return created
+
+
+def apply_diff(collection, diff: IndexDiff, create: bool = True, drop: bool = False):
+    """Bring a collection's indices in line with the spec.
+
+    `create` builds the missing (and changed) indices, `drop` removes the ones
+    the spec doesn't list; changed indices need both.
+    """
+    if drop:
+        for name in diff.extra:
+            collection.drop_index(name)
+    if create and drop:
+        for index in diff.changed:
+            collection.drop_index(index.name)
+    to_create = diff.missing + (diff.changed if create and drop else [])
+    if create and to_create:
+        collection.create_indexes([index.model() for index in to_create])
+
+
+def plan_stages(explain: Dict) -> Tuple[List[str], List[str]]:
+    """Stage and index names of the winning plan of an `explain()` output."""
+    winning = explain["queryPlanner"]["winningPlan"]
+    # slot based engine (mongo 5+) nests the classic plan under queryPlan
+    winning = winning.get("queryPlan", winning)
+    stages, indexes = [], []
+
+    def walk(node):
+        stages.append(node.get("stage"))
+        if "indexName" in node:
+            indexes.append(node["indexName"])
+        if "inputStage" in node:
+            walk(node["inputStage"])
+        for child in node.get("inputStages", []):
+            walk(child)
+
+    walk(winning)
+    return stages, indexes
+
+
+def plan_flags(stages: List[str]) -> List[str]:
+    """Problems of a winning plan."""
+    flags = []
+    if "COLLSCAN" in stages:
+        flags.append("COLLSCAN")
+    if "SORT" in stages:
+        flags.append("in-memory SORT")
+    return flags
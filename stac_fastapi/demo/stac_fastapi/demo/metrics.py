@@ -0,0 +1,225 @@
+"""Request instrumentation, Prometheus metrics and the slow-query log.
+
+`MetricsMiddleware` times every request until its last body chunk (streamed
+pages included) and labels it with the route template and the extension that
+registered the route (its router tag). Inside a request the clients add the
+time spent waiting on mongo and encoding responses, and the number of items
+returned, with `timed` and `record_results`; all of it is served from
+`/metrics` in the Prometheus text format.
+
+Searches and item pages (streamed ones included, timed over the whole stream)
+whose mongo time exceeds `SLOW_QUERY_MS` are logged to the
+`stac_fastapi.demo.slow_queries` logger with their compiled filter, sort and an
+`explain()` summary. The explain runs on a background thread, off the request.
+
+With several workers set `PROMETHEUS_MULTIPROC_DIR` so `/metrics` aggregates
+all of them.
+"""
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Optional
+
+from bson import json_util
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Histogram,
+    generate_latest,
+)
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import Match
+
+from stac_fastapi.demo.indexes import plan_flags, plan_stages
+
+logger = logging.getLogger("stac_fastapi.demo.slow_queries")
+
+LABELS = ("method", "route", "extension")
+
+REQUEST_SECONDS = Histogram(
+    "stac_request_duration_seconds",
+    "Request latency, until the last body chunk is sent.",
+    LABELS + ("status",),
+)
+MONGO_SECONDS = Histogram(
+    "stac_mongo_duration_seconds", "Time spent waiting on mongo per request.", LABELS
+)
+ENCODE_SECONDS = Histogram(
+    "stac_encode_duration_seconds", "Time spent encoding responses per request.", LABELS
+)
+RESULTS = Histogram(
+    "stac_results",
+    "Items returned per request.",
+    LABELS,
+    buckets=(0, 1, 10, 50, 100, 500, 1000, 5000, 10000),
+)
+RESPONSE_BYTES = Histogram(
+    "stac_response_bytes",
+    "Response body size.",
+    LABELS,
+    buckets=tuple(2 ** power for power in range(8, 28, 2)),
+)
+
+# per request accumulator, shared with the threadpool the sync clients run in
+_request: "ContextVar[Optional[Dict]]" = ContextVar("stac_request_metrics", default=None)
+
+_explainer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="slow-query-explain")
+
+
+class Timing:
+    """Elapsed seconds of a `timed` block, set when the block exits."""
+
+    elapsed = 0.0
+
+
+@contextmanager
+def timed(kind: str):
+    """Add the time spent in the block to the current request's `kind` ("mongo", "encode")."""
+    timing = Timing()
+    start = time.perf_counter()
+    try:
+        yield timing
+    finally:
+        timing.elapsed = time.perf_counter() - start
+        current = _request.get()
+        if current is not None:
+            current[kind] = current.get(kind, 0.0) + timing.elapsed
+
+
+def record_results(count: int):
+    """Record the number of items the current request returns."""
+    current = _request.get()
+    if current is not None:
+        current["results"] = current.get("results", 0) + count
+
+
+def explain_summary(explain: Dict) -> Dict:
+    """The parts of an `explain()` output worth logging."""
+    stages, indexes = plan_stages(explain)
+    stats = explain.get("executionStats", {})
+    return {
+        "stages": stages,
+        "indexes": indexes,
+        "flags": plan_flags(stages),
+        "keys_examined": stats.get("totalKeysExamined"),
+        "docs_examined": stats.get("totalDocsExamined"),
+        "returned": stats.get("nReturned"),
+        "millis": stats.get("executionTimeMillis"),
+    }
+
+
+def _log_slow_query(cursor, entry: Dict):
+    try:
+        entry["explain"] = explain_summary(cursor.explain())
+    except Exception as err:  # the explain is best effort, never fail the log
+        entry["explain"] = {"error": str(err)}
+    logger.warning("slow query %s", json_util.dumps(entry))
+
+
+def is_slow(elapsed: float, threshold_ms: float) -> bool:
+    """Whether a query took long enough to be logged, 0 disables the log."""
+    return 0 < threshold_ms <= elapsed * 1000
+
+
+def slow_query(make_cursor: Callable, queries: Dict, sort, elapsed: float, threshold_ms: float):
+    """Log a search whose mongo time exceeded the threshold.
+
+    `make_cursor` builds a fresh pymongo cursor for the same query, which is
+    explained in the background.
+    """
+    if not is_slow(elapsed, threshold_ms):
+        return
+    entry = {"filter": queries, "sort": sort, "mongo_ms": round(elapsed * 1000, 1)}
+    _explainer.submit(_log_slow_query, make_cursor(), entry)
+
+
+async def _async_log_slow_query(cursor, entry: Dict):
+    try:
+        entry["explain"] = explain_summary(await cursor.explain())
+    except Exception as err:
+        entry["explain"] = {"error": str(err)}
+    logger.warning("slow query %s", json_util.dumps(entry))
+
+
+# explain tasks in flight, the loop only keeps weak references to them
+_explains = set()
+
+
+def async_slow_query(make_cursor: Callable, queries: Dict, sort, elapsed: float, threshold_ms: float):
+    """Log a slow search run through motor, explained in a background task."""
+    if not is_slow(elapsed, threshold_ms):
+        return
+    entry = {"filter": queries, "sort": sort, "mongo_ms": round(elapsed * 1000, 1)}
+    task = asyncio.ensure_future(_async_log_slow_query(make_cursor(), entry))
+    _explains.add(task)
+    task.add_done_callback(_explains.discard)
+
+
+class MetricsMiddleware:
+    """ASGI middleware observing every HTTP request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    def _labels(self, scope) -> Dict[str, str]:
+        router = scope["app"].router
+        for route in router.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                tags = getattr(route, "tags", None)
+                return {
+                    "method": scope["method"],
+                    "route": route.path,
+                    "extension": tags[0] if tags else "core",
+                }
+        return {"method": scope["method"], "route": "unmatched", "extension": "none"}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        current = {}
+        token = _request.set(current)
+        start = time.perf_counter()
+        status, size = "500", 0
+
+        async def send_wrapper(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            _request.reset(token)
+            labels = self._labels(scope)
+            REQUEST_SECONDS.labels(status=status, **labels).observe(elapsed)
+            RESPONSE_BYTES.labels(**labels).observe(size)
+            if "mongo" in current:
+                MONGO_SECONDS.labels(**labels).observe(current["mongo"])
+            if "encode" in current:
+                ENCODE_SECONDS.labels(**labels).observe(current["encode"])
+            if "results" in current:
+                RESULTS.labels(**labels).observe(current["results"])
+
+
+def metrics(request: Request) -> Response:
+    """Prometheus scrape endpoint."""
+    registry = REGISTRY
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
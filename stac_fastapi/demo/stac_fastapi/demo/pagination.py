@@ -0,0 +1,181 @@
+"""Keyset (token) pagination helpers.
+
+A token is an opaque, url-safe encoding of the sort key values of the first or
+last item of a page plus the direction to move in. The next page is fetched
+with a range predicate on those values rather than with skip/offset, so deep
+pages cost the same as the first one as long as the sort is backed by an index.
+"""
+import base64
+import binascii
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import json_util
+from pymongo import ASCENDING, DESCENDING
+from stac_pydantic.shared import MimeTypes
+
+from stac_fastapi.types.errors import InvalidQueryParameter
+
+# newest items first, id breaks ties between items sharing a datetime
+DEFAULT_SORT = [("properties.datetime", DESCENDING), ("id", DESCENDING)]
+
+SortSpec = List[Tuple[str, int]]
+
+
+def encode_token(values: List[Any], forward: bool = True) -> str:
+    """Encode the sort key values of a page boundary into an opaque token."""
+    payload = json_util.dumps({"k": values, "d": "n" if forward else "p"})
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_token(token: str) -> Tuple[List[Any], bool]:
+    """Decode a token into (sort key values, forward)."""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json_util.loads(base64.urlsafe_b64decode(padded.encode()))
+        return payload["k"], payload["d"] == "n"
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise InvalidQueryParameter(f"Invalid pagination token {token}")
+
+
+def with_tiebreaker(sort: Optional[SortSpec]) -> SortSpec:
+    """Return the sort spec, falling back to the default and ending on `id`."""
+    sort = list(sort or DEFAULT_SORT)
+    if not any(field == "id" for field, _ in sort):
+        sort.append(("id", sort[-1][1]))
+    return sort
+
+
+def reverse_sort(sort: SortSpec) -> SortSpec:
+    """Flip the direction of every key of a sort spec."""
+    return [
+        (field, DESCENDING if direction == ASCENDING else ASCENDING)
+        for field, direction in sort
+    ]
+
+
+def sort_values(doc: Dict, sort: SortSpec) -> List[Any]:
+    """Extract the values of the (dotted) sort keys from a document."""
+    values = []
+    for field, _ in sort:
+        value = doc
+        for key in field.split("."):
+            value = value.get(key) if isinstance(value, dict) else None
+        values.append(value)
+    return values
+
+
+def keyset_filter(sort: SortSpec, values: List[Any]) -> Dict:
+    """Build the predicate selecting documents strictly after `values` in `sort` order."""
+    clauses = []
+    for i, (field, direction) in enumerate(sort):
+        clause = {prev_field: values[j] for j, (prev_field, _) in enumerate(sort[:i])}
+        clause[field] = {"$gt" if direction == ASCENDING else "$lt": values[i]}
+        clauses.append(clause)
+    return {"$or": clauses}
+
+
+def page_query(
+    queries: Dict, sort: Optional[SortSpec], token: Optional[str]
+) -> Tuple[Dict, SortSpec, bool]:
+    """Return the (filter, sort, forward) triple to fetch the page a token points to.
+
+    Backward pages are fetched in reversed sort order and flipped by `paginate`.
+    """
+    sort = with_tiebreaker(sort)
+    if not token:
+        return queries, sort, True
+
+    values, forward = decode_token(token)
+    if len(values) != len(sort):
+        raise InvalidQueryParameter(f"Invalid pagination token {token}")
+    if not forward:
+        sort = reverse_sort(sort)
+
+    keyset = keyset_filter(sort, values)
+    return ({"$and": [queries, keyset]} if queries else keyset), sort, forward
+
+
+def page_tokens(
+    first: Optional[Dict],
+    last: Optional[Dict],
+    has_more: bool,
+    sort: SortSpec,
+    forward: bool,
+    token: Optional[str],
+) -> Tuple[Optional[str], Optional[str]]:
+    """Compute the next/prev tokens of a page from its first and last documents.
+
+    `sort` and `forward` are the ones returned by `page_query`, `first`/`last`
+    are taken in output order and `has_more` tells whether the fetch returned
+    more than `limit` documents.
+    """
+    if forward:
+        has_next, has_prev = has_more, bool(token)
+    else:
+        sort = reverse_sort(sort)
+        has_next, has_prev = True, has_more
+
+    next_token = prev_token = None
+    if last is not None and has_next:
+        next_token = encode_token(sort_values(last, sort), forward=True)
+    if first is not None and has_prev:
+        prev_token = encode_token(sort_values(first, sort), forward=False)
+    return next_token, prev_token
+
+
+def paginate(
+    docs: List[Dict],
+    limit: int,
+    sort: SortSpec,
+    forward: bool,
+    token: Optional[str],
+) -> Tuple[List[Dict], Optional[str], Optional[str]]:
+    """Trim a `limit + 1` fetch into a page and compute its next/prev tokens."""
+    has_more = len(docs) > limit
+    docs = docs[:limit]
+    if not forward:
+        docs.reverse()
+
+    next_token, prev_token = page_tokens(
+        docs[0] if docs else None,
+        docs[-1] if docs else None,
+        has_more,
+        sort,
+        forward,
+        token,
+    )
+    return docs, next_token, prev_token
+
+
+def pagination_links(
+    request,
+    next_token: Optional[str],
+    prev_token: Optional[str],
+    body: Optional[Dict] = None,
+) -> List[Dict]:
+    """Build `next`/`prev` links for a GET page, or a POST page when `body` is given."""
+    links = []
+    for rel, token in (("next", next_token), ("prev", prev_token)):
+        if not token:
+            continue
+        if body is None:
+            links.append(
+                {
+                    "rel": rel,
+                    "type": MimeTypes.geojson.value,
+                    "method": "GET",
+                    "href": str(request.url.include_query_params(token=token)),
+                }
+            )
+        else:
+            links.append(
+                {
+                    "rel": rel,
+                    "type": MimeTypes.geojson.value,
+                    "method": "POST",
+                    "href": str(request.url),
+                    "body": {**body, "token": token},
+                    "merge": False,
+                }
+            )
+    return links
@@ -0,0 +1,261 @@
+"""Search query planner.
+
+Both GET and POST /search go through `QueryPlanner.plan`, which compiles the
+filter, sort and projection of a search request once per distinct request
+shape. Plans are kept in an LRU cache keyed on the normalized request (every
+parameter except `token` and `limit`, with list parameters sorted), so the
+handful of searches our dashboards repeat cost a dict lookup. Cached plans are
+shared between requests and must be treated as read-only.
+
+Every plan is also checked against the known item indices: a sort no index can
+deliver in order makes mongo scan and sort every match in memory (and fail past
+its 100MB sort limit), so such plans carry the compound index that would
+support them in `sort_index` for the client to reject or create. Likewise the
+Query extension predicates (compiled in query.py) are matched with the index
+that can bound them in `query_indexes`; the ones none can narrow down are
+logged when the plan is compiled.
+"""
+import json
+import logging
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+import attr
+from pymongo import ASCENDING, DESCENDING
+
+from stac_fastapi.demo.datetimes import datetime_filter
+from stac_fastapi.demo.fields import fields_projection
+from stac_fastapi.demo.indexes import ITEM_INDEXES, IndexSpec
+from stac_fastapi.demo.pagination import SortSpec, with_tiebreaker
+from stac_fastapi.demo.query import compile_query, item_field
+from stac_fastapi.types.search import BaseSearchPostRequest
+
+logger = logging.getLogger(__name__)
+
+# operators an index scan can be bounded by, see `index_bounds`
+BOUNDING_OPERATORS = {"$eq", "$in", "$lt", "$lte", "$gt", "$gte"}
+
+
+@attr.s(frozen=True)
+class SearchPlan:
+    """Compiled mongo filter, sort and projection of a search request."""
+
+    filter: Dict = attr.ib()
+    sort: SortSpec = attr.ib()
+    projection: Dict = attr.ib()
+    # index needed to sort without an in-memory SORT stage, None when one exists
+    sort_index: Optional[SortSpec] = attr.ib(default=None)
+    # (field, name of the index bounding it or None) of every `query` predicate
+    query_indexes: Tuple[Tuple[str, Optional[str]], ...] = attr.ib(default=())
+
+    @property
+    def unindexed(self) -> List[str]:
+        """Fields of the `query` predicates no index can narrow down."""
+        return [field for field, index in self.query_indexes if index is None]
+
+
+def normalize_request(search_request: BaseSearchPostRequest) -> str:
+    """Serialize the plan-relevant part of a search request into a cache key."""
+    request = search_request.dict(exclude={"token", "limit"}, exclude_none=True)
+    if isinstance(request.get("query"), str):
+        request["query"] = json.loads(request["query"])
+    for key in ("collections", "ids"):
+        if request.get(key):
+            request[key] = sorted(request[key])
+    return json.dumps(request, sort_keys=True, default=sorted)
+
+
+def build_filter(request: Dict, datetime_field: str = "issue_date") -> Dict:
+    """Translate a normalized search request into a mongo filter document."""
+    queries = {}
+
+    if request.get("collections"):
+        queries.update({"collection": {"$in": request["collections"]}})
+
+    if request.get("ids"):
+        queries.update({"id": {"$in": request["ids"]}})
+
+    if request.get("intersects"):
+        intersect_filter = {
+            "geometry": {
+                "$geoIntersects": {
+                    "$geometry": {
+                        "type": request["intersects"]["type"],
+                        "coordinates": request["intersects"]["coordinates"],
+                    }
+                }
+            }
+        }
+        queries.update(**intersect_filter)
+
+    if request.get("datetime"):
+        queries.update(**datetime_filter(request["datetime"], datetime_field))
+
+    if request.get("query"):
+        for field, condition in compile_query(request["query"]).items():
+            if field == "$and" or field in queries:
+                # keep both the query and the collections/ids/datetime predicates
+                queries.setdefault("$and", []).extend(
+                    condition if field == "$and" else [{field: condition}]
+                )
+            else:
+                queries[field] = condition
+
+    if request.get("bbox"):
+        bbox = request["bbox"]
+        bbox_filter = {
+            "bbox": {
+                "$geoWithin": {
+                    "$geometry": {
+                        "type": "Polygon",
+                        "coordinates": [
+                            [
+                                [bbox[0], bbox[1]],
+                                [bbox[2], bbox[1]],
+                                [bbox[2], bbox[3]],
+                                [bbox[0], bbox[3]],
+                                [bbox[0], bbox[1]]
+                            ]
+                        ]
+                    }
+                }
+            }
+        }
+        queries.update(**bbox_filter)
+
+    return queries
+
+
+def parse_get_sortby(sortby: List[str]) -> List[Dict[str, str]]:
+    """Split GET `sortby` (`a,+b,-c`) into the POST `sortby` members.
+
+    An unencoded `+` reaches the server as a space, which is ascending too.
+    """
+    fields = []
+    for sort in sortby:
+        sort = sort.strip()
+        fields.append(
+            {"field": sort.lstrip("+-"), "direction": "desc" if sort.startswith("-") else "asc"}
+        )
+    return fields
+
+
+def build_sort(request: Dict) -> Optional[SortSpec]:
+    """Translate the Sort extension `sortby` into a mongo sort spec."""
+    if not request.get("sortby"):
+        return None
+    return [
+        (item_field(sort["field"]), DESCENDING if sort["direction"] == "desc" else ASCENDING)
+        for sort in request["sortby"]
+    ]
+
+
+def equality_fields(queries: Dict) -> set:
+    """Fields the filter pins to one value, or to a list mongo can explode for sort."""
+    fields = set()
+    for field, condition in queries.items():
+        if field.startswith("$"):
+            continue
+        if not isinstance(condition, dict) or set(condition) <= {"$eq", "$in"}:
+            fields.add(field)
+    return fields
+
+
+def index_supports_sort(index: List, queries: Dict, sort: SortSpec) -> bool:
+    """Check whether walking `index` yields the filter matches in `sort` order.
+
+    The index may start with fields the filter pins by equality, the sort keys
+    must then follow in order, all in the index direction or all reversed.
+    """
+    keys = [(field, direction) for field, direction in index]
+    if any(not isinstance(direction, int) for _, direction in keys):
+        return False
+    pinned = equality_fields(queries)
+
+    for start in range(len(keys) - len(sort) + 1):
+        if not all(field in pinned for field, _ in keys[:start]):
+            break
+        window = keys[start:start + len(sort)]
+        if [field for field, _ in window] != [field for field, _ in sort]:
+            continue
+        same = [d == s for (_, d), (_, s) in zip(window, sort)]
+        if all(same) or not any(same):
+            return True
+    return False
+
+
+def index_bounds(condition) -> bool:
+    """Check whether an index on a field can narrow down its `condition`."""
+    if not isinstance(condition, dict):
+        return True
+    regex = condition.get("$regex")
+    if regex is not None:
+        # only a case sensitive prefix is turned into index bounds
+        return regex.startswith("^") and not condition.get("$options")
+    return bool(set(condition) & BOUNDING_OPERATORS)
+
+
+def predicate_index(indexes: List, queries: Dict, field: str) -> Optional[str]:
+    """Name of the first index that can bound the filter's predicate on `field`.
+
+    The field must follow index keys the filter pins by equality, as for sorts.
+    """
+    if not index_bounds(queries.get(field)):
+        return None
+    pinned = equality_fields(queries)
+    for index in indexes:
+        for key, direction in index:
+            if key == field:
+                return IndexSpec(index).name
+            if key not in pinned or not isinstance(direction, int):
+                break
+    return None
+
+
+@attr.s
+class QueryPlanner:
+    """Compile search requests into mongo plans, caching them by request shape."""
+
+    cache_size: int = attr.ib(default=256)
+    datetime_field: str = attr.ib(default="issue_date")
+    indexes: List = attr.ib(factory=lambda: [index.keys for index in ITEM_INDEXES])
+
+    def __attrs_post_init__(self):
+        """Wrap the compiler in an instance level LRU cache."""
+        self._compile = lru_cache(maxsize=self.cache_size)(self._compile_key)
+
+    def add_index(self, keys: List):
+        """Record a newly created index, dropping plans compiled without it."""
+        self.indexes.append(keys)
+        self._compile.cache_clear()
+
+    def plan(self, search_request: BaseSearchPostRequest) -> SearchPlan:
+        """Return the (possibly cached) plan of a search request."""
+        return self._compile(normalize_request(search_request))
+
+    def cache_info(self):
+        """Hit/miss statistics of the plan cache."""
+        return self._compile.cache_info()
+
+    def _compile_key(self, key: str) -> SearchPlan:
+        request = json.loads(key)
+        queries = build_filter(request, self.datetime_field)
+        sort = with_tiebreaker(build_sort(request))
+        supported = any(index_supports_sort(index, queries, sort) for index in self.indexes)
+        query_indexes = tuple(
+            (field, predicate_index(self.indexes, queries, field))
+            for field in dict.fromkeys(item_field(field) for field in request.get("query") or {})
+        )
+        plan = SearchPlan(
+            filter=queries,
+            sort=sort,
+            projection=fields_projection(
+                request.get("fields"), (field for field, _ in sort)
+            ),
+            sort_index=None if supported else sort,
+            query_indexes=query_indexes,
+        )
+        if plan.unindexed:
+            # once per distinct request shape, plans are cached
+            logger.info("query on %s is not narrowed down by an index", ", ".join(plan.unindexed))
+        return plan
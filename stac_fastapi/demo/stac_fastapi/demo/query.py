@@ -0,0 +1,107 @@
+"""Query extension compiler.
+
+Turns the `query` of a search into mongo predicates, one per field with all of
+its operators merged (`{"model": {"gte": 400, "lte": 420}}` becomes
+`{"properties.model": {"$gte": 400, "$lte": 420}}`). Operators are the ones of
+the STAC Query spec (plus `ne`, stac-fastapi's spelling of `neq`), anything
+else is rejected with a 400 rather than passed to mongo as `$<op>`.
+
+The string operators compile to escaped regexes: `startsWith` to a `^prefix`
+regex, the only kind an index can bound, `endsWith` and `contains` to
+unanchored ones that scan every key. A field with several of them keeps the
+first in its predicate and adds the others to a top-level `$and`.
+"""
+import re
+from typing import Any, Dict, List, Tuple
+
+from stac_fastapi.types.errors import InvalidQueryParameter
+
+# item fields living outside of `properties`
+TOP_LEVEL_FIELDS = {"id", "collection", "type", "stac_version", "geometry", "bbox"}
+
+COMPARISONS = {
+    "eq": "$eq",
+    "neq": "$ne",
+    "ne": "$ne",
+    "lt": "$lt",
+    "lte": "$lte",
+    "gt": "$gt",
+    "gte": "$gte",
+}
+# in the order their regexes are preferred as the field's predicate
+PATTERNS = {
+    "startsWith": lambda value: "^" + re.escape(value),
+    "endsWith": lambda value: re.escape(value) + "$",
+    "contains": re.escape,
+}
+OPERATORS = [*COMPARISONS, *PATTERNS, "in"]
+
+_SCALARS = (str, int, float, bool, type(None))
+
+
+def item_field(field: str) -> str:
+    """Resolve a STAC field name to its path in the item document."""
+    if field in TOP_LEVEL_FIELDS or field.startswith("properties."):
+        return field
+    return "properties." + field
+
+
+def _invalid(field: str, op: str, expected: str) -> InvalidQueryParameter:
+    return InvalidQueryParameter(f"Invalid query on {field}: {op} expects {expected}")
+
+
+def compile_predicate(field: str, expr: Dict[str, Any]) -> Tuple[Dict, List[str]]:
+    """Mongo condition of one field's operators, and its extra regexes."""
+    if not isinstance(expr, dict) or not expr:
+        raise InvalidQueryParameter(f"Invalid query on {field}: expected operators")
+    unknown = sorted(set(expr) - set(OPERATORS))
+    if unknown:
+        raise InvalidQueryParameter(
+            f"Unsupported query operator {', '.join(unknown)} on {field}, "
+            f"expected one of {', '.join(OPERATORS)}"
+        )
+
+    condition = {}
+    for op, value in expr.items():
+        if op in COMPARISONS:
+            if not isinstance(value, _SCALARS):
+                raise _invalid(field, op, "a value")
+            if COMPARISONS[op] in condition and condition[COMPARISONS[op]] != value:
+                raise InvalidQueryParameter(f"Invalid query on {field}: both neq and ne")
+            condition[COMPARISONS[op]] = value
+        elif op == "in":
+            if not isinstance(value, list) or not all(isinstance(v, _SCALARS) for v in value):
+                raise _invalid(field, op, "a list of values")
+            condition["$in"] = value
+
+    patterns = []
+    for op, pattern in PATTERNS.items():
+        if op in expr:
+            if not isinstance(expr[op], str):
+                raise _invalid(field, op, "a string")
+            patterns.append(pattern(expr[op]))
+    if patterns:
+        condition["$regex"] = patterns[0]
+    return condition, patterns[1:]
+
+
+def compile_query(query: Dict[str, Dict[str, Any]]) -> Dict:
+    """Mongo filter of a Query extension `query`."""
+    if not isinstance(query, dict):
+        raise InvalidQueryParameter("Invalid query: expected an object of fields")
+    queries = {}
+    extra = []
+    for field, expr in query.items():
+        path = item_field(field)
+        condition, patterns = compile_predicate(field, expr)
+        if path in queries and set(queries[path]) & set(condition):
+            # `model` and `properties.model` are the same field
+            extra.append({path: condition})
+        elif path in queries:
+            queries[path].update(condition)
+        else:
+            queries[path] = condition
+        extra.extend({path: {"$regex": pattern}} for pattern in patterns)
+    if extra:
+        queries["$and"] = extra
+    return queries
@@ -1,87 +1,88 @@
-"""Serializers."""
-import abc
-from typing import TypedDict
+"""Serializers.
+
+Add the inferred links (self, parent, collection, root, items) pystac_client
+navigates with to documents read from mongo. A serializer is created per
+request for its base url; the links shared by every item of a collection are
+built once per collection and reused, so an item only costs its `self` link.
+Documents are otherwise sent as stored, members they don't have are not
+filled in.
+"""
+from typing import Dict, List, Tuple
 
 import attr
 
-from stac_fastapi.types import stac as stac_types
-from stac_fastapi.types.links import CollectionLinks, ItemLinks, resolve_links
-
-
-@attr.s  # type:ignore
-class Serializer(abc.ABC):
-    """Defines serialization methods between the API and the data model."""
-
-    @classmethod
-    @abc.abstractmethod
-    def db_to_stac(cls, item: dict, base_url: str) -> TypedDict:
-        """Transform database model to stac."""
-        ...
-
-
-class ItemSerializer(Serializer):
-    """Serialization methods for STAC items."""
-
-    @classmethod
-    def db_to_stac(cls, item: dict, base_url: str) -> stac_types.Item:
-        """Transform database model to stac item."""
-        item_id = item["id"]
-        collection_id = item["collection"]
-        item_links = ItemLinks(
-            collection_id=collection_id, item_id=item_id, base_url=base_url
-        ).create_links()
-
-        original_links = item["links"]
-        if original_links:
-            item_links += resolve_links(original_links, base_url)
-
-        return stac_types.Item(
-            type="Feature",
-            stac_version=item["stac_version"] if "stac_version" in item else "",
-            stac_extensions=item["stac_extensions"]
-            if "stac_extensions" in item
-            else [],
-            id=item_id,
-            collection=item["collection"] if "collection" in item else "",
-            geometry=item["geometry"] if "geometry" in item else {},
-            bbox=item["bbox"] if "bbox" in item else [],
-            properties=item["properties"] if "properties" in item else {},
-            links=item_links if "links" in item else [],
-            assets=item["assets"] if "assets" in item else {},
-        )
-
-
-class CollectionSerializer(Serializer):
-    """Serialization methods for STAC collections."""
-
-    @classmethod
-    def db_to_stac(cls, collection: dict, base_url: str) -> stac_types.Collection:
-        """Transform database model to stac collection."""
-        collection_links = CollectionLinks(
-            collection_id=collection["id"], base_url=base_url
-        ).create_links()
-
-        original_links = collection["links"]
-        if original_links:
-            collection_links += resolve_links(original_links, base_url)
-
-        return stac_types.Collection(
-            type="Collection",
-            id=collection["id"],
-            stac_extensions=collection["stac_extensions"]
-            if "stac_extensions" in collection
-            else [],
-            stac_version=collection["stac_version"]
-            if "stac_version" in collection
-            else "",
-            title=collection["title"] if "title" in collection else "",
-            description=collection["description"]
-            if "description" in collection
-            else "",
-            keywords=collection["keywords"] if "keywords" in collection else [],
-            license=collection["license"] if "license" in collection else "",
-            providers=collection["providers"] if "providers" in collection else {},
-            summaries=collection["summaries"] if "summaries" in collection else {},
-            extent=collection["extent"] if "extent" in collection else {},
-            links=collection_links,
-        )
+from stac_fastapi.types.links import resolve_links
+
+from stac_fastapi.demo.encoding import GEOJSON, JSON
+
+
+def _link(rel: str, media_type: str, href: str) -> Dict[str, str]:
+    return {"rel": rel, "type": media_type, "href": href}
+
+
+@attr.s
+class ItemSerializer:
+    """Links of the items of one request."""
+
+    base_url: str = attr.ib()
+    # collection id -> (items url prefix, links shared by its items)
+    _templates: Dict[str, Tuple[str, List[Dict]]] = attr.ib(factory=dict, init=False)
+
+    def _template(self, collection_id: str) -> Tuple[str, List[Dict]]:
+        template = self._templates.get(collection_id)
+        if template is None:
+            collection_url = f"{self.base_url}collections/{collection_id}"
+            template = self._templates[collection_id] = (
+                collection_url + "/items/",
+                [
+                    _link("parent", JSON, collection_url),
+                    _link("collection", JSON, collection_url),
+                    _link("root", JSON, self.base_url),
+                ],
+            )
+        return template
+
+    def db_to_stac(self, item: Dict) -> Dict:
+        """Add the links to an item read from mongo, in place."""
+        prefix, shared = self._template(item["collection"])
+        links = [_link("self", GEOJSON, prefix + item["id"]), *shared]
+        stored = item.get("links")
+        if stored:
+            links += resolve_links(stored, self.base_url)
+        item["links"] = links
+        return item
+
+    def page(self, items: List[Dict]) -> List[Dict]:
+        """Add the links to a page of items."""
+        return [self.db_to_stac(item) for item in items]
+
+
+@attr.s
+class CollectionSerializer:
+    """Links of the collections of one request."""
+
+    base_url: str = attr.ib()
+
+    def db_to_stac(self, collection: Dict) -> Dict:
+        """A copy of a collection with its links, cached collections are shared."""
+        url = f"{self.base_url}collections/{collection['id']}"
+        links = [
+            _link("self", JSON, url),
+            _link("parent", JSON, self.base_url),
+            _link("items", GEOJSON, url + "/items"),
+            _link("root", JSON, self.base_url),
+        ]
+        stored = collection.get("links")
+        if stored:
+            links += resolve_links([dict(link) for link in stored], self.base_url)
+        return {**collection, "links": links}
+
+    def collections(self, collections: List[Dict]) -> Dict:
+        """The `/collections` document."""
+        return {
+            "collections": [self.db_to_stac(collection) for collection in collections],
+            "links": [
+                _link("root", JSON, self.base_url),
+                _link("self", JSON, f"{self.base_url}collections"),
+            ],
+        }
@@ -0,0 +1,187 @@
+"""Streaming FeatureCollection / NDJSON responses.
+
+Large pages are written to the client as the mongo cursor yields them instead
+of being materialised as a list first, so peak memory per request depends on
+the batch size rather than on the page size. The time spent waiting on the
+cursor is added up over the stream and handed to `done` once the last item is
+read, for the slow-query log.
+"""
+from typing import Callable, Dict, List, Optional
+
+from starlette.responses import StreamingResponse
+
+from stac_fastapi.demo.encoding import GEOJSON, encode
+from stac_fastapi.demo.metrics import record_results, timed
+from stac_fastapi.demo.pagination import SortSpec, page_tokens
+
+NDJSON = "application/x-ndjson"
+
+
+def wants_ndjson(request) -> bool:
+    """Check whether the client asked for newline delimited features."""
+    return NDJSON in request.headers.get("accept", "")
+
+
+def should_stream(request, limit: int, settings) -> bool:
+    """Stream NDJSON requests and pages of at least `settings.stream_threshold` items."""
+    return wants_ndjson(request) or limit >= settings.stream_threshold
+
+
+class FeatureStream:
+    """Incrementally encode one page of items.
+
+    Documents are fed in cursor order; `feed` returns a chunk every
+    `batch_size` documents. The extra `limit + 1`th document only signals that
+    a next page exists and is never written. Backward pages arrive in reversed
+    order and are buffered (at most `limit` documents) so they can be flipped.
+    Links go after the features because the next token is only known once the
+    last item has been read, and so does the Context extension `context`,
+    built by `context` from the number of returned items. NDJSON has nowhere
+    to put links, so it carries features only.
+    """
+
+    def __init__(
+        self,
+        limit: int,
+        sort: SortSpec,
+        forward: bool,
+        token: Optional[str],
+        links: Callable[[Optional[str], Optional[str]], List[Dict]],
+        ndjson: bool = False,
+        batch_size: int = 100,
+        context: Optional[Callable[[int], Dict]] = None,
+        serialize: Optional[Callable[[Dict], Dict]] = None,
+        done: Optional[Callable[[float], None]] = None,
+    ):
+        self.limit = limit
+        self.sort = sort
+        self.forward = forward
+        self.token = token
+        self.links = links
+        self.ndjson = ndjson
+        self.batch_size = batch_size
+        self.context = context
+        self.serialize = serialize
+        self.done = done
+        self.media_type = NDJSON if ndjson else GEOJSON
+        self.count = 0
+        self.has_more = False
+        self.first = None
+        self.last = None
+        # seconds spent waiting on the cursor
+        self.mongo_elapsed = 0.0
+        self._batch: List[bytes] = []
+        self._buffer: List[Dict] = []
+
+    def head(self) -> bytes:
+        """Opening bytes of the response."""
+        return b"" if self.ndjson else b'{"type":"FeatureCollection","features":['
+
+    def feed(self, doc: Dict) -> Optional[bytes]:
+        """Add a document, returning a chunk once a batch is full."""
+        if self.count == self.limit:
+            self.has_more = True
+            return None
+        self.count += 1
+        if self.serialize is not None:
+            doc = self.serialize(doc)
+
+        if not self.forward:
+            self._buffer.append(doc)
+            return None
+
+        if self.first is None:
+            self.first = doc
+        self.last = doc
+        self._batch.append(encode(doc))
+        if len(self._batch) >= self.batch_size:
+            return self._flush()
+        return None
+
+    def tail(self) -> bytes:
+        """Remaining features and the closing bytes of the response."""
+        if self._buffer:
+            self._buffer.reverse()
+            self.first, self.last = self._buffer[0], self._buffer[-1]
+            self._batch.extend(encode(doc) for doc in self._buffer)
+            self._buffer = []
+        chunk = self._flush()
+        if self.ndjson:
+            return chunk
+
+        next_token, prev_token = page_tokens(
+            self.first, self.last, self.has_more, self.sort, self.forward, self.token
+        )
+        links = encode(self.links(next_token, prev_token))
+        extra = b""
+        if self.context is not None:
+            # members of the encoded object, without its braces
+            extra = b"," + encode(self.context(self.count))[1:-1]
+        return chunk + b'],"links":' + links + extra + b"}"
+
+    def finish(self):
+        """Hand the mongo time of the stream to `done`."""
+        if self.done is not None:
+            self.done(self.mongo_elapsed)
+
+    def _flush(self) -> bytes:
+        if not self._batch:
+            return b""
+        if self.ndjson:
+            chunk = b"".join(feature + b"\n" for feature in self._batch)
+        else:
+            chunk = (b"," if self.count > len(self._batch) else b"") + b",".join(self._batch)
+        self._batch = []
+        return chunk
+
+
+def _iter_stream(cursor, stream: FeatureStream):
+    yield stream.head()
+    docs = iter(cursor)
+    while True:
+        with timed("mongo") as query:
+            doc = next(docs, None)
+        stream.mongo_elapsed += query.elapsed
+        if doc is None:
+            break
+        with timed("encode"):
+            chunk = stream.feed(doc)
+        if chunk:
+            yield chunk
+    with timed("encode"):
+        tail = stream.tail()
+    record_results(stream.count)
+    stream.finish()
+    yield tail
+
+
+async def _aiter_stream(cursor, stream: FeatureStream):
+    yield stream.head()
+    while True:
+        with timed("mongo") as query:
+            try:
+                doc = await cursor.__anext__()
+            except StopAsyncIteration:
+                doc = None
+        stream.mongo_elapsed += query.elapsed
+        if doc is None:
+            break
+        with timed("encode"):
+            chunk = stream.feed(doc)
+        if chunk:
+            yield chunk
+    with timed("encode"):
+        tail = stream.tail()
+    record_results(stream.count)
+    stream.finish()
+    yield tail
+
+
+def stream_response(cursor, stream: FeatureStream) -> StreamingResponse:
+    """Stream a pymongo cursor, one threadpool hop per batch."""
+    return StreamingResponse(_iter_stream(cursor, stream), media_type=stream.media_type)
+
+
+def async_stream_response(cursor, stream: FeatureStream) -> StreamingResponse:
+    """Stream a motor cursor."""
+    return StreamingResponse(_aiter_stream(cursor, stream), media_type=stream.media_type)
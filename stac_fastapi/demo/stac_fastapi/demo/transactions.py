@@ -1,12 +1,18 @@
 """transactions extension client."""
 
 import logging
-from datetime import datetime
+from typing import Dict, List
 
 import attr
-from stac_pydantic.shared import DATETIME_RFC339
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 
-from stac_fastapi.demo.config import MongoSettings
+from stac_fastapi.demo.bulk import check_items, write_results
+from stac_fastapi.demo.catalog import bump_version
+from stac_fastapi.demo.database import MongoTables
+from stac_fastapi.demo.encoding import HIDDEN
+from stac_fastapi.demo.transactions_base import TransactionsClientBase
+from stac_fastapi.demo.updates import collection_patch_update, item_patch_update
 from stac_fastapi.types import stac as stac_types
 from stac_fastapi.types.core import BaseTransactionsClient
 from stac_fastapi.demo.types.error_checks import ErrorChecks
@@ -15,43 +21,96 @@ logger = logging.getLogger(__name__)
 
 
 @attr.s
-class TransactionsClient(BaseTransactionsClient):
+class TransactionsClient(TransactionsClientBase, MongoTables, BaseTransactionsClient):
     """Transactions extension specific CRUD operations."""
-    settings = MongoSettings()
-    client = settings.create_client
-    item_table = client.stac.stac_item
-    collection_table = client.stac.stac_collection
-    error_check = ErrorChecks(client=client)
-    # item_serializer: Type[serializers.Serializer] = attr.ib(
-    #     default=serializers.ItemSerializer
-    # )
-    # collection_serializer: Type[serializers.Serializer] = attr.ib(
-    #     default=serializers.CollectionSerializer
-    # )
+
+    @property
+    def error_check(self) -> ErrorChecks:
+        return ErrorChecks(client=self.client)
 
     def create_item(self, model: stac_types.Item, **kwargs):
         """Create item."""
-        self.item_table.insert_one(model)
+        try:
+            self.item_table.insert_one(self._new_item(model))
+        except DuplicateKeyError:
+            raise self._item_conflict(model)
         return "success"
 
+    def check_collection(self, collection_id: str):
+        """Raise NotFoundError when the collection doesn't exist."""
+        self.error_check.check_collection_not_found(collection_id)
+
+    def bulk_item_insert(self, collection_id: str, batch: List, offset: int = 0, **kwargs):
+        """Insert a batch of items with one unordered bulk write.
+
+        Returns the per-item results, see `stac_fastapi.demo.bulk`.
+        """
+        valid, results = check_items(collection_id, batch, offset)
+        if not valid:
+            return results
+
+        error = None
+        try:
+            self.item_table.bulk_write(self._inserts(valid), ordered=False)
+        except BulkWriteError as err:
+            error = err
+        results.extend(write_results(valid, error))
+        return results
+
     def create_collection(self, model: stac_types.Collection, **kwargs):
         """Create collection."""
-        self.error_check.check_collection_conflict(model)
-        self.collection_table.insert_one(model)
+        try:
+            self.collection_table.insert_one(self._new_collection(model))
+        except DuplicateKeyError:
+            raise self._collection_conflict(model)
+        bump_version(self.meta_table)
         return "success"
 
     def update_item(self, model: stac_types.Item, **kwargs):
-        """Update item."""
-        self.delete_item(item_id=model["id"], collection_id=model["collection"])
-        now = datetime.utcnow().strftime(DATETIME_RFC339)
-        model["properties"]["updated"] = str(now)
-        self.create_item(model, **kwargs)
-        return model
+        """Replace (or create) an item in one round trip."""
+        model = self._replaced_item(model)
+        return self.item_table.find_one_and_replace(
+            {"id": model["id"], "collection": model["collection"]},
+            model,
+            projection=HIDDEN,
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
 
     def update_collection(self, model: stac_types.Collection, **kwargs):
-        """Update collection."""
-        self.delete_collection(model["id"])
-        self.create_collection(model, **kwargs)
+        """Replace (or create) a collection in one round trip."""
+        self.collection_table.replace_one(
+            {"id": model["id"]}, self._replaced_collection(model), upsert=True
+        )
+        bump_version(self.meta_table)
+        return model
+
+    def patch_item(self, collection_id: str, item_id: str, patch: Dict, **kwargs):
+        """Apply a merge patch to an item."""
+        item = self.item_table.find_one_and_update(
+            {"id": item_id, "collection": collection_id},
+            item_patch_update(patch),
+            projection=HIDDEN,
+            return_document=ReturnDocument.AFTER,
+        )
+        return self._patched_item(item, collection_id, item_id)
+
+    def patch_collection(self, collection_id: str, patch: Dict, **kwargs):
+        """Apply a merge patch to a collection."""
+        update = collection_patch_update(patch)
+        if not update:
+            collection = self.collection_table.find_one({"id": collection_id}, HIDDEN)
+        else:
+            collection = self.collection_table.find_one_and_update(
+                {"id": collection_id},
+                update,
+                projection=HIDDEN,
+                return_document=ReturnDocument.AFTER,
+            )
+        collection = self._patched_collection(collection, collection_id)
+        if update:
+            bump_version(self.meta_table)
+        return collection
 
     def delete_item(self, item_id: str, collection_id: str, **kwargs):
         """Delete item."""
@@ -60,3 +119,4 @@ class TransactionsClient(BaseTransactionsClient):
     def delete_collection(self, collection_id: str, **kwargs):
         """Delete collection."""
         self.collection_table.delete_one({"id": collection_id})
+        bump_version(self.meta_table)
@@ -0,0 +1,75 @@
+"""Write preparation shared by the pymongo and motor transactions clients.
+
+`TransactionsClient` (transactions.py) and `AsyncTransactionsClient`
+(async_transactions.py) only run the mongo writes; what they write, and what
+they make of the result, comes from `TransactionsClientBase`.
+"""
+from typing import Dict, List, Optional
+
+import attr
+from pymongo import InsertOne
+
+from stac_fastapi.demo.bulk import IndexedItem, already_exists
+from stac_fastapi.demo.caching import stamp
+from stac_fastapi.demo.config import MongoSettings
+from stac_fastapi.demo.datetimes import normalize_item
+from stac_fastapi.demo.updates import now
+from stac_fastapi.types import stac as stac_types
+from stac_fastapi.types.errors import ConflictError, NotFoundError
+
+
+@attr.s
+class TransactionsClientBase:
+    """Everything of the transactions clients but their mongo calls."""
+
+    settings = MongoSettings()
+
+    @staticmethod
+    def _item_conflict(model: stac_types.Item) -> ConflictError:
+        """Error of an item created twice, the unique index rejecting the second."""
+        return ConflictError(already_exists(model))
+
+    @staticmethod
+    def _collection_conflict(model: stac_types.Collection) -> ConflictError:
+        """Error of a collection created twice, the unique index rejecting the second."""
+        return ConflictError(f"Collection {model['id']} already exists")
+
+    @staticmethod
+    def _new_item(model: stac_types.Item) -> Dict:
+        """Document of a created item."""
+        return stamp(normalize_item(model))
+
+    @staticmethod
+    def _replaced_item(model: stac_types.Item) -> Dict:
+        """Document replacing an item, stamped `updated`."""
+        normalize_item(model)
+        model["properties"]["updated"] = now()
+        return stamp(model)
+
+    @staticmethod
+    def _new_collection(model: stac_types.Collection) -> Dict:
+        """Document of a created collection."""
+        return stamp(model)
+
+    @staticmethod
+    def _replaced_collection(model: stac_types.Collection) -> Dict:
+        """Document replacing a collection, stamped `updated`."""
+        model["updated"] = now()
+        return stamp(dict(model))
+
+    @staticmethod
+    def _inserts(valid: List[IndexedItem]) -> List[InsertOne]:
+        """Requests of the unordered bulk insert of a batch."""
+        return [InsertOne(stamp(item)) for _, item in valid]
+
+    @staticmethod
+    def _patched_item(item: Optional[Dict], collection_id: str, item_id: str) -> Dict:
+        if item is None:
+            raise NotFoundError(f"Item {item_id} in collection {collection_id} not found")
+        return item
+
+    @staticmethod
+    def _patched_collection(collection: Optional[Dict], collection_id: str) -> Dict:
+        if collection is None:
+            raise NotFoundError(f"Collection {collection_id} not found")
+        return collection
@@ -52,3 +52,50 @@ class ErrorChecks:
             raise NotFoundError(
                 f"Item {item_id} in collection {collection_id} not found"
             )
+
+
+@attr.s
+class AsyncErrorChecks:
+    """error checks class for motor clients."""
+    client = attr.ib(default=None)
+
+    async def check_collection_foreign_key(self, model: stac_types.Collection):
+        if not await self.client.stac.stac_collection.count_documents(
+            {"id": model["collection"]}, limit=1
+        ):
+            raise ForeignKeyError(f"Collection {model['collection']} does not exist")
+
+    async def check_collection_conflict(self, model: stac_types.Collection):
+        if await self.client.stac.stac_collection.count_documents(
+            {"id": model["id"]}, limit=1
+        ):
+            raise ConflictError(f"Collection {model['id']} already exists")
+
+    async def check_collection_not_found(self, collection_id: str):
+        if (
+            await self.client.stac.stac_collection.count_documents(
+                {"id": collection_id}
+            )
+            == 0
+        ):
+            raise NotFoundError(f"Collection {collection_id} not found")
+
+    async def check_item_conflict(self, model: stac_types.Item):
+        if await self.client.stac.stac_item.count_documents(
+            {"id": model["id"], "collection": model["collection"]},
+            limit=1
+        ):
+            raise ConflictError(
+                f"Item {model['id']} in collection {model['collection']} already exists"
+            )
+
+    async def check_item_not_found(self, item_id: str, collection_id: str):
+        if (
+            await self.client.stac.stac_item.count_documents(
+                {"id": item_id, "collection": collection_id}
+            )
+            == 0
+        ):
+            raise NotFoundError(
+                f"Item {item_id} in collection {collection_id} not found"
+            )
@@ -0,0 +1,156 @@
+"""Partial updates (JSON merge patch) of items and collections.
+
+`PATCH /collections/{collection_id}` and
+`PATCH /collections/{collection_id}/items/{item_id}` take an RFC 7396 merge
+patch: objects are merged recursively, `null` removes a member and any other
+value (lists included) replaces it. The patch becomes a single
+`find_one_and_update` with `$set`/`$unset` on dotted paths, so only the
+changed fields travel and a large `assets` member is left alone unless the
+patch touches it.
+"""
+import asyncio
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import attr
+import orjson
+from fastapi import APIRouter, FastAPI, HTTPException, Request
+from starlette.concurrency import run_in_threadpool
+from stac_pydantic.shared import DATETIME_RFC339
+
+from stac_fastapi.demo.caching import ETAG_FIELD, new_etag
+from stac_fastapi.demo.datetimes import normalize_datetime, normalize_issue_date
+from stac_fastapi.demo.encoding import GEOJSON, json_response
+from stac_fastapi.types.extension import ApiExtension
+
+# members identifying the document (or internal), a patch can't change them
+IMMUTABLE_FIELDS = {"id", "collection", "_id", ETAG_FIELD}
+
+# search keys stored in a canonical form, see `stac_fastapi.demo.datetimes`
+NORMALIZED_PROPERTIES = {
+    "properties.issue_date": normalize_issue_date,
+    "properties.datetime": normalize_datetime,
+}
+
+
+def now() -> str:
+    """`updated` timestamp, set by the API whatever the request carried."""
+    return datetime.utcnow().strftime(DATETIME_RFC339)
+
+
+def merge_patch_update(patch: Dict, prefix: str = "") -> Dict:
+    """Translate a merge patch into a mongo update document."""
+    update: Dict[str, Dict[str, Any]] = {}
+    for key, value in _flatten(patch, prefix):
+        if value is None:
+            update.setdefault("$unset", {})[key] = ""
+        else:
+            update.setdefault("$set", {})[key] = value
+    return update
+
+
+def _flatten(patch: Dict, prefix: str):
+    for key, value in patch.items():
+        if "." in key or key.startswith("$"):
+            raise HTTPException(status_code=400, detail=f"Invalid member name {key}")
+        if not prefix and key in IMMUTABLE_FIELDS:
+            raise HTTPException(status_code=400, detail=f"{key} can't be patched")
+        path = prefix + key
+        if isinstance(value, dict):
+            # an empty object merges nothing
+            yield from _flatten(value, path + ".")
+        else:
+            yield path, value
+
+
+def item_patch_update(patch: Dict) -> Dict:
+    """Mongo update of an item merge patch, stamping `properties.updated`."""
+    if "properties" in patch and not isinstance(patch["properties"], dict):
+        raise HTTPException(status_code=400, detail="properties can only be merged into")
+    update = merge_patch_update(patch)
+    for path, normalize in NORMALIZED_PROPERTIES.items():
+        value = update.get("$set", {}).get(path)
+        if value is not None:
+            update["$set"][path] = normalize(value)
+    return _stamp(update, "properties.updated")
+
+
+def _stamp(update: Dict, updated: str) -> Dict:
+    """Set the `updated` timestamp at path `updated` and a new ETag token."""
+    # a patch removing `updated` can't also set it in the same update
+    unset = update.get("$unset", {})
+    unset.pop(updated, None)
+    if not unset:
+        update.pop("$unset", None)
+    update.setdefault("$set", {})[updated] = now()
+    update["$set"][ETAG_FIELD] = new_etag()
+    return update
+
+
+def collection_patch_update(patch: Dict) -> Dict:
+    """Mongo update of a collection merge patch, stamping `updated`.
+
+    Empty when the patch changes nothing.
+    """
+    update = merge_patch_update(patch)
+    return _stamp(update, "updated") if update else update
+
+
+async def read_patch(request: Request) -> Dict:
+    """Decode the merge patch of a request."""
+    try:
+        patch = orjson.loads(await request.body())
+    except orjson.JSONDecodeError:
+        raise HTTPException(status_code=400, detail="Invalid JSON body")
+    if not isinstance(patch, dict):
+        raise HTTPException(status_code=400, detail="A merge patch must be a JSON object")
+    return patch
+
+
+@attr.s
+class PartialUpdateExtension(ApiExtension):
+    """PATCH endpoints for items and collections.
+
+    The client must have (sync or async) `patch_item(collection_id, item_id,
+    patch)` and `patch_collection(collection_id, patch)` returning the updated
+    document.
+    """
+
+    client = attr.ib()
+    conformance_classes: List[str] = attr.ib(factory=list)
+    schema_href: Optional[str] = attr.ib(default=None)
+
+    async def _call(self, func, *args):
+        if asyncio.iscoroutinefunction(func):
+            return await func(*args)
+        return await run_in_threadpool(func, *args)
+
+    def register(self, app: FastAPI) -> None:
+        """Register the extension with a FastAPI application."""
+        router = APIRouter()
+
+        async def patch_item(collection_id: str, item_id: str, request: Request):
+            """Apply a merge patch to an item."""
+            patch = await read_patch(request)
+            item = await self._call(self.client.patch_item, collection_id, item_id, patch)
+            return json_response(item, GEOJSON)
+
+        async def patch_collection(collection_id: str, request: Request):
+            """Apply a merge patch to a collection."""
+            patch = await read_patch(request)
+            collection = await self._call(self.client.patch_collection, collection_id, patch)
+            return json_response(collection)
+
+        router.add_api_route(
+            name="Patch Item",
+            path="/collections/{collection_id}/items/{item_id}",
+            methods=["PATCH"],
+            endpoint=patch_item,
+        )
+        router.add_api_route(
+            name="Patch Collection",
+            path="/collections/{collection_id}",
+            methods=["PATCH"],
+            endpoint=patch_collection,
+        )
+        app.include_router(router, tags=["Transaction Extension"])
@@ -0,0 +1,89 @@
+import orjson
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from pymongo.errors import BulkWriteError
+from stac_fastapi.types.config import ApiSettings
+
+from stac_fastapi.demo.bulk import DUPLICATE_KEY, BulkItemsExtension, check_items, write_results
+
+
+def _item(item_id, **extra):
+    return {"id": item_id, "properties": {"issue_date": "2024-02"}, **extra}
+
+
+def test_check_items():
+    batch = [
+        _item("a"),
+        orjson.dumps(_item("b")),
+        b"{bad",
+        {"no": "id"},
+        _item("c", collection="c2"),
+        _item("a"),
+        _item("d", properties={"issue_date": "x"}),
+    ]
+    valid, results = check_items("c1", batch, 10)
+    assert [(index, item["id"]) for index, item in valid] == [(10, "a"), (11, "b")]
+    assert valid[0][1]["collection"] == "c1"
+    assert valid[0][1]["properties"]["issue_date"] == "202402"
+    assert [(r["index"], r["id"], r["status"]) for r in results] == [
+        (12, None, "failed"),
+        (13, None, "failed"),
+        (14, "c", "failed"),
+        (15, "a", "failed"),
+        (16, "d", "failed"),
+    ]
+
+
+def test_write_results_report_conflicts():
+    valid, _ = check_items("c1", [_item("a"), _item("b"), _item("c")], 0)
+    error = BulkWriteError(
+        {
+            "writeErrors": [
+                {"index": 1, "code": DUPLICATE_KEY, "errmsg": "E11000 duplicate key"},
+                {"index": 2, "code": 2, "errmsg": "bad value"},
+            ]
+        }
+    )
+    assert write_results(valid, error) == [
+        {"index": 0, "id": "a", "status": "created"},
+        {
+            "index": 1,
+            "id": "b",
+            "status": "failed",
+            "error": "Item b in collection c1 already exists",
+        },
+        {"index": 2, "id": "c", "status": "failed", "error": "bad value"},
+    ]
+
+
+class Client:
+    """Transactions client whose collection disappears after the first batch."""
+
+    def __init__(self):
+        self.calls = []
+
+    def check_collection(self, collection_id):
+        self.calls.append(("check", collection_id))
+
+    def bulk_item_insert(self, collection_id, batch, offset):
+        self.calls.append(("insert", offset))
+        valid, results = check_items(collection_id, batch, offset)
+        error = None
+        if offset:
+            error = BulkWriteError(
+                {"writeErrors": [{"index": 0, "code": 2, "errmsg": "collection gone"}]}
+            )
+        return results + write_results(valid, error)
+
+
+def test_collection_checked_once_before_the_first_batch():
+    client = Client()
+    app = FastAPI()
+    BulkItemsExtension(client, ApiSettings()).register(app)
+    response = TestClient(app).post(
+        "/collections/c1/bulk_items?batch_size=2", json=[_item("a"), _item("b"), _item("c")]
+    )
+    assert response.status_code == 200
+    assert client.calls == [("check", "c1"), ("insert", 0), ("insert", 2)]
+    assert response.json()["created"] == 2
+    assert response.json()["items"][2]["error"] == "collection gone"
@@ -0,0 +1,102 @@
+import pytest
+from starlette.requests import Request
+
+from stac_fastapi.demo.caching import (
+    ETAG_FIELD,
+    document_headers,
+    not_modified,
+    stamp,
+)
+
+
+def _request(**headers):
+    return Request(
+        {
+            "type": "http",
+            "method": "GET",
+            "headers": [
+                (name.replace("_", "-").encode(), value.encode())
+                for name, value in headers.items()
+            ],
+        }
+    )
+
+
+def _headers(base_url="http://testserver/"):
+    doc = stamp({"id": "c1", "updated": "2024-02-01T12:00:00Z"})
+    return document_headers(doc, base_url, "no-cache")
+
+
+def test_document_headers():
+    doc = stamp({"id": "c1", "updated": "2024-02-01T12:00:00Z"})
+    headers = document_headers(doc, "http://testserver/", "no-cache")
+    assert ETAG_FIELD not in doc
+    assert headers["ETag"].startswith('"') and headers["ETag"].endswith('"')
+    assert headers["Last-Modified"] == "Thu, 01 Feb 2024 12:00:00 GMT"
+    assert headers["Cache-Control"] == "no-cache"
+
+
+def test_etag_depends_on_base_url():
+    assert _headers()["ETag"] == _headers()["ETag"]
+    assert _headers()["ETag"] != _headers("https://stac.example.com/api/")["ETag"]
+
+
+def test_documents_without_stored_etag():
+    doc = {"id": "c1", "title": "T"}
+    assert document_headers(dict(doc), "http://testserver/") == document_headers(
+        stamp(dict(doc)), "http://testserver/"
+    )
+
+
+@pytest.mark.parametrize(
+    "if_none_match",
+    [
+        "{etag}",
+        "W/{etag}",
+        '"other", {etag}',
+        '"other" ,W/{etag} , "last"',
+        "*",
+        " * ",
+    ],
+)
+def test_if_none_match(if_none_match):
+    headers = _headers()
+    request = _request(if_none_match=if_none_match.format(etag=headers["ETag"]))
+    response = not_modified(request, headers)
+    assert response.status_code == 304
+    assert response.headers["etag"] == headers["ETag"]
+    assert response.body == b""
+
+
+@pytest.mark.parametrize("if_none_match", ['"other"', '"other", W/"another"', ""])
+def test_if_none_match_mismatch(if_none_match):
+    assert not_modified(_request(if_none_match=if_none_match), _headers()) is None
+
+
+def test_if_none_match_of_another_base_url():
+    etag = _headers("https://stac.example.com/")["ETag"]
+    assert not_modified(_request(if_none_match=etag), _headers()) is None
+
+
+@pytest.mark.parametrize(
+    "since,expected",
+    [
+        ("Thu, 01 Feb 2024 12:00:00 GMT", 304),
+        ("Fri, 02 Feb 2024 00:00:00 GMT", 304),
+        ("Thu, 01 Feb 2024 11:59:59 GMT", None),
+        ("yesterday", None),
+    ],
+)
+def test_if_modified_since(since, expected):
+    response = not_modified(_request(if_modified_since=since), _headers())
+    assert (response and response.status_code) == expected
+
+
+def test_if_none_match_wins_over_if_modified_since():
+    request = _request(if_none_match='"other"', if_modified_since="Fri, 02 Feb 2024 00:00:00 GMT")
+    assert not_modified(request, _headers()) is None
+
+
+def test_unconditional_request():
+    assert not_modified(_request(), _headers()) is None
+    assert not_modified(_request(if_none_match="*"), None) is None
@@ -0,0 +1,30 @@
+import pytest
+
+from stac_fastapi.demo.compression import negotiate, parse_accept_encoding
+
+
+def test_parse_accept_encoding():
+    assert parse_accept_encoding("gzip;q=0.5, BR, zstd;q=bad, ,identity") == {
+        "gzip": 0.5,
+        "br": 1.0,
+        "zstd": 0.0,
+        "identity": 1.0,
+    }
+
+
+@pytest.mark.parametrize(
+    "header,expected",
+    [
+        (None, None),
+        ("", None),
+        ("gzip", "gzip"),
+        ("gzip, br", "br"),
+        ("br;q=0.5, gzip", "gzip"),
+        ("br;q=0", None),
+        ("*", "br"),
+        ("*;q=0.1, br;q=0", "gzip"),
+        ("deflate", None),
+    ],
+)
+def test_negotiate(header, expected):
+    assert negotiate(header, ["br", "gzip"]) == expected
@@ -0,0 +1,107 @@
+from datetime import date, datetime, timezone
+
+import pytest
+from stac_fastapi.types.errors import InvalidQueryParameter
+
+from stac_fastapi.demo.datetimes import (
+    datetime_filter,
+    normalize_issue_date,
+    normalize_item,
+    parse_interval,
+)
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+END = datetime(2024, 3, 1, tzinfo=timezone.utc)
+
+
+@pytest.mark.parametrize(
+    "value,expected",
+    [
+        ("2024-01-01T00:00:00Z", (START, START)),
+        ("2024-01-01T00:00:00Z/2024-03-01T00:00:00Z", (START, END)),
+        ("../2024-03-01T00:00:00Z", (None, END)),
+        ("/2024-03-01T00:00:00Z", (None, END)),
+        ("2024-01-01T00:00:00Z/..", (START, None)),
+        ("2024-01-01T00:00:00Z/", (START, None)),
+        ("2024-01-01T01:00:00+01:00", (START, START)),
+    ],
+)
+def test_interval_forms(value, expected):
+    assert parse_interval(value) == expected
+
+
+@pytest.mark.parametrize(
+    "value",
+    ["yesterday", "2024-03-01T00:00:00Z/2024-01-01T00:00:00Z", "2024-01-01/2024-02-01/2024-03-01"],
+)
+def test_invalid_interval(value):
+    with pytest.raises(InvalidQueryParameter):
+        parse_interval(value)
+
+
+def test_issue_date_filter():
+    assert datetime_filter("2024-01-05T00:00:00Z/2024-03-01T00:00:00Z") == {
+        "properties.issue_date": {"$gte": "202401", "$lte": "202403"}
+    }
+    assert datetime_filter("2024-01-05T00:00:00Z/2024-01-20T00:00:00Z") == {
+        "properties.issue_date": "202401"
+    }
+    assert datetime_filter("../2024-03-01T00:00:00Z") == {
+        "properties.issue_date": {"$lte": "202403"}
+    }
+    assert datetime_filter("../..") == {}
+
+
+def test_datetime_filter_bounds_are_fixed_width():
+    assert datetime_filter("2024-01-01T00:00:00Z/2024-03-01T10:00:00.5Z", "datetime") == {
+        "properties.datetime": {
+            "$gte": "2024-01-01T00:00:00.000000Z",
+            "$lte": "2024-03-01T10:00:00.500000Z",
+        }
+    }
+
+
+@pytest.mark.parametrize(
+    "stored,bound,inside",
+    [
+        ("2024-03-01T10:00:00Z", "../2024-03-01T10:00:00.5Z", True),
+        ("2024-03-01T10:00:00.3Z", "../2024-03-01T10:00:00Z", False),
+        ("2024-03-01T10:00:00.3Z", "2024-03-01T10:00:00Z/..", True),
+        ("2024-03-01T11:00:00+01:00", "2024-03-01T10:00:00Z", True),
+    ],
+)
+def test_stored_datetimes_compare_as_instants(stored, bound, inside):
+    value = normalize_item({"properties": {"datetime": stored}})["properties"]["datetime"]
+    condition = datetime_filter(bound, "datetime")["properties.datetime"]
+    if isinstance(condition, str):
+        condition = {"$gte": condition, "$lte": condition}
+    matched = value >= condition.get("$gte", value) and value <= condition.get("$lte", value)
+    assert matched == inside
+
+
+def test_normalize_item():
+    item = {"properties": {"issue_date": "2024-02", "datetime": datetime(2024, 2, 1, 10)}}
+    assert normalize_item(item)["properties"] == {
+        "issue_date": "202402",
+        "datetime": "2024-02-01T10:00:00.000000Z",
+    }
+    with pytest.raises(InvalidQueryParameter):
+        normalize_item({"properties": {"datetime": "yesterday"}})
+
+
+def test_unknown_datetime_field():
+    with pytest.raises(ValueError):
+        datetime_filter("2024-01-01T00:00:00Z", "created")
+
+
+@pytest.mark.parametrize(
+    "value", ["202402", 202402, "2024-02", date(2024, 2, 9), datetime(2024, 2, 9, 12)]
+)
+def test_normalize_issue_date(value):
+    assert normalize_issue_date(value) == "202402"
+
+
+@pytest.mark.parametrize("value", ["202413", "2024", True, None, 2024.02])
+def test_invalid_issue_date(value):
+    with pytest.raises(InvalidQueryParameter):
+        normalize_issue_date(value)
@@ -0,0 +1,37 @@
+from stac_fastapi.demo.fields import fields_projection, parse_get_fields
+
+
+def test_parse_get_fields():
+    assert parse_get_fields(["id", "+properties.model", "-assets"]) == {
+        "include": {"id", "properties.model"},
+        "exclude": {"assets"},
+    }
+
+
+def test_include_keeps_required_and_sort_fields():
+    projection = fields_projection(
+        {"include": {"id", "properties.model", "assets.data"}, "exclude": set()},
+        ["properties.issue_date"],
+    )
+    assert projection == {
+        "type": 1,
+        "stac_version": 1,
+        "id": 1,
+        "collection": 1,
+        "geometry": 1,
+        "bbox": 1,
+        "links": 1,
+        "assets": 1,
+        "properties.datetime": 1,
+        "properties.model": 1,
+        "properties.issue_date": 1,
+        "_id": 0,
+    }
+
+
+def test_exclude_spares_required_fields():
+    projection = fields_projection(
+        {"include": set(), "exclude": {"properties", "links", "geometry", "id", "extra"}}
+    )
+    assert projection == {"extra": 0, "_id": 0, "_etag": 0}
+
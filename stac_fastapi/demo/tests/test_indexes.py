@@ -0,0 +1,38 @@
+import pytest
+from pymongo.errors import DuplicateKeyError
+
+from stac_fastapi.demo.indexes import IndexSpec, ensure_indexes
+
+UNIQUE = IndexSpec([("collection", 1), ("id", 1)], unique=True)
+DATETIME = IndexSpec([("properties.datetime", 1), ("id", 1)])
+
+
+class Table:
+    """`list_indexes`/`create_indexes` of a collection holding duplicate items."""
+
+    def __init__(self):
+        self.indexes = []
+
+    def list_indexes(self):
+        return iter(self.indexes)
+
+    def create_indexes(self, models):
+        for model in models:
+            if model.document.get("unique"):
+                raise DuplicateKeyError("E11000 duplicate key error", 11000)
+            self.indexes.append(model.document)
+        return [model.document["name"] for model in models]
+
+
+def test_refused_index_does_not_stop_the_others(caplog):
+    db = {"items": Table()}
+    with pytest.raises(DuplicateKeyError):
+        ensure_indexes(db, {"items": [UNIQUE, DATETIME]})
+    assert [index["name"] for index in db["items"].indexes] == [DATETIME.name]
+    assert UNIQUE.name in caplog.text
+
+
+def test_nothing_missing():
+    db = {"items": Table()}
+    assert ensure_indexes(db, {"items": [DATETIME]}) == {"items": [DATETIME.name]}
+    assert ensure_indexes(db, {"items": [DATETIME]}) == {}
@@ -0,0 +1,83 @@
+from datetime import datetime
+
+import pytest
+from stac_fastapi.types.errors import InvalidQueryParameter
+
+from stac_fastapi.demo.pagination import (
+    DEFAULT_SORT,
+    decode_token,
+    encode_token,
+    page_query,
+    paginate,
+)
+
+
+@pytest.mark.parametrize("forward", [True, False])
+def test_token_round_trip(forward):
+    values = ["2024-02-08T00:00:00Z", "item-16"]
+    token = encode_token(values, forward=forward)
+    assert "=" not in token
+    assert decode_token(token) == (values, forward)
+
+
+def test_token_keeps_bson_types():
+    values = [datetime(2024, 2, 8, 12, 30), 7]
+    decoded, _ = decode_token(encode_token(values))
+    assert decoded[1] == 7
+    assert decoded[0].replace(tzinfo=None) == values[0]
+
+
+@pytest.mark.parametrize("token", ["not a token", "e30", encode_token([1])[:-2] + "!!"])
+def test_invalid_token(token):
+    with pytest.raises(InvalidQueryParameter):
+        decode_token(token)
+
+
+def test_token_of_another_sort():
+    with pytest.raises(InvalidQueryParameter):
+        page_query({}, None, encode_token(["2024-02-08T00:00:00Z"]))
+
+
+def test_first_page():
+    queries, sort, forward = page_query({"collection": "c1"}, None, None)
+    assert queries == {"collection": "c1"}
+    assert sort == DEFAULT_SORT
+    assert forward
+
+
+def test_next_page_filter():
+    token = encode_token(["2024-02-08T00:00:00Z", "i16"])
+    queries, sort, forward = page_query({"collection": "c1"}, None, token)
+    assert forward
+    assert queries == {
+        "$and": [
+            {"collection": "c1"},
+            {
+                "$or": [
+                    {"properties.datetime": {"$lt": "2024-02-08T00:00:00Z"}},
+                    {"properties.datetime": "2024-02-08T00:00:00Z", "id": {"$lt": "i16"}},
+                ]
+            },
+        ]
+    }
+
+
+def _items(*ids):
+    return [{"id": i, "properties": {"datetime": "2024-01-01T00:00:00Z"}} for i in ids]
+
+
+def test_pages_walk_back_and_forth():
+    sort = [("id", 1)]
+    _, sort, forward = page_query({}, sort, None)
+    page, next_token, prev_token = paginate(_items("a", "b", "c"), 2, sort, forward, None)
+    assert [item["id"] for item in page] == ["a", "b"]
+    assert prev_token is None
+    assert decode_token(next_token) == (["b"], True)
+
+    # the previous page of "c" is fetched in reversed order, then flipped
+    _, back_sort, forward = page_query({}, [("id", 1)], encode_token(["c"], forward=False))
+    assert back_sort == [("id", -1)]
+    page, next_token, prev_token = paginate(_items("b", "a"), 2, back_sort, forward, "t")
+    assert [item["id"] for item in page] == ["a", "b"]
+    assert decode_token(next_token) == (["b"], True)
+    assert prev_token is None
@@ -0,0 +1,28 @@
+from pymongo import ASCENDING, DESCENDING
+from starlette.requests import Request
+
+from stac_fastapi.demo.planner import build_sort, parse_get_sortby
+
+
+def _sortby(query_string: bytes):
+    request = Request({"type": "http", "method": "GET", "query_string": query_string})
+    return request.query_params["sortby"].split(",")
+
+
+def test_raw_plus_is_ascending():
+    sortby = parse_get_sortby(_sortby(b"sortby=+properties.model,-id"))
+    assert sortby == [
+        {"field": "properties.model", "direction": "asc"},
+        {"field": "id", "direction": "desc"},
+    ]
+    assert build_sort({"sortby": sortby}) == [
+        ("properties.model", ASCENDING),
+        ("id", DESCENDING),
+    ]
+
+
+def test_encoded_plus_and_no_prefix():
+    assert parse_get_sortby(_sortby(b"sortby=%2Bid,properties.datetime")) == [
+        {"field": "id", "direction": "asc"},
+        {"field": "properties.datetime", "direction": "asc"},
+    ]
@@ -0,0 +1,38 @@
+import pytest
+from stac_fastapi.types.errors import InvalidQueryParameter
+
+from stac_fastapi.demo.query import compile_query
+
+
+def test_operators_of_a_field_are_merged():
+    assert compile_query({"model": {"gte": 400, "lte": 420}, "id": {"in": ["a", "b"]}}) == {
+        "properties.model": {"$gte": 400, "$lte": 420},
+        "id": {"$in": ["a", "b"]},
+    }
+
+
+def test_string_operators_are_escaped_regexes():
+    assert compile_query({"title": {"startsWith": "a.b", "contains": "x*"}}) == {
+        "properties.title": {"$regex": r"^a\.b"},
+        "$and": [{"properties.title": {"$regex": r"x\*"}}],
+    }
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        {"model": {"where": 1}},
+        {"model": {"$where": "sleep(1000)"}},
+        {"model": {"regex": ".*"}},
+        {"model": {}},
+        {"model": 3},
+        {"model": {"eq": {"$gt": 0}}},
+        {"model": {"in": "abc"}},
+        {"model": {"startsWith": 1}},
+        {"model": {"neq": 1, "ne": 2}},
+        ["model"],
+    ],
+)
+def test_rejected_queries(query):
+    with pytest.raises(InvalidQueryParameter):
+        compile_query(query)
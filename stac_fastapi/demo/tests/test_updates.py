@@ -0,0 +1,53 @@
+import pytest
+from fastapi import HTTPException
+
+from stac_fastapi.demo.caching import ETAG_FIELD
+from stac_fastapi.demo.updates import (
+    collection_patch_update,
+    item_patch_update,
+    merge_patch_update,
+)
+
+
+def test_null_removes_and_values_replace():
+    patch = {"title": None, "keywords": ["a"], "assets": {"data": {"title": "t", "roles": None}}}
+    assert merge_patch_update(patch) == {
+        "$set": {"keywords": ["a"], "assets.data.title": "t"},
+        "$unset": {"title": "", "assets.data.roles": ""},
+    }
+
+
+def test_empty_object_merges_nothing():
+    assert merge_patch_update({"assets": {}}) == {}
+    assert collection_patch_update({"assets": {}}) == {}
+
+
+@pytest.mark.parametrize(
+    "patch", [{"id": "x"}, {"collection": "c2"}, {ETAG_FIELD: "x"}, {"a.b": 1}, {"$set": {}}]
+)
+def test_rejected_members(patch):
+    with pytest.raises(HTTPException) as err:
+        merge_patch_update(patch)
+    assert err.value.status_code == 400
+
+
+def test_item_patch_stamps_updated_and_etag():
+    update = item_patch_update(
+        {"properties": {"issue_date": "2024-02", "datetime": "2024-02-01T10:00:00Z", "model": None}}
+    )
+    assert update["$set"]["properties.issue_date"] == "202402"
+    assert update["$set"]["properties.datetime"] == "2024-02-01T10:00:00.000000Z"
+    assert update["$set"]["properties.updated"]
+    assert update["$set"][ETAG_FIELD]
+    assert update["$unset"] == {"properties.model": ""}
+
+
+def test_removing_updated_sets_it():
+    update = collection_patch_update({"updated": None})
+    assert "$unset" not in update
+    assert update["$set"]["updated"]
+
+
+def test_properties_can_only_be_merged_into():
+    with pytest.raises(HTTPException):
+        item_patch_update({"properties": None})